@@ -17,10 +17,15 @@ if current_dir not in sys.path:
 from helper.log_helper import LogHelper
 from helper.selenium_helper import SeleniumHelper
 from helper.common_helper import CommonHelper
-from lxml import html
+from helper.journal_helper import JournalWriter
+from helper.frontier_helper import CrawlFrontier
+from helper.catalog_helper import BookCatalog
+from helper.tor_helper import TorCircuitPool
+from helper.rate_helper import RateController
+from lxml import html, etree
 import pandas as pd
+import requests
 import time
-import random
 import re
 import threading
 import queue
@@ -43,6 +48,52 @@ global_processed_count = 0
 error_records = []
 error_lock = threading.Lock()
 
+# HTTP 優先模式設定
+HTTP_TIMEOUT = 10
+HTTP_DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+AGE_GATE_MARKERS = ['限制級', '未滿18歲', '未滿十八歲', '年滿18歲', '年滿十八歲']
+
+# HTTP 優先模式統計
+global_http_count = 0
+global_browser_fallback_count = 0
+
+# 日誌模式設定：每完成一本書只追加一行到日誌，每 JOURNAL_COMPACT_EVERY 本才合併寫回 CSV
+JOURNAL_COMPACT_EVERY = 50
+result_journal = None
+
+# 爬取進度（SQLite），用於 --resume 續跑
+crawl_frontier = None
+
+# 跨執行的書目資料庫（SQLite），已知且未過期的書籍不再重新爬取
+book_catalog = None
+
+# Tor circuit 池：每個瀏覽器各自一條 circuit，被封鎖時更換出口 IP
+tor_pool = None
+
+# 本機快取代理：所有瀏覽器共用靜態資源（JS／CSS／字型）的磁碟快取
+cache_proxy = None
+
+# 自適應請求間隔（AIMD）：頁面正常時逐步縮短，被封鎖或導向登入頁時放慢並冷卻，狀態保存在 state/rate_state.json
+BROWSER_RATE_LIMITS = {'initial_delay': 7.5, 'min_delay': 2, 'max_delay': 60, 'block_cooldown': 10}
+HTTP_RATE_LIMITS = {'initial_delay': 1.5, 'min_delay': 0.5, 'max_delay': 30, 'block_cooldown': 10}
+
+# 每頁導航加上等待商品資訊區塊的上限（秒），區塊出現即停止載入其餘資源並開始解析
+CONTENT_WAIT_TIMEOUT = 15
+
+# 首頁出現這些文字即視為已登入（持久化設定檔／接手模式下已登入的瀏覽器不需再手動登入）
+BOOKSCOM_LOGGED_IN_MARKERS = ('登出',)
+
+# 寫回 CSV 的欄位對應（DataFrame 欄位 -> result_data 鍵值）
+RESULT_FIELD_MAPPING = {
+    'ISBN': 'isbn',
+    'Publisher': 'Publisher',
+    'translator': 'translator',
+    'fixed_price': 'fixed_price',
+    'original_title': 'original_title',
+    'publish_date': 'publish_date',
+    'category': 'category',
+}
+
 
 def repair_encoding(text):
     """修復可能的編碼問題"""
@@ -82,22 +133,20 @@ def extract_isbn(text):
     return "N/A"
 
 
-def check_if_blocked(driver):
-    """檢查是否被封鎖"""
-    try:
-        page_source = driver.page_source
-        if '您的連線暫時異常' in page_source or 'Connection is temporarily unavailable' in page_source:
-            return True
-        if '請稍後再試' in page_source or 'Please try again later' in page_source:
-            return True
-        return False
-    except:
+def is_blocked_html(page_source):
+    """檢查頁面內容是否為封鎖或連線異常頁面"""
+    if not page_source:
         return False
+    if '您的連線暫時異常' in page_source or 'Connection is temporarily unavailable' in page_source:
+        return True
+    if '請稍後再試' in page_source or 'Please try again later' in page_source:
+        return True
+    return False
 
 
-def fetch_paper_book_info_with_selenium(driver, url, production_id="", retry_count=0, max_retries=2):
-    """使用 Selenium 爬取 Books.com.tw 紙本書的完整資訊"""
-    result = {
+def new_book_result():
+    """建立預設的爬取結果"""
+    return {
         'isbn': 'N/A',
         'Publisher': 'N/A',
         'translator': 'N/A',
@@ -106,259 +155,351 @@ def fetch_paper_book_info_with_selenium(driver, url, production_id="", retry_cou
         'publish_date': 'N/A',
         'category': 'N/A'
     }
+
+
+def pick_first_text(matches):
+    """第一個文字節點"""
+    return repair_encoding(str(matches[0]).strip()) if matches else None
+
+
+def pick_isbn_from_element(matches):
+    """第一個包含 ISBN 的元素（取不到號碼時回傳 None，改用下一個選擇器）"""
+    if not matches:
+        return None
+    isbn = extract_isbn(matches[0].text_content().strip())
+    return isbn if isbn != "N/A" else None
+
+
+def pick_isbn_from_texts(matches):
+    """表格中第一個 978／979 開頭的文字"""
+    for text in matches:
+        if '978' in text or '979' in text:
+            isbn = extract_isbn(text)
+            if isbn != "N/A":
+                return isbn
+    return None
+
+
+def pick_publish_date(matches):
+    """出版日期：移除「出版日期：」前綴"""
+    if not matches:
+        return None
+    date_text = re.sub(r'出版日期[：:]\s*', '', str(matches[0]).strip())
+    return repair_encoding(date_text) if date_text else None
+
+
+def pick_price(matches):
+    return str(matches[0]).strip() if matches else None
+
+
+def pick_categories(matches):
+    """每個「本書分類：」<li> 內的連結以 > 連接，多組分類以分號分隔"""
+    category_list = []
+    for li in matches:
+        category_links = CATEGORY_LINK_XPATH(li)
+        if category_links:
+            category_list.append(" > ".join([repair_encoding(c.strip()) for c in category_links]))
+    return '; '.join(category_list) if category_list else None
+
+
+# 商品頁欄位規格：每個欄位先取得所在區塊，再依序嘗試候選 XPath（相對於區塊），由 pick 函數整理成欄位值
+BOOK_PAGE_SECTIONS = {
+    'spec': '//div[@class="mod_b type02_m058 clearfix"]',
+    'basic': '//div[@class="type02_p003 clearfix"]',
+    'price': '//ul[@class="price"]',
+    'title': '//div[@class="mod type02_p002 clearfix"]',
+}
+BOOK_FIELD_SPECS = {
+    'isbn': ('spec', [
+        ('.//ul/li[contains(text(), "ISBN")]', pick_isbn_from_element),
+        ('.//tbody/tr/td/text()', pick_isbn_from_texts),
+    ]),
+    'translator': ('basic', [
+        ('.//li[contains(., "譯者：")]/a/text()', pick_first_text),
+        ('.//ul/li[contains(., "譯者")]/a/text()', pick_first_text),
+    ]),
+    'Publisher': ('basic', [
+        ('.//li[contains(., "出版社：")]/a/text()', pick_first_text),
+    ]),
+    'publish_date': ('basic', [
+        ('.//li[contains(., "出版日期：")]/text()[normalize-space()]', pick_publish_date),
+    ]),
+    'fixed_price': ('price', [
+        ('./li[contains(text(), "定價")]/em/text()', pick_price),
+        ('./li[contains(text(), "組合商品原始售價")]/em/text()', pick_price),
+    ]),
+    'original_title': ('title', [
+        ('.//h2/a/text()', pick_first_text),
+    ]),
+    'category': ('spec', [
+        ('(.//ul[@class="sort"])[1]//li[contains(text(), "本書分類：")]', pick_categories),
+    ]),
+}
+
+# 模組載入時編譯一次，之後每頁直接套用
+CATEGORY_LINK_XPATH = etree.XPath('.//a/text()')
+COMPILED_SECTIONS = {name: etree.XPath(expr) for name, expr in BOOK_PAGE_SECTIONS.items()}
+COMPILED_FIELD_SPECS = [
+    (field, section, [(etree.XPath(expr), pick) for expr, pick in candidates])
+    for field, (section, candidates) in BOOK_FIELD_SPECS.items()
+]
+
+# 各欄位的解析耗時統計：欄位 -> [次數, 總秒數]
+PARSE_STATS = {}
+PARSE_STATS_LOCK = threading.Lock()
+
+
+def parse_paper_book_info(tree, result=None, absent_fields=None):
+    """
+    從單一頁面快照（lxml tree）依欄位規格提取書籍資訊，找不到的欄位保持 N/A
     
-    try:
-        # 訪問頁面
-        driver.get(url)
-        time.sleep(random.uniform(3, 5))
-        
-        # 檢查是否被封鎖
-        if check_if_blocked(driver):
-            log.warning(f"⚠️  偵測到連線異常或被封鎖")
-            
-            if retry_count < max_retries:
-                wait_time = random.uniform(5, 10) * (retry_count + 1)
-                log.info(f"等待 {wait_time:.1f} 秒後重試 (第 {retry_count + 1}/{max_retries} 次)")
-                time.sleep(wait_time)
-                
-                # 嘗試訪問首頁重新建立正常連線
-                driver.get("https://www.books.com.tw/")
-                time.sleep(random.uniform(5, 8))
-                
-                # 重試
-                return fetch_paper_book_info_with_selenium(driver, url, production_id, retry_count + 1, max_retries)
-            else:
-                log.error(f"❌ 達到最大重試次數，放棄此 URL")
-                raise Exception("連線被封鎖，無法完成爬取")
-        
-        # 獲取頁面內容
-        page_source = driver.page_source
-        tree = html.fromstring(page_source)
+    Args:
+        tree: lxml 解析後的頁面
+        result: 要填入的結果（預設建立新的結果）
+        absent_fields: 傳入 set 時，加入所在區塊不在快照中的欄位（可能尚未渲染，需要從瀏覽器補抓）
+    """
+    if result is None:
+        result = new_book_result()
+    
+    sections = {}
+    timings = {}
+    for field, section, candidates in COMPILED_FIELD_SPECS:
+        start = time.perf_counter()
+        if section not in sections:
+            sections[section] = COMPILED_SECTIONS[section](tree)
         
-        # === 提取 ISBN ===
-        isbn_li_elements = tree.xpath('//div[@class="mod_b type02_m058 clearfix"]//ul/li[contains(text(), "ISBN")]')
-        if isbn_li_elements:
-            isbn_text = isbn_li_elements[0].text_content().strip()
-            result['isbn'] = extract_isbn(isbn_text)
-            if result['isbn'] != "N/A":
-                log.debug(f"成功提取 ISBN: {result['isbn']}")
-        
-        # 備用方法：從表格結構中提取 ISBN
-        if result['isbn'] == "N/A":
-            isbn_elements = tree.xpath('//div[@class="mod_b type02_m058 clearfix"]//tbody/tr/td/text()')
-            for text in isbn_elements:
-                if '978' in text or '979' in text:
+        if not sections[section]:
+            if absent_fields is not None:
+                absent_fields.add(field)
+        elif result.get(field, "N/A") == "N/A":
+            for xpath, pick in candidates:
+                value = None
+                for node in sections[section]:
+                    value = pick(xpath(node))
+                    if value:
+                        break
+                if value:
+                    result[field] = value
+                    log.debug(f"找到 {field}: {value}")
+                    break
+        timings[field] = time.perf_counter() - start
+    
+    with PARSE_STATS_LOCK:
+        for field, seconds in timings.items():
+            stats = PARSE_STATS.setdefault(field, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+    
+    return result
+
+
+def browser_rate(url):
+    """瀏覽器抓取該主機的速率狀態"""
+    return RateController.shared().get(url, **BROWSER_RATE_LIMITS)
+
+
+def http_rate(url):
+    """HTTP 直接抓取該主機的速率狀態"""
+    return RateController.shared().get(url, channel='http', **HTTP_RATE_LIMITS)
+
+
+def close_rate_controller():
+    """記錄各主機的請求間隔並寫回狀態檔"""
+    controller = RateController.shared()
+    controller.save()
+    summary = controller.summary()
+    if summary:
+        log.info(f"請求間隔統計: {summary}")
+
+
+def log_parse_stats():
+    """記錄各欄位的平均解析耗時"""
+    with PARSE_STATS_LOCK:
+        if not PARSE_STATS:
+            return
+        summary = ", ".join(
+            f"{field} {total / count * 1000:.2f}ms" for field, (count, total) in PARSE_STATS.items()
+        )
+    log.info(f"各欄位平均解析耗時: {summary}")
+
+
+def fill_missing_from_live_dom(driver, result, fields):
+    """
+    快照中缺少區塊的欄位改從瀏覽器的即時 DOM 查找（只處理 fields 中仍為 N/A 的欄位）
+    """
+    fields = {field for field in fields if result[field] == "N/A"}
+    if not fields:
+        return result
+    log.debug(f"快照缺少欄位所在區塊，改從瀏覽器查找: {', '.join(sorted(fields))}")
+    
+    # 使用 Selenium 直接查找 ISBN
+    if 'isbn' in fields:
+        try:
+            isbn_elements = driver.find_elements(By.XPATH, "//div[@class='mod_b type02_m058 clearfix']//ul/li")
+            for element in isbn_elements:
+                text = element.text
+                if 'ISBN' in text:
                     result['isbn'] = extract_isbn(text)
                     if result['isbn'] != "N/A":
-                        log.debug(f"從表格結構提取 ISBN: {result['isbn']}")
                         break
-        
-        # 使用 Selenium 直接查找元素
-        if result['isbn'] == "N/A":
-            try:
-                isbn_elements = driver.find_elements(By.XPATH, "//div[@class='mod_b type02_m058 clearfix']//ul/li")
-                for element in isbn_elements:
-                    text = element.text
-                    if 'ISBN' in text:
-                        result['isbn'] = extract_isbn(text)
-                        if result['isbn'] != "N/A":
-                            break
-            except:
-                pass
-        
-        # === 提取譯者 ===
-        translator_elements = tree.xpath('//div[@class="type02_p003 clearfix"]//li[contains(., "譯者：")]/a/text()')
-        if translator_elements:
-            result['translator'] = repair_encoding(translator_elements[0].strip())
-            log.debug(f"找到譯者: {result['translator']}")
-        else:
-            translator_elements = tree.xpath('//div[@class="type02_p003 clearfix"]//ul/li[contains(., "譯者")]/a/text()')
-            if translator_elements:
-                result['translator'] = repair_encoding(translator_elements[0].strip())
-        
-        # 使用 Selenium 查找譯者
-        if result['translator'] == "N/A":
-            try:
-                translator_elements = driver.find_elements(By.XPATH, "//div[@class='type02_p003 clearfix']//li")
-                for element in translator_elements:
-                    text = element.text
-                    if '譯者' in text:
-                        match = re.search(r'譯者[：:]\s*(.+)', text)
-                        if match:
-                            translator_name = match.group(1).strip()
-                            translator_name = re.sub(r'\s*追蹤.*$', '', translator_name)
-                            result['translator'] = repair_encoding(translator_name)
-                            break
-            except:
-                pass
-        
-        # === 提取出版社 ===
-        # 使用 XPath 根據文字內容判斷
+        except:
+            pass
+    
+    # 使用 Selenium 查找譯者
+    if 'translator' in fields:
         try:
-            publisher_elements = tree.xpath('//div[@class="type02_p003 clearfix"]//li[contains(., "出版社：")]/a/text()')
-            if publisher_elements:
-                result['Publisher'] = repair_encoding(publisher_elements[0].strip())
-                log.debug(f"找到出版社: {result['Publisher']}")
+            translator_elements = driver.find_elements(By.XPATH, "//div[@class='type02_p003 clearfix']//li")
+            for element in translator_elements:
+                text = element.text
+                if '譯者' in text:
+                    match = re.search(r'譯者[：:]\s*(.+)', text)
+                    if match:
+                        translator_name = match.group(1).strip()
+                        translator_name = re.sub(r'\s*追蹤.*$', '', translator_name)
+                        result['translator'] = repair_encoding(translator_name)
+                        break
+        except:
+            pass
+    
+    # 出版社備用方法：使用 Selenium
+    if 'Publisher' in fields:
+        try:
+            li_elements = driver.find_elements(By.CSS_SELECTOR, "div.type02_p003.clearfix > ul > li")
+            for li_element in li_elements:
+                text = li_element.text
+                if '出版社' in text and '：' in text:
+                    publisher_text = re.sub(r'出版社[：:]\s*', '', text)
+                    publisher_text = re.sub(r'\s*追蹤.*$', '', publisher_text)
+                    publisher_text = publisher_text.split('\n')[0].strip()
+                    if publisher_text:
+                        result['Publisher'] = repair_encoding(publisher_text)
+                        log.debug(f"使用 Selenium 找到出版社: {result['Publisher']}")
+                        break
         except Exception as e:
-            log.debug(f"使用 XPath 提取出版社時發生錯誤: {e}")
-        
-        # 備用方法：使用 Selenium
-        if result['Publisher'] == "N/A":
-            try:
-                li_elements = driver.find_elements(By.CSS_SELECTOR, "div.type02_p003.clearfix > ul > li")
-                for li_element in li_elements:
-                    text = li_element.text
-                    if '出版社' in text and '：' in text:
-                        publisher_text = re.sub(r'出版社[：:]\s*', '', text)
-                        publisher_text = re.sub(r'\s*追蹤.*$', '', publisher_text)
-                        publisher_text = publisher_text.split('\n')[0].strip()
-                        if publisher_text:
-                            result['Publisher'] = repair_encoding(publisher_text)
-                            log.debug(f"使用 Selenium 找到出版社: {result['Publisher']}")
-                            break
-            except Exception as e:
-                log.debug(f"使用 Selenium 提取出版社時發生錯誤: {e}")
-        
-        # === 提取出版日期 ===
-        # 使用 XPath 根據文字內容判斷
+            log.debug(f"使用 Selenium 提取出版社時發生錯誤: {e}")
+    
+    # 出版日期備用方法：使用 Selenium
+    if 'publish_date' in fields:
         try:
-            publish_date_elements = tree.xpath('//div[@class="type02_p003 clearfix"]//li[contains(., "出版日期：")]/text()[normalize-space()]')
-            if publish_date_elements:
-                date_text = publish_date_elements[0].strip()
-                date_text = re.sub(r'出版日期[：:]\s*', '', date_text)
-                if date_text:
-                    result['publish_date'] = repair_encoding(date_text)
-                    log.debug(f"找到出版日期: {result['publish_date']}")
+            li_elements = driver.find_elements(By.CSS_SELECTOR, "div.type02_p003.clearfix > ul > li")
+            for li_element in li_elements:
+                text = li_element.text
+                if '出版日期' in text and '：' in text:
+                    date_text = re.sub(r'出版日期[：:]\s*', '', text)
+                    date_text = date_text.split('\n')[0].strip()
+                    if date_text:
+                        result['publish_date'] = repair_encoding(date_text)
+                        log.debug(f"使用 Selenium 找到出版日期: {result['publish_date']}")
+                        break
         except Exception as e:
-            log.debug(f"使用 XPath 提取出版日期時發生錯誤: {e}")
-        
-        # 備用方法：使用 Selenium
-        if result['publish_date'] == "N/A":
-            try:
-                li_elements = driver.find_elements(By.CSS_SELECTOR, "div.type02_p003.clearfix > ul > li")
-                for li_element in li_elements:
-                    text = li_element.text
-                    if '出版日期' in text and '：' in text:
-                        date_text = re.sub(r'出版日期[：:]\s*', '', text)
-                        date_text = date_text.split('\n')[0].strip()
-                        if date_text:
-                            result['publish_date'] = repair_encoding(date_text)
-                            log.debug(f"使用 Selenium 找到出版日期: {result['publish_date']}")
-                            break
-            except Exception as e:
-                log.debug(f"使用 Selenium 提取出版日期時發生錯誤: {e}")
-        
-        # === 提取定價（fixed_price）===
-        
-        # 方法1：查找 "定價"
-        price_elements = tree.xpath('//ul[@class="price"]/li[contains(text(), "定價")]/em/text()')
-        if price_elements:
-            result['fixed_price'] = price_elements[0].strip()
-            log.debug(f"找到定價: {result['fixed_price']}")
-        
-        # 方法2：查找 "組合商品原始售價"
-        if result['fixed_price'] == "N/A":
-            price_elements = tree.xpath('//ul[@class="price"]/li[contains(text(), "組合商品原始售價")]/em/text()')
-            if price_elements:
-                result['fixed_price'] = price_elements[0].strip()
-                log.debug(f"找到組合商品原始售價: {result['fixed_price']}")
-        
-        # 方法3：使用 Selenium 遍歷查找（只找定價和組合商品原始售價）
-        if result['fixed_price'] == "N/A":
-            try:
-                price_elements = driver.find_elements(By.XPATH, "//ul[@class='price']/li")
-                for element in price_elements:
-                    text = element.text
-                    # 只查找定價或組合商品原始售價，排除優惠價
-                    if '定價' in text or '組合商品原始售價' in text:
-                        # 提取數字（可能包含逗號）
-                        match = re.search(r'[\d,]+', text)
-                        if match:
-                            result['fixed_price'] = match.group(0)
-                            log.debug(f"使用 Selenium 找到價格: {result['fixed_price']}")
-                            break
-            except Exception as e:
-                log.debug(f"使用 Selenium 提取價格時發生錯誤: {e}")
-        
-        # === 提取原文書名 ===
-        original_title_elements = tree.xpath('//div[@class="mod type02_p002 clearfix"]//h2/a/text()')
-        if original_title_elements:
-            result['original_title'] = repair_encoding(original_title_elements[0].strip())
-            log.debug(f"找到原文書名: {result['original_title']}")
-        else:
+            log.debug(f"使用 Selenium 提取出版日期時發生錯誤: {e}")
+    
+    # 定價方法3：使用 Selenium 遍歷查找（只找定價和組合商品原始售價）
+    if 'fixed_price' in fields:
+        try:
+            price_elements = driver.find_elements(By.XPATH, "//ul[@class='price']/li")
+            for element in price_elements:
+                text = element.text
+                # 只查找定價或組合商品原始售價，排除優惠價
+                if '定價' in text or '組合商品原始售價' in text:
+                    # 提取數字（可能包含逗號）
+                    match = re.search(r'[\d,]+', text)
+                    if match:
+                        result['fixed_price'] = match.group(0)
+                        log.debug(f"使用 Selenium 找到價格: {result['fixed_price']}")
+                        break
+        except Exception as e:
+            log.debug(f"使用 Selenium 提取價格時發生錯誤: {e}")
+    
+    # 原文書名備用方法
+    if 'original_title' in fields:
+        try:
+            original_title_element = driver.find_element(By.CSS_SELECTOR, "div.mod.type02_p002.clearfix > h2 > a")
+            if original_title_element:
+                result['original_title'] = repair_encoding(original_title_element.text.strip())
+        except:
             try:
-                original_title_element = driver.find_element(By.CSS_SELECTOR, "div.mod.type02_p002.clearfix > h2 > a")
+                original_title_element = driver.find_element(By.XPATH, "//div[contains(@class, 'type02_p002')]//h2/a")
                 if original_title_element:
                     result['original_title'] = repair_encoding(original_title_element.text.strip())
             except:
-                try:
-                    original_title_element = driver.find_element(By.XPATH, "//div[contains(@class, 'type02_p002')]//h2/a")
-                    if original_title_element:
-                        result['original_title'] = repair_encoding(original_title_element.text.strip())
-                except:
-                    pass
-        
-        # === 提取分類 ===
-        # 方法1：使用 lxml xpath 從 ul.sort 中提取所有 <li> 的分類路徑
+                pass
+    
+    # 分類方法2：使用 Selenium 備用方法
+    if 'category' in fields:
         category_list = []
         try:
-            sort_ul = tree.xpath('//div[@class="mod_b type02_m058 clearfix"]//ul[@class="sort"]')
-            if sort_ul:
-                # 找到所有包含 "本書分類：" 的 <li>
-                category_lis = sort_ul[0].xpath('.//li[contains(text(), "本書分類：")]')
-                for li in category_lis:
-                    # 提取該 <li> 中所有 <a> 標籤的文本
-                    category_links = li.xpath('.//a/text()')
+            sort_ul_element = driver.find_element(By.CSS_SELECTOR, "ul.sort")
+            category_li_elements = sort_ul_element.find_elements(By.TAG_NAME, "li")
+            for li_element in category_li_elements:
+                li_text = li_element.text
+                if "本書分類：" in li_text:
+                    # 提取該 li 中的所有 <a> 標籤
+                    category_links = li_element.find_elements(By.TAG_NAME, "a")
                     if category_links:
-                        # 用 " > " 連接各個分類層級
-                        category_path = " > ".join([repair_encoding(c.strip()) for c in category_links])
+                        category_path = " > ".join([repair_encoding(a.text.strip()) for a in category_links if a.text.strip()])
                         category_list.append(category_path)
-                        log.debug(f"找到分類: {category_path}")
+                        log.debug(f"使用 Selenium 找到分類: {category_path}")
         except Exception as e:
-            log.debug(f"lxml 提取分類時發生錯誤: {e}")
+            log.debug(f"Selenium 提取分類時發生錯誤: {e}")
         
-        # 方法2：使用 Selenium 備用方法
-        if not category_list:
-            try:
-                sort_ul_element = driver.find_element(By.CSS_SELECTOR, "ul.sort")
-                category_li_elements = sort_ul_element.find_elements(By.TAG_NAME, "li")
-                for li_element in category_li_elements:
-                    li_text = li_element.text
-                    if "本書分類：" in li_text:
-                        # 提取該 li 中的所有 <a> 標籤
-                        category_links = li_element.find_elements(By.TAG_NAME, "a")
-                        if category_links:
-                            category_path = " > ".join([repair_encoding(a.text.strip()) for a in category_links if a.text.strip()])
-                            category_list.append(category_path)
-                            log.debug(f"使用 Selenium 找到分類: {category_path}")
-            except Exception as e:
-                log.debug(f"Selenium 提取分類時發生錯誤: {e}")
-        
-        # 將分類列表合併為字串（用分號分隔）
         if category_list:
             result['category'] = '; '.join(category_list)
             log.debug(f"成功提取分類: {result['category']}")
+    
+    return result
+
+
+def fetch_paper_book_info_with_selenium(driver, url, production_id="", retry_count=0, max_retries=2):
+    """使用 Selenium 爬取 Books.com.tw 紙本書的完整資訊（封鎖檢查與解析共用同一份頁面快照）"""
+    result = new_book_result()
+    
+    try:
+        # 訪問頁面
+        waited = SeleniumHelper.navigate_and_stop(driver, url, 'bookscom', timeout=CONTENT_WAIT_TIMEOUT)
+        log.debug(f"載入商品資訊 {waited['seconds']:.2f} 秒（{waited['reason']}）")
+        
+        # 取得一次頁面快照
+        page_source = driver.page_source
+        
+        # 檢查是否被封鎖或被導向登入頁（兩者都放慢並冷卻）
+        host_rate = browser_rate(url)
+        login_redirect = 'login' in driver.current_url.lower()
+        if login_redirect or is_blocked_html(page_source):
+            if login_redirect:
+                log.warning(f"⚠️  被重定向到登入頁面: {driver.current_url}")
+            else:
+                log.warning(f"⚠️  偵測到連線異常或被封鎖")
+            cooldown = RateController.shared().record_block(host_rate)
+            
+            # 使用 Tor 時先更換此瀏覽器 circuit 的出口 IP
+            if tor_pool is not None:
+                tor_pool.renew(driver)
+            
+            if retry_count < max_retries:
+                log.info(f"等待 {cooldown:.1f} 秒後重試 (第 {retry_count + 1}/{max_retries} 次，請求間隔已調整為 {host_rate.delay:.1f} 秒)")
+                time.sleep(cooldown)
+                
+                # 嘗試訪問首頁重新建立正常連線
+                SeleniumHelper.load_page(driver, "https://www.books.com.tw/", CONTENT_WAIT_TIMEOUT)
+                host_rate.wait()
+                
+                # 重試
+                return fetch_paper_book_info_with_selenium(driver, url, production_id, retry_count + 1, max_retries)
+            else:
+                log.error(f"❌ 達到最大重試次數，放棄此 URL")
+                raise Exception("連線被封鎖，無法完成爬取")
         
-        # 記錄結果
-        found_items = []
-        if result['isbn'] != 'N/A':
-            found_items.append(f"ISBN: {result['isbn']}")
-        if result['Publisher'] != 'N/A':
-            found_items.append(f"出版社: {result['Publisher']}")
-        if result['translator'] != 'N/A':
-            found_items.append(f"譯者: {result['translator']}")
-        if result['fixed_price'] != 'N/A':
-            found_items.append(f"定價: {result['fixed_price']}")
-        if result['original_title'] != 'N/A':
-            found_items.append(f"原文書名: {result['original_title']}")
-        if result['publish_date'] != 'N/A':
-            found_items.append(f"出版日期: {result['publish_date']}")
-        if result['category'] != 'N/A':
-            found_items.append(f"分類: {result['category']}")
-        
-        if found_items:
-            log.debug(f"成功提取: {', '.join(found_items)}")
+        RateController.shared().record_success(host_rate)
+        tree = html.fromstring(page_source)
+        absent_fields = set()
+        parse_paper_book_info(tree, result, absent_fields)
         
+        # 只有欄位所在區塊不在快照中時才查找即時 DOM
+        if absent_fields:
+            fill_missing_from_live_dom(driver, result, absent_fields)
+        
+        log_found_items(result)
         return result
         
     except Exception as e:
@@ -366,44 +507,147 @@ def fetch_paper_book_info_with_selenium(driver, url, production_id="", retry_cou
         return result
 
 
-def initialize_drivers(num_drivers=3):
+def log_found_items(result):
+    """記錄成功提取的欄位"""
+    found_items = []
+    if result['isbn'] != 'N/A':
+        found_items.append(f"ISBN: {result['isbn']}")
+    if result['Publisher'] != 'N/A':
+        found_items.append(f"出版社: {result['Publisher']}")
+    if result['translator'] != 'N/A':
+        found_items.append(f"譯者: {result['translator']}")
+    if result['fixed_price'] != 'N/A':
+        found_items.append(f"定價: {result['fixed_price']}")
+    if result['original_title'] != 'N/A':
+        found_items.append(f"原文書名: {result['original_title']}")
+    if result['publish_date'] != 'N/A':
+        found_items.append(f"出版日期: {result['publish_date']}")
+    if result['category'] != 'N/A':
+        found_items.append(f"分類: {result['category']}")
+    
+    if found_items:
+        log.debug(f"成功提取: {', '.join(found_items)}")
+
+
+def create_http_session(driver):
+    """
+    建立與已登入瀏覽器共用 cookies 與 User-Agent 的 requests.Session
+    
+    Args:
+        driver: 已登入的 WebDriver
+        
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    
+    try:
+        user_agent = driver.execute_script("return navigator.userAgent")
+    except Exception:
+        user_agent = HTTP_DEFAULT_USER_AGENT
+    
+    session.headers.update({
+        'User-Agent': user_agent or HTTP_DEFAULT_USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'zh-TW,zh;q=0.9,en;q=0.8',
+        'Referer': 'https://www.books.com.tw/'
+    })
+    refresh_http_session_cookies(session, driver)
+    
+    # 與瀏覽器走同一條 Tor circuit，避免同一個登入狀態出現在不同 IP
+    circuit = tor_pool.circuit_for(driver) if tor_pool is not None else None
+    if circuit is not None:
+        session.proxies.update(circuit.proxies)
+    return session
+
+
+def refresh_http_session_cookies(session, driver):
+    """將瀏覽器目前的 cookies 同步到 requests.Session"""
+    try:
+        for cookie in driver.get_cookies():
+            session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain'),
+                path=cookie.get('path', '/')
+            )
+    except Exception as e:
+        log.warning(f"同步瀏覽器 cookies 到 HTTP session 失敗: {e}")
+
+
+def fetch_paper_book_info_with_http(session, url, timeout=HTTP_TIMEOUT):
+    """
+    以 HTTP 直接抓取商品頁並使用與 Selenium 版本相同的 XPath 解析
+    
+    Returns:
+        tuple: (result, fallback_reason)
+            fallback_reason 為 None 表示結果完整可直接使用；
+            否則為需要改用瀏覽器的原因（blocked / login / age_gate / incomplete ...）
+    """
+    result = new_book_result()
+    
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        return result, f"request_error: {e}"
+    
+    if response.status_code != 200:
+        return result, f"http_status_{response.status_code}"
+    
+    page_source = response.text
+    
+    if is_blocked_html(page_source):
+        return result, "blocked"
+    
+    if 'login' in response.url.lower():
+        return result, "login"
+    
+    tree = html.fromstring(page_source)
+    
+    # 限制級商品會先顯示年齡確認頁，沒有商品資訊區塊
+    if not tree.xpath('//div[contains(@class, "type02_p003")]'):
+        if any(marker in page_source for marker in AGE_GATE_MARKERS):
+            return result, "age_gate"
+        return result, "missing_content"
+    
+    parse_paper_book_info(tree, result)
+    
+    # ISBN 或定價缺失時交給瀏覽器（可能需要執行 JavaScript 才會出現）
+    if result['isbn'] == 'N/A' or result['fixed_price'] == 'N/A':
+        return result, "incomplete"
+    
+    log_found_items(result)
+    return result, None
+
+
+def initialize_drivers(num_drivers=3, use_profile=False, attach_addresses=None):
     """
     初始化多個 Chrome 瀏覽器供用戶手動登入
     
     Args:
         num_drivers: 要開啟的瀏覽器數量
+        use_profile: 是否使用持久化設定檔（state/chrome_profiles/bookscom_<編號>），
+                     該編號的瀏覽器仍開著時直接接手，登入狀態保留到下次執行
+        attach_addresses: 要接手的已開啟 Chrome 除錯位址列表（HOST:PORT），依序作為瀏覽器 #1、#2 ...
         
     Returns:
         list: WebDriver 列表
     """
     drivers = []
+    attach_addresses = attach_addresses or []
+    keep_browsers = use_profile or bool(attach_addresses)
     
     print(f"\n正在啟動 {num_drivers} 個 Chrome 瀏覽器...")
     print("=" * 60)
     
     for i in range(num_drivers):
         try:
-            options = SeleniumHelper.get_chrome_options()
-            
-            # 反檢測設置
-            options.add_argument('--disable-blink-features=AutomationControlled')
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option('useAutomationExtension', False)
-            options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-            
-            # 設置不同的視窗位置，避免重疊
-            window_positions = [
-                (0, 0),      # 左上
-                (800, 0),    # 右上
-                (0, 500),    # 左下
-                (800, 500),  # 右下
-                (400, 250),  # 中間
-            ]
-            if i < len(window_positions):
-                x, y = window_positions[i]
-                options.add_argument(f'--window-position={x},{y}')
-            
-            driver = webdriver.Chrome(options=options)
+            if i < len(attach_addresses):
+                # 接手用戶自行開啟的瀏覽器，沿用其代理與登入狀態
+                driver = SeleniumHelper.attach_to_chrome(attach_addresses[i])
+                attached = True
+            else:
+                driver, attached = __launch_driver(i, use_profile)
             
             # 執行 JavaScript 隱藏 webdriver 屬性
             driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
@@ -434,16 +678,20 @@ def initialize_drivers(num_drivers=3):
             driver.execute_script(f"document.title = '博客來 - 瀏覽器 #{i+1} (請登入)'")
             
             drivers.append(driver)
-            print(f"✓ 瀏覽器 #{i+1} 已開啟")
-            log.info(f"瀏覽器 #{i+1} 初始化成功")
+            if attached:
+                print(f"✓ 瀏覽器 #{i+1} 已接手開啟中的 Chrome")
+                log.info(f"瀏覽器 #{i+1} 接手已開啟的 Chrome")
+            else:
+                print(f"✓ 瀏覽器 #{i+1} 已開啟")
+                log.info(f"瀏覽器 #{i+1} 初始化成功")
             
         except Exception as e:
             log.error(f"初始化瀏覽器 #{i+1} 失敗: {e}")
             print(f"❌ 瀏覽器 #{i+1} 啟動失敗: {e}")
-            # 關閉已開啟的瀏覽器
+            # 關閉已開啟的瀏覽器（持久化設定檔／接手模式只結束控制，瀏覽器保持開啟）
             for d in drivers:
                 try:
-                    d.quit()
+                    SeleniumHelper.release_driver(d, keep_browsers)
                 except:
                     pass
             return None
@@ -452,13 +700,86 @@ def initialize_drivers(num_drivers=3):
     return drivers
 
 
+def __launch_driver(index, use_profile=False):
+    """
+    啟動瀏覽器 #index+1（反檢測設置、視窗位置、Tor circuit）
+    
+    use_profile 時使用持久化設定檔，若該編號的瀏覽器仍開著則直接接手（沿用其原本的代理設定）
+    
+    Returns:
+        tuple: (driver, attached)
+    """
+    options = SeleniumHelper.get_chrome_options()
+    
+    # 反檢測設置
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    
+    # 設置不同的視窗位置，避免重疊
+    window_positions = [
+        (0, 0),      # 左上
+        (800, 0),    # 右上
+        (0, 500),    # 左下
+        (800, 500),  # 右下
+        (400, 250),  # 中間
+    ]
+    if index < len(window_positions):
+        x, y = window_positions[index]
+        options.add_argument(f'--window-position={x},{y}')
+    
+    # 每個瀏覽器使用各自的 Tor circuit（出口 IP）
+    circuit = tor_pool.pick() if tor_pool is not None else None
+    if circuit is not None:
+        options = SeleniumHelper.get_chrome_options_with_tor(circuit.socks_port, options)
+    
+    if use_profile:
+        driver, attached = SeleniumHelper.open_profile_driver('bookscom', index, options)
+    else:
+        driver, attached = webdriver.Chrome(options=options), False
+    # 接手的瀏覽器沿用上次啟動時的代理，不分配新的 circuit
+    if circuit is not None and not attached:
+        tor_pool.assign(driver, circuit)
+    return driver, attached
+
+
+def is_logged_in(driver):
+    """瀏覽器目前的博客來頁面是否為已登入狀態"""
+    try:
+        page_source = driver.page_source
+    except Exception:
+        return False
+    return any(marker in page_source for marker in BOOKSCOM_LOGGED_IN_MARKERS)
+
+
 def wait_for_manual_login(drivers):
     """
-    等待用戶在所有瀏覽器中完成手動登入
+    等待用戶在所有瀏覽器中完成手動登入（所有瀏覽器都已登入時直接繼續）
     
     Args:
         drivers: WebDriver 列表
     """
+    pending = [i + 1 for i, driver in enumerate(drivers) if not is_logged_in(driver)]
+    if not pending:
+        print(f"\n✅ {len(drivers)} 個瀏覽器皆已登入，略過手動登入")
+        log.info("所有瀏覽器皆已登入，略過手動登入")
+    else:
+        __prompt_manual_login(drivers, pending)
+    
+    # 更新視窗標題
+    for i, driver in enumerate(drivers):
+        try:
+            driver.execute_script(f"document.title = '博客來 - 瀏覽器 #{i+1} (爬取中...)'")
+        except:
+            pass
+    
+    log.info("用戶確認已完成所有登入，開始爬取資訊")
+    print("\n✅ 開始使用多線程爬取...\n")
+
+
+def __prompt_manual_login(drivers, pending):
+    """提示用戶在尚未登入的瀏覽器中登入，按 Enter 後繼續"""
     print("\n" + "="*60)
     print("【重要】請在每個瀏覽器中完成以下步驟：")
     print("="*60)
@@ -470,22 +791,14 @@ def wait_for_manual_login(drivers):
     print("  3. 確認通過年齡驗證，可以正常瀏覽限制級內容")
     print()
     print(f"提示：瀏覽器視窗標題會顯示 '瀏覽器 #1', '瀏覽器 #2' 等以便識別")
+    if len(pending) < len(drivers):
+        print(f"尚未登入的瀏覽器: {', '.join(f'#{i}' for i in pending)}（其餘已登入）")
     print("="*60)
     
     input(f"\n完成所有 {len(drivers)} 個瀏覽器的登入後，按 Enter 鍵繼續爬取...")
-    
-    # 更新視窗標題
-    for i, driver in enumerate(drivers):
-        try:
-            driver.execute_script(f"document.title = '博客來 - 瀏覽器 #{i+1} (爬取中...)'")
-        except:
-            pass
-    
-    log.info("用戶確認已完成所有登入，開始爬取資訊")
-    print("\n✅ 開始使用多線程爬取...\n")
 
 
-def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, total_rows):
+def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, total_rows, http_session=None):
     """
     使用共享的已登入 WebDriver 爬取單本書
     
@@ -495,8 +808,11 @@ def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, tota
         driver_id: 瀏覽器編號
         output_file: 輸出檔案路徑
         total_rows: 總行數
+        http_session: 共用瀏覽器 cookies 的 requests.Session，提供時先以 HTTP 抓取，
+                      遇到封鎖、年齡驗證或欄位不完整才改用瀏覽器
     """
     global global_success_count, global_fail_count, global_processed_count
+    global global_http_count, global_browser_fallback_count
     
     idx, row = row_data
     url = row['url']
@@ -517,8 +833,36 @@ def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, tota
     }
     
     try:
-        # 使用傳入的 driver 爬取
-        result = fetch_paper_book_info_with_selenium(driver, url, production_id, retry_count=0, max_retries=2)
+        result = None
+        used_http = False
+        
+        # HTTP 優先：大部分書籍只需要靜態 HTML
+        if http_session is not None:
+            http_result, fallback_reason = fetch_paper_book_info_with_http(http_session, url)
+            if fallback_reason in ("blocked", "login"):
+                # 冷卻後才改用瀏覽器，避免立即以瀏覽器再次請求同一主機
+                cooldown = RateController.shared().record_block(http_rate(url))
+                log.warning(f"瀏覽器 #{driver_id} HTTP 抓取被拒（{fallback_reason}），冷卻 {cooldown:.0f} 秒後改用瀏覽器")
+                time.sleep(cooldown)
+            elif fallback_reason is None:
+                RateController.shared().record_success(http_rate(url))
+            if fallback_reason is None:
+                result = http_result
+                used_http = True
+                with progress_lock:
+                    global_http_count += 1
+            else:
+                log.info(f"瀏覽器 #{driver_id} HTTP 抓取 {url} 需改用瀏覽器: {fallback_reason}")
+                with progress_lock:
+                    global_browser_fallback_count += 1
+        
+        if result is None:
+            # 使用傳入的 driver 爬取
+            result = fetch_paper_book_info_with_selenium(driver, url, production_id, retry_count=0, max_retries=2)
+            
+            # 瀏覽器可能更新了 cookies（例如通過年齡驗證），同步回 HTTP session
+            if http_session is not None:
+                refresh_http_session_cookies(http_session, driver)
         
         result_data['isbn'] = result['isbn']
         result_data['Publisher'] = result['Publisher']
@@ -537,8 +881,11 @@ def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, tota
             with progress_lock:
                 global_fail_count += 1
         
-        # 隨機延遲（增加延遲時間避免被封鎖）
-        time.sleep(random.uniform(5, 10))
+        # 依該主機目前的自適應間隔等待（HTTP 與瀏覽器分開計算）
+        if used_http:
+            http_rate(url).wait()
+        else:
+            browser_rate(url).wait()
         
     except Exception as e:
         result_data['error'] = str(e)
@@ -613,7 +960,7 @@ def fetch_book_with_shared_driver(row_data, driver, driver_id, output_file, tota
     return result_data
 
 
-def worker_thread(driver, driver_id, task_queue, df, output_file, total_rows):
+def worker_thread(driver, driver_id, task_queue, df, output_file, total_rows, http_first=False):
     """
     工作線程：從佇列中取任務並使用指定的 driver 處理
     
@@ -624,9 +971,12 @@ def worker_thread(driver, driver_id, task_queue, df, output_file, total_rows):
         df: DataFrame
         output_file: 輸出檔案路徑
         total_rows: 總行數
+        http_first: 是否先以 HTTP（共用此瀏覽器的 cookies）抓取
     """
     log.info(f"工作線程 (瀏覽器 #{driver_id}) 已啟動")
     
+    http_session = create_http_session(driver) if http_first else None
+    
     while True:
         try:
             # 從佇列中取任務（超時 1 秒）
@@ -637,11 +987,27 @@ def worker_thread(driver, driver_id, task_queue, df, output_file, total_rows):
                 break
             
             # 處理任務
-            result_data = fetch_book_with_shared_driver(task, driver, driver_id, output_file, total_rows)
+            url = task[1]['url']
+            if crawl_frontier is not None:
+                crawl_frontier.claim(url)
             
-            # 保存結果
-            if output_file:
-                save_result_to_csv(df, result_data, output_file)
+            result_data = fetch_book_with_shared_driver(task, driver, driver_id, output_file, total_rows, http_session)
+            if tor_pool is not None:
+                tor_pool.record_request(driver)
+            
+            if book_catalog is not None and result_data['success']:
+                book_catalog.update('bookscom', task[1].get('production_id', ''), {
+                    column: result_data.get(key, 'N/A') for column, key in RESULT_FIELD_MAPPING.items()
+                })
+            
+            # 保存結果（寫入日誌或 CSV 成功後才更新進度，寫入失敗時保留 in_flight，續跑時會重新爬取）
+            saved = save_result_to_csv(df, result_data, output_file) if output_file else True
+            
+            if crawl_frontier is not None and saved:
+                if result_data['isbn'] != 'N/A' and result_data['fixed_price'] != 'N/A':
+                    crawl_frontier.mark_done(url)
+                else:
+                    crawl_frontier.mark_failed(url, result_data['error'] or "缺少 ISBN 或定價")
             
             # 標記任務完成
             task_queue.task_done()
@@ -655,26 +1021,113 @@ def worker_thread(driver, driver_id, task_queue, df, output_file, total_rows):
             except:
                 pass
     
+    if http_session is not None:
+        http_session.close()
+    
     log.info(f"工作線程 (瀏覽器 #{driver_id}) 已結束")
 
 
+def apply_result_to_df(df, result_data):
+    """將單本書的爬取結果寫入 DataFrame 對應的列"""
+    idx = result_data['idx']
+    for column, key in RESULT_FIELD_MAPPING.items():
+        df.at[idx, column] = result_data.get(key, 'N/A')
+
+
+def write_df_to_csv(df, output_file):
+    """將 DataFrame 寫入 CSV"""
+    df.to_csv(output_file, index=False, encoding='utf-8-sig')
+
+
 def save_result_to_csv(df, result_data, output_file):
-    """線程安全地保存結果到 CSV"""
+    """
+    線程安全地保存結果到 CSV
+    
+    日誌模式下只追加一行到日誌，達到門檻才合併寫回 CSV；
+    否則維持原本每本書重寫整份 CSV 的行為
+    
+    Returns:
+        bool: 結果是否已寫入磁碟（日誌或 CSV）
+    """
     with file_write_lock:
         try:
-            idx = result_data['idx']
-            df.at[idx, 'ISBN'] = result_data['isbn']
-            df.at[idx, 'Publisher'] = result_data['Publisher']
-            df.at[idx, 'translator'] = result_data['translator']
-            df.at[idx, 'fixed_price'] = result_data['fixed_price']
-            df.at[idx, 'original_title'] = result_data['original_title']
-            df.at[idx, 'publish_date'] = result_data['publish_date']
-            df.at[idx, 'category'] = result_data['category']
+            apply_result_to_df(df, result_data)
+            
+            if result_journal is None:
+                # 即時寫入
+                write_df_to_csv(df, output_file)
+                return True
             
-            # 即時寫入
-            df.to_csv(output_file, index=False, encoding='utf-8-sig')
+            record = {'idx': int(result_data['idx'])}
+            record.update({key: result_data.get(key, 'N/A') for key in RESULT_FIELD_MAPPING.values()})
+            if result_journal.append(record):
+                try:
+                    result_journal.compact(lambda path: write_df_to_csv(df, path), output_file)
+                    log.info(f"日誌已合併寫回 CSV: {output_file}")
+                except Exception as e:
+                    # 結果已在日誌中，下次合併或重播時仍會寫回
+                    log.error(f"合併日誌時發生錯誤（日誌保留）: {e}")
+            return True
         except Exception as e:
             log.error(f"保存結果時發生錯誤: {e}")
+            return False
+
+
+def open_result_journal(df, output_file):
+    """
+    開啟結果日誌並重播上次未合併的記錄
+    
+    Returns:
+        set: 日誌中已完成的列索引（本次不需再爬取）；ISBN 與定價都是 N/A 的失敗記錄不算完成，本次會重試
+    """
+    global result_journal
+    
+    result_journal = JournalWriter(f"{output_file}.journal.jsonl", JOURNAL_COMPACT_EVERY)
+    records = result_journal.replay()
+    
+    done_indices = set()
+    for record in records:
+        idx = record.get('idx')
+        if idx is None or idx not in df.index:
+            continue
+        if record.get('isbn', 'N/A') == 'N/A' and record.get('fixed_price', 'N/A') == 'N/A':
+            continue
+        apply_result_to_df(df, record)
+        done_indices.add(idx)
+    
+    if done_indices:
+        print(f"✓ 從日誌重播 {len(done_indices)} 筆已完成的資料，將跳過這些書籍")
+        log.info(f"從日誌重播 {len(done_indices)} 筆已完成的資料: {result_journal.journal_path}")
+        result_journal.compact(lambda path: write_df_to_csv(df, path), output_file)
+    
+    return done_indices
+
+
+def close_result_journal(df, output_file, clear=True):
+    """
+    將日誌最後一次合併寫回 CSV
+    
+    clear=True（整個執行正常完成）時合併成功後刪除日誌；中斷或發生錯誤時傳入 False，
+    日誌保留在磁碟上供下次執行重播
+    """
+    global result_journal
+    
+    if result_journal is None:
+        return
+    
+    with file_write_lock:
+        try:
+            result_journal.compact(lambda path: write_df_to_csv(df, path), output_file)
+            if clear:
+                result_journal.clear()
+                log.info(f"日誌已合併寫回 CSV 並清除: {output_file}")
+            else:
+                log.info(f"日誌已合併寫回 CSV，日誌保留供下次重播: {result_journal.journal_path}")
+        except Exception as e:
+            log.error(f"合併日誌時發生錯誤（日誌保留，可於下次執行時重播）: {e}")
+            print(f"❌ 合併日誌時發生錯誤，日誌保留於: {result_journal.journal_path}")
+        finally:
+            result_journal = None
 
 
 def read_csv_data(csv_path):
@@ -714,8 +1167,109 @@ def read_csv_data(csv_path):
         return None, None
 
 
+def is_row_complete(row):
+    """ISBN 與定價都已有值的列不需再爬取"""
+    for column in ('ISBN', 'fixed_price'):
+        value = row.get(column)
+        if pd.isna(value) or str(value).strip() in ('', 'N/A'):
+            return False
+    return True
+
+
+def open_crawl_frontier(df, csv_path, resume=False):
+    """
+    開啟爬取進度記錄
+    
+    續跑時跳過上次已完成（或失敗次數已達上限）的 URL，以及 ISBN 與定價都已有值的列
+    
+    Returns:
+        set: 本次應跳過的列索引
+    """
+    global crawl_frontier
+    
+    crawl_frontier = CrawlFrontier('bookscom', csv_path)
+    urls = [url for url in df['url'].tolist() if isinstance(url, str)]
+    skipped_urls = crawl_frontier.prepare(urls, resume)
+    
+    if not resume:
+        return set()
+    
+    skip_indices = set()
+    for idx in range(len(df)):
+        row = df.iloc[idx]
+        if row['url'] in skipped_urls:
+            skip_indices.add(idx)
+        elif is_row_complete(row):
+            crawl_frontier.mark_done(row['url'])
+            skip_indices.add(idx)
+    
+    print(f"✓ 續跑模式：跳過 {len(skip_indices)} 筆已完成的資料")
+    log.info(f"續跑模式：跳過 {len(skip_indices)} 筆已完成的資料，目前進度 {crawl_frontier.counts()}")
+    return skip_indices
+
+
+def open_book_catalog(df, production_id_col, output_file):
+    """
+    開啟書目資料庫，以未過期的欄位預先填入 CSV 中的空欄位
+    
+    Returns:
+        set: ISBN 與定價都已知（不需重新爬取）的列索引
+    """
+    global book_catalog
+    
+    book_catalog = BookCatalog()
+    if not production_id_col:
+        log.warning("CSV 中沒有 production_id 欄位，無法使用書目資料庫")
+        return set()
+    
+    known_indices = set()
+    prefilled_rows = 0
+    for idx in range(len(df)):
+        fields = book_catalog.lookup('bookscom', df.iloc[idx][production_id_col])
+        if not fields:
+            continue
+        
+        prefilled = False
+        for column in RESULT_FIELD_MAPPING:
+            if column in fields and BookCatalog.is_empty(df.iloc[idx][column]):
+                df.at[idx, column] = fields[column]
+                prefilled = True
+        if prefilled:
+            prefilled_rows += 1
+        if book_catalog.is_known(fields):
+            known_indices.add(idx)
+    
+    if prefilled_rows:
+        with file_write_lock:
+            write_df_to_csv(df, output_file)
+    
+    print(f"✓ 書目資料庫：預先填入 {prefilled_rows} 筆，{len(known_indices)} 筆已知書籍不需重新爬取")
+    log.info(f"書目資料庫：預先填入 {prefilled_rows} 筆，{len(known_indices)} 筆已知書籍不需重新爬取")
+    return known_indices
+
+
+def close_book_catalog():
+    """關閉書目資料庫"""
+    global book_catalog
+    
+    if book_catalog is not None:
+        book_catalog.close()
+        book_catalog = None
+
+
+def close_crawl_frontier():
+    """關閉爬取進度記錄"""
+    global crawl_frontier
+    
+    if crawl_frontier is not None:
+        log.info(f"爬取進度: {crawl_frontier.counts()}")
+        crawl_frontier.close()
+        crawl_frontier = None
+
+
 def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=None, 
-                                      failed_urls_file=None, output_file=None):
+                                      failed_urls_file=None, output_file=None, http_first=False,
+                                      skip_indices=None):
     """
     使用多個已登入的瀏覽器進行多線程爬取
     
@@ -726,13 +1280,18 @@ def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=
         max_books: 最多爬取的書籍數量
         failed_urls_file: 失敗記錄檔案路徑
         output_file: 輸出檔案路徑
+        http_first: 是否先以 HTTP 抓取，必要時才使用瀏覽器
+        skip_indices: 已完成（例如從日誌重播）而不需再爬取的列索引
     """
     global global_success_count, global_fail_count, global_processed_count
+    global global_http_count, global_browser_fallback_count
     
     # 重置計數器
     global_success_count = 0
     global_fail_count = 0
     global_processed_count = 0
+    global_http_count = 0
+    global_browser_fallback_count = 0
     
     total_rows = len(df) if max_books is None else min(max_books, len(df))
     num_workers = len(drivers)
@@ -741,7 +1300,10 @@ def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=
     task_queue = queue.Queue()
     
     # 將所有任務放入佇列
+    skip_indices = skip_indices or set()
     for idx in range(total_rows):
+        if idx in skip_indices:
+            continue
         task_queue.put((idx, df.iloc[idx]))
     
     print(f"開始多線程爬取，使用 {num_workers} 個已登入的瀏覽器")
@@ -755,7 +1317,7 @@ def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=
     for i, driver in enumerate(drivers):
         thread = threading.Thread(
             target=worker_thread,
-            args=(driver, i+1, task_queue, df, output_file, total_rows),
+            args=(driver, i+1, task_queue, df, output_file, total_rows, http_first),
             name=f"Worker-{i+1}"
         )
         thread.daemon = True
@@ -779,6 +1341,10 @@ def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=
     
     log.info(f"爬取完成: 成功 {global_success_count} 本, 失敗 {global_fail_count} 本")
     
+    if http_first:
+        print(f"HTTP 直接完成 {global_http_count} 本, 改用瀏覽器 {global_browser_fallback_count} 本")
+        log.info(f"HTTP 直接完成 {global_http_count} 本, 改用瀏覽器 {global_browser_fallback_count} 本")
+    
     # 保存 error 記錄到檔案
     if error_records:
         try:
@@ -806,13 +1372,67 @@ def fetch_info_with_multiple_browsers(df, drivers, production_id_col, max_books=
     return df
 
 
-def Excute(csv_path=None, num_browsers=3):
+def open_tor_pool():
+    """建立 Tor circuit 池並檢查各端點，沒有可用的 circuit 時回傳 False"""
+    global tor_pool
+    
+    tor_pool = TorCircuitPool(log=log)
+    healthy = tor_pool.health_check()
+    if not healthy:
+        print("⚠️  沒有可用的 Tor circuit，將使用直接連接")
+        log.warning("沒有可用的 Tor circuit，將使用直接連接")
+        tor_pool = None
+        return False
+    
+    print(f"✓ Tor circuit 可用: {len(healthy)}/{len(tor_pool.circuits)} 條")
+    return True
+
+
+def close_tor_pool():
+    """記錄各 circuit 的使用統計"""
+    global tor_pool
+    
+    if tor_pool is not None:
+        log.info(f"Tor circuit 使用統計: {tor_pool.summary()}")
+        tor_pool = None
+
+
+def open_cache_proxy():
+    """啟動本機快取代理，之後建立的瀏覽器都經由它連線"""
+    global cache_proxy
+    
+    cache_proxy = SeleniumHelper.enable_cache_proxy()
+    log.info(f"快取代理: {cache_proxy.address}")
+
+
+def close_cache_proxy():
+    """記錄快取命中率"""
+    global cache_proxy
+    
+    if cache_proxy is not None:
+        print(f"快取代理統計: {cache_proxy.summary()}")
+        log.info(f"快取代理統計: {cache_proxy.summary()}")
+        SeleniumHelper.disable_cache_proxy()
+        cache_proxy = None
+
+
+def Excute(csv_path=None, num_browsers=3, http_first=False, use_journal=True, resume=False, use_catalog=True,
+           use_tor=False, lean=False, use_cache_proxy=False, use_profile=False, attach_addresses=None):
     """
     主執行函數 - 多瀏覽器手動登入版本
     
     Args:
         csv_path: CSV 檔案路徑
         num_browsers: 瀏覽器數量（建議 3-4）
+        http_first: 是否先以 HTTP 抓取商品頁（共用已登入瀏覽器的 cookies），必要時才使用瀏覽器
+        use_journal: 是否使用日誌模式（結果先追加到日誌，定期及結束時合併寫回 CSV）
+        resume: 是否從上次中斷處繼續（跳過已完成的 URL 與 ISBN、定價都已有值的列）
+        use_catalog: 是否使用書目資料庫（預先填入已知書籍的欄位，只爬取未知或過期的書籍）
+        use_tor: 是否經由 Tor 連線（每個瀏覽器一條 circuit，被封鎖時更換出口 IP）
+        lean: 精簡模式，登入完成後封鎖圖片、字型、影音與追蹤器（登入頁的驗證碼圖片不受影響）
+        use_cache_proxy: 是否經由本機快取代理連線（靜態資源從磁碟快取回應，使用 Tor 的瀏覽器不經快取）
+        use_profile: 是否使用持久化設定檔（登入狀態保留，結束後瀏覽器保持開啟，下次執行直接接手）
+        attach_addresses: 要接手的已開啟 Chrome 除錯位址列表（HOST:PORT），結束後同樣保持開啟
     """
     global error_records
     
@@ -823,6 +1443,16 @@ def Excute(csv_path=None, num_browsers=3):
     log.info("=" * 60)
     log.info(f"開始執行 Books.com.tw 紙本書詳細資訊爬取 (多瀏覽器手動登入版本)")
     log.info(f"瀏覽器數: {num_browsers}")
+    log.info(f"HTTP 優先模式: {'開啟' if http_first else '關閉'}")
+    log.info(f"日誌模式: {'開啟' if use_journal else '關閉'}")
+    log.info(f"續跑模式: {'開啟' if resume else '關閉'}")
+    log.info(f"書目資料庫: {'開啟' if use_catalog else '關閉'}")
+    log.info(f"Tor: {'開啟' if use_tor else '關閉'}")
+    log.info(f"精簡模式: {'開啟' if lean else '關閉'}")
+    log.info(f"快取代理: {'開啟' if use_cache_proxy else '關閉'}")
+    log.info(f"持久化設定檔: {'開啟' if use_profile else '關閉'}")
+    if attach_addresses:
+        log.info(f"接手瀏覽器: {', '.join(attach_addresses)}")
     log.info(f"時間: {start_time}")
     log.info("=" * 60)
     
@@ -838,6 +1468,8 @@ def Excute(csv_path=None, num_browsers=3):
     print("="*60)
     
     drivers = None
+    df = None
+    output_file = None
     
     try:
         # 讀取 CSV
@@ -870,8 +1502,18 @@ def Excute(csv_path=None, num_browsers=3):
         print(f"將動態更新原始檔案: {output_file}")
         log.info(f"將動態更新原始檔案: {output_file}")
         
+        # 日誌模式：重播上次中斷前已完成的資料
+        skip_indices = open_result_journal(df, output_file) if use_journal else set()
+        skip_indices |= open_crawl_frontier(df, csv_path, resume)
+        if use_catalog:
+            skip_indices |= open_book_catalog(df, production_id_col, output_file)
+        
         # 初始化多個瀏覽器
-        drivers = initialize_drivers(num_browsers)
+        if use_tor:
+            open_tor_pool()
+        if use_cache_proxy:
+            open_cache_proxy()
+        drivers = initialize_drivers(num_browsers, use_profile, attach_addresses)
         if not drivers:
             print("❌ 瀏覽器初始化失敗")
             return False
@@ -879,6 +1521,12 @@ def Excute(csv_path=None, num_browsers=3):
         # 等待手動登入
         wait_for_manual_login(drivers)
         
+        # 精簡模式：登入後才封鎖圖片等資源，避免影響登入驗證碼
+        if lean:
+            for driver in drivers:
+                SeleniumHelper.apply_lean_profile(driver)
+            log.info("已套用精簡模式")
+        
         # 使用已登入的瀏覽器進行爬取
         df = fetch_info_with_multiple_browsers(
             df, 
@@ -886,9 +1534,13 @@ def Excute(csv_path=None, num_browsers=3):
             production_id_col, 
             None, 
             failed_urls_file, 
-            output_file
+            output_file,
+            http_first,
+            skip_indices
         )
         
+        close_result_journal(df, output_file)
+        
         # 統計結果
         isbn_count = df['ISBN'].astype(str).ne('N/A').sum()
         publisher_count = df['Publisher'].astype(str).ne('N/A').sum()
@@ -932,33 +1584,67 @@ def Excute(csv_path=None, num_browsers=3):
         return False
     
     finally:
-        # 關閉所有瀏覽器
+        # 中斷或發生錯誤時，仍將日誌合併寫回 CSV，但保留日誌（正常完成時已於上方清除）
+        if df is not None and output_file:
+            close_result_journal(df, output_file, clear=False)
+        close_crawl_frontier()
+        close_book_catalog()
+        close_tor_pool()
+        close_cache_proxy()
+        close_rate_controller()
+        log_parse_stats()
+        wait_stats = SeleniumHelper.get_content_wait_stats()
+        if wait_stats:
+            log.info(f"頁面內容等待統計: {wait_stats}")
+        
+        # 關閉所有瀏覽器（持久化設定檔／接手模式只結束控制，瀏覽器保持開啟供下次接手）
+        keep_browsers = use_profile or bool(attach_addresses)
         if drivers:
             print("\n正在關閉所有瀏覽器...")
             for i, driver in enumerate(drivers):
                 try:
-                    driver.quit()
-                    print(f"✓ 瀏覽器 #{i+1} 已關閉")
-                    log.info(f"瀏覽器 #{i+1} 已關閉")
+                    SeleniumHelper.release_driver(driver, keep_browsers)
+                    print(f"✓ 瀏覽器 #{i+1} {'保持開啟' if keep_browsers else '已關閉'}")
+                    log.info(f"瀏覽器 #{i+1} {'保持開啟' if keep_browsers else '已關閉'}")
                 except Exception as e:
                     log.error(f"關閉瀏覽器 #{i+1} 時發生錯誤: {e}")
-            log.info("所有瀏覽器已關閉")
+            log.info("所有瀏覽器已保持開啟" if keep_browsers else "所有瀏覽器已關閉")
 
 
 if __name__ == "__main__":
     try:
+        # 用法: python bookscom_ranking_detail.py <CSV路徑> <瀏覽器數量> [--http-first] [--no-journal] [--resume] [--no-catalog] [--tor] [--lean] [--cache-proxy] [--profile] [--attach=HOST:PORT[,HOST:PORT...]]
         csv_path = None
         num_browsers = 3  # 預設 3 個瀏覽器
         
-        if len(sys.argv) >= 2:
-            csv_path = sys.argv[1]
-        if len(sys.argv) >= 3:
+        flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+        positional = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        http_first = '--http-first' in flags
+        use_journal = '--no-journal' not in flags
+        resume = '--resume' in flags
+        use_catalog = '--no-catalog' not in flags
+        use_tor = '--tor' in flags
+        lean = '--lean' in flags
+        use_cache_proxy = '--cache-proxy' in flags
+        use_profile = '--profile' in flags
+        attach_addresses = []
+        for flag in flags:
+            if flag.startswith('--attach='):
+                attach_addresses += [address.strip() for address in flag.split('=', 1)[1].split(',') if address.strip()]
+        
+        if len(positional) >= 1:
+            csv_path = positional[0]
+        if len(positional) >= 2:
             try:
-                num_browsers = int(sys.argv[2])
+                num_browsers = int(positional[1])
             except ValueError:
                 print("⚠️  瀏覽器數量必須是整數，使用預設值 3")
                 num_browsers = 3
         
+        # 接手的瀏覽器數量多於指定數量時，全部接手
+        if len(attach_addresses) > num_browsers:
+            num_browsers = len(attach_addresses)
+        
         # 限制瀏覽器數量
         if num_browsers < 1:
             print("⚠️  瀏覽器數量至少為 1，已調整為 1")
@@ -967,7 +1653,8 @@ if __name__ == "__main__":
             print("⚠️  瀏覽器數量不建議超過 5 個，已限制為 5")
             num_browsers = 5
         
-        success = Excute(csv_path, num_browsers)
+        success = Excute(csv_path, num_browsers, http_first, use_journal, resume, use_catalog, use_tor, lean, use_cache_proxy,
+                         use_profile, attach_addresses)
         
         if success:
             print("\n✅ Books.com.tw 紙本書詳細資訊爬取完成！")
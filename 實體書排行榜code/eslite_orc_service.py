@@ -11,6 +11,10 @@
 5. 腳本會自動獲取並返回 cookies
 
 注意：不要關閉自動打開的瀏覽器視窗，直到腳本完成
+
+--profile 使用持久化設定檔（state/chrome_profiles/eslite_0），結束後瀏覽器保持開啟，
+下次執行直接接手；已登入時略過手動登入，直接匯出 cookies。
+--attach=HOST:PORT 接手以 --remote-debugging-port 開啟的 Chrome。
 """
 
 import sys
@@ -33,8 +37,13 @@ from datetime import datetime
 log = LogHelper('eslite_orc_service')
 scale_factor = Config.SCALE_FACTOR
 
-def login_and_get_cookies(use_tor=False):
+# 登入後頁面上的會員相關元素
+member_xpath = "//*[contains(text(), '會員中心') or contains(text(), '我的帳戶')]"
+
+def login_and_get_cookies(use_tor=False, use_profile=False, attach_address=None):
     driver = None
+    # 持久化設定檔／接手模式：結束時只結束 ChromeDriver，瀏覽器保持開啟供下次接手
+    keep_browser = use_profile or bool(attach_address)
     try:
         # 根據參數決定是否使用Tor代理，默認不使用
         if use_tor:
@@ -47,10 +56,21 @@ def login_and_get_cookies(use_tor=False):
         # 改善ChromeDriver初始化，加入更多錯誤處理
         try:
             print("正在初始化ChromeDriver...")
-            driver = SeleniumHelper.init_driver_with_options(chrome_options)
+            if attach_address:
+                # 接手的瀏覽器沿用其原本的代理設定
+                driver = SeleniumHelper.attach_to_chrome(attach_address)
+                print(f"已接手 {attach_address} 的瀏覽器")
+            elif use_profile:
+                driver, attached = SeleniumHelper.open_profile_driver('eslite', 0, chrome_options)
+                print("已接手上次的瀏覽器" if attached else f"使用持久化設定檔: {SeleniumHelper.get_profile_dir('eslite', 0)}")
+            else:
+                driver = SeleniumHelper.init_driver_with_options(chrome_options)
             print("ChromeDriver初始化成功")
         except Exception as e:
             print(f"ChromeDriver初始化失敗: {e}")
+            if keep_browser:
+                # 不強制終止 Chrome，避免關閉要保留的瀏覽器
+                raise
             # 嘗試清理並重新初始化
             try:
                 import subprocess
@@ -79,28 +99,11 @@ def login_and_get_cookies(use_tor=False):
         except:
             pass  # 可能沒有cookie提示
 
-        # 導航到登入頁面
-        print("正在前往登入頁面...")
-        driver.get("https://www.eslite.com/login")
-        time.sleep(3)
-        
-        # 等待登入表單載入
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "account"))
-            )
-            print("登入頁面已載入")
-        except:
-            print("等待登入頁面載入時發生錯誤，但繼續...")
-        
-        # 手動登入模式
-        print("\n" + "="*60)
-        print("請在瀏覽器中手動完成登入")
-        print("登入完成後，請在此處按 Enter 繼續...")
-        print("="*60 + "\n")
-        
-        # 等待用戶按 Enter
-        input("按 Enter 繼續...")
+        if keep_browser and __is_logged_in(driver):
+            print("✓ 瀏覽器已是登入狀態，略過手動登入")
+            log.info("瀏覽器已是登入狀態，略過手動登入")
+        else:
+            __manual_login(driver)
         
         # 給予額外時間讓登入完成
         time.sleep(2)
@@ -116,7 +119,7 @@ def login_and_get_cookies(use_tor=False):
             
             # 嘗試尋找會員相關元素
             try:
-                member_element = driver.find_element(By.XPATH, "//*[contains(text(), '會員中心') or contains(text(), '我的帳戶')]")
+                member_element = driver.find_element(By.XPATH, member_xpath)
                 print("✓ 找到會員相關元素，確認登入成功！")
             except:
                 print("⚠ 未找到明確的會員元素，但繼續嘗試獲取cookies")
@@ -171,21 +174,53 @@ def login_and_get_cookies(use_tor=False):
                 print(f"保存截圖失敗: {e}")
             
             try:
-                driver.quit()
-                print("ChromeDriver已正常關閉")
+                SeleniumHelper.release_driver(driver, keep_browser)
+                print("ChromeDriver已正常關閉" + ("（瀏覽器保持開啟，下次執行可直接接手）" if keep_browser else ""))
             except Exception as e:
                 print(f"關閉ChromeDriver時發生錯誤: {e}")
-                # 強制終止Chrome進程
+                # 強制終止Chrome進程（要保留的瀏覽器不終止）
                 try:
                     import subprocess
                     import platform
-                    if platform.system() == "Windows":
+                    if platform.system() == "Windows" and not keep_browser:
                         subprocess.run("taskkill /f /im chrome.exe", shell=True, capture_output=True)
                         subprocess.run("taskkill /f /im chromedriver.exe", shell=True, capture_output=True)
                         print("已強制終止Chrome進程")
                 except Exception as e2:
                     print(f"強制終止進程也失敗: {e2}")
 
+def __is_logged_in(driver):
+    """首頁上是否已出現會員相關元素（已登入）"""
+    try:
+        return len(driver.find_elements(By.XPATH, member_xpath)) > 0
+    except Exception:
+        return False
+
+def __manual_login(driver):
+    """前往登入頁面，等待用戶在瀏覽器中手動登入後按 Enter"""
+    # 導航到登入頁面
+    print("正在前往登入頁面...")
+    driver.get("https://www.eslite.com/login")
+    time.sleep(3)
+    
+    # 等待登入表單載入
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.ID, "account"))
+        )
+        print("登入頁面已載入")
+    except:
+        print("等待登入頁面載入時發生錯誤，但繼續...")
+    
+    # 手動登入模式
+    print("\n" + "="*60)
+    print("請在瀏覽器中手動完成登入")
+    print("登入完成後，請在此處按 Enter 繼續...")
+    print("="*60 + "\n")
+    
+    # 等待用戶按 Enter
+    input("按 Enter 繼續...")
+
 def __get_cookies(driver):
     """獲取瀏覽器的所有 cookies"""
     all_cookies = driver.get_cookies()
@@ -232,10 +267,10 @@ def __save_cookies_to_file(cookies):
 # def __set_login_info(driver):
 #     此函數已停用，改為手動登入模式
 
-def Excute(use_tor=False):
+def Excute(use_tor=False, use_profile=False, attach_address=None):
     log.info("eslite_orc_service.main() - 手動登入模式")
     try:
-        cookie_list = login_and_get_cookies(use_tor)
+        cookie_list = login_and_get_cookies(use_tor, use_profile, attach_address)
         log.info("eslite_orc_service.main() finished - cookies已獲取")
         return cookie_list
     except Exception as e:
@@ -248,7 +283,12 @@ if __name__ == "__main__":
     print("誠品線上書店 - 手動登入並獲取 Cookies")
     print("="*60 + "\n")
     
-    cookies = Excute(use_tor=False)
+    # 用法: python eslite_orc_service.py [--profile] [--attach=HOST:PORT]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    use_profile = '--profile' in flags
+    attach_address = next((flag.split('=', 1)[1] for flag in flags if flag.startswith('--attach=')), None)
+    
+    cookies = Excute(use_tor=False, use_profile=use_profile, attach_address=attach_address)
     
     if cookies:
         print("\n" + "="*60)
@@ -6,7 +6,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 from helper.log_helper import LogHelper
 from helper.common_helper import CommonHelper
-from helper.selenium_helper import SeleniumHelper
+from helper.selenium_helper import SeleniumHelper, DriverPool
+from helper.csv_helper import CsvDataset
+from helper.frontier_helper import CrawlFrontier
+from helper.catalog_helper import BookCatalog
+from helper.rate_helper import RateController
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -14,6 +18,8 @@ from datetime import datetime
 import json
 import csv
 import concurrent.futures
+import threading
+import queue
 import re
 import time
 import random
@@ -27,42 +33,8 @@ def get_base_file_path():
 
 def parse_netscape_cookies(cookie_file):
     """解析 Netscape 格式的 cookies 文件"""
-    cookies = []
     try:
-        with open(cookie_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                # 跳過註釋和空行
-                if line.startswith('#') or line.strip() == '':
-                    continue
-                
-                # 解析 cookie 行
-                parts = line.strip().split('\t')
-                if len(parts) >= 7:
-                    domain = parts[0]
-                    flag = parts[1]
-                    path = parts[2]
-                    secure = parts[3]
-                    expiry = parts[4]
-                    name = parts[5]
-                    value = parts[6]
-                    
-                    cookie = {
-                        'name': name,
-                        'value': value,
-                        'domain': domain,
-                        'path': path,
-                        'secure': secure.upper() == 'TRUE',
-                        'httpOnly': False
-                    }
-                    
-                    if expiry != '0':
-                        try:
-                            cookie['expiry'] = int(expiry)
-                        except ValueError:
-                            pass
-                    
-                    cookies.append(cookie)
-        
+        cookies = SeleniumHelper.parse_netscape_cookies(cookie_file)
         log.info(f"成功從 Netscape 格式文件讀取 {len(cookies)} 個 cookies")
         return cookies
     except Exception as e:
@@ -80,6 +52,147 @@ cookies = []
 progress = 0
 max_retry = 3
 temp_files = []
+driver_pool = None
+max_pages_per_driver = 30  # 每個瀏覽器處理多少本書後回收重建
+flush_every_rows = 20  # 累積多少行的變更後寫回 CSV
+flush_every_seconds = 60  # 距上次寫回超過多少秒後寫回 CSV
+crawl_frontier = None  # 爬取進度（SQLite），用於 --resume 續跑
+lean_profile = False  # 精簡模式：封鎖圖片、字型、影音與追蹤器
+network_capture = False  # 網路擷取模式：從頁面載入的商品 JSON 取得欄位，取不到才查找 DOM
+network_capture_timeout = 15  # 等待商品 JSON 的最長秒數
+cache_proxy = None  # 本機快取代理，所有瀏覽器共用靜態資源的磁碟快取
+book_catalog = None  # 跨執行的書目資料庫（SQLite），已知且未過期的書籍不再重新爬取
+# 自適應請求間隔（AIMD）：頁面正常時逐步縮短，導向登入頁時放慢並冷卻，狀態保存在 state/rate_state.json
+eslite_rate_limits = {'initial_delay': 10, 'min_delay': 2, 'max_delay': 60, 'block_cooldown': 15}
+content_wait_timeout = 30  # 每頁導航加上等待商品內容出現的上限（秒），逾時或內容出現後停止載入其餘資源
+content_settle_seconds = 0.5  # 商品內容出現後等待 DOM 靜止的秒數（SPA 逐步渲染各欄位）
+
+# 網路擷取模式：讀取這些 API 的 JSON 回應
+eslite_product_api_patterns = ('athena.eslite.com/api/',)
+
+# 商品 JSON 的候選鍵名 -> BookRanking 屬性名（依序取第一個有值的鍵）
+eslite_product_json_keys = {
+    'title': ('name', 'product_name', 'title'),
+    'isbn': ('isbn13', 'isbn', 'ean', 'isbn10'),
+    'author': ('author', 'authors', 'author_name'),
+    'translator': ('translator', 'translators'),
+    'publisher': ('supplier', 'publisher', 'manufacturer', 'brand'),
+    'publish_date': ('manufacturer_date', 'publish_date', 'publication_date', 'release_date'),
+    'price': ('retail_price', 'list_price', 'mprice', 'price'),
+    'original_title': ('original_name', 'original_title', 'origin_name'),
+    'categories': ('breadcrumbs', 'categories', 'category'),
+}
+
+# 視為尚未取得的欄位值
+missing_field_values = (None, "", "N/A", "待獲取", "待爬取")
+
+# 出版日期與 ISBN 文字需符合的格式（JavaScript 正規表示式）
+eslite_date_pattern = r'\d{4}年\d{1,2}月\d{1,2}日|\d{4}/\d{1,2}/\d{1,2}'
+eslite_isbn_pattern = r'ISBN[\s\S]*\d{10}|ISBN(?:10|13)?\s*[:/]\s*\d[\d-]+[\dXx]'
+
+# 詳細頁面各欄位的選擇器（依序嘗試，格式見 SeleniumHelper.batch_extract），整頁只需一次 execute_script
+eslite_breadcrumb_options = {'mode': 'texts', 'min_count': 2, 'skip': 1, 'exclude': ['首頁']}
+eslite_detail_selectors = {
+    'title': [
+        {'css': 'h1.sans-font-semi-bold'},
+        {'css': 'h1.product-title'},
+        {'css': 'div.product-information h1'},
+        {'css': 'div.product-header h1'},
+        {'xpath': "//h1[contains(@class, 'product-title')]"},
+        {'xpath': "//div[contains(@class, 'product-information')]/div/h1"},
+        {'xpath': '//h1'},
+    ],
+    'page_title': [{'css': 'title'}],
+    'meta_title': [{'css': "meta[property='og:title']", 'mode': 'attr', 'attr': 'content'}],
+    'categories': [
+        {'css': 'ol li.ec-breadcrumb-item a', **eslite_breadcrumb_options},
+        {'xpath': "//ol[contains(@class, 'flex')]//li[contains(@class, 'ec-breadcrumb-item')]//a", **eslite_breadcrumb_options},
+        {'xpath': "//nav[@aria-label='breadcrumb']//ol//li//a", **eslite_breadcrumb_options},
+        {'xpath': "//ol//li[contains(@class, 'ec-breadcrumb-item')]//a", **eslite_breadcrumb_options},
+        {'xpath': "//ol[contains(@class, 'ec-breadcrumb')]//a", **eslite_breadcrumb_options},
+        {'xpath': "//nav[contains(@class, 'breadcrumb')]//a", **eslite_breadcrumb_options},
+        {'xpath': "//div[contains(@class, 'breadcrumb')]//a", **eslite_breadcrumb_options},
+        {'xpath': "//ol[contains(@class, 'breadcrumb')]//li", **eslite_breadcrumb_options},
+        {'css': '.category a, .categories a', **eslite_breadcrumb_options},
+        # 只有一層麵包屑時不略過第一個
+        {'css': 'nav[aria-label="breadcrumb"] ol li a', 'mode': 'texts', 'exclude': ['首頁']},
+        {'css': 'ol li.ec-breadcrumb-item a', 'mode': 'texts', 'exclude': ['首頁']},
+        {'css': 'ol[class*="breadcrumb"] li a', 'mode': 'texts', 'exclude': ['首頁']},
+    ],
+    'author': [
+        {'xpath': "//div[contains(@class, 'author')]//div[contains(@class, 'group')]/a/span"},
+        {'xpath': "//div[contains(@class, 'author')]//span[contains(@class, 'text-underline')]"},
+        {'css': '.author .group:nth-child(2) span'},
+        {'css': '.author .group a span'},
+    ],
+    'translator': [
+        {'xpath': "//div[contains(@class, 'translator')]//div[contains(@class, 'group')]/a/span[contains(@class, 'text-underline')]"},
+        {'xpath': "//div[contains(@class, 'translator')]//a/span[contains(@class, 'text-underline')]"},
+        {'css': '.translator .group a span.text-underline'},
+        {'css': '.translator a span.text-underline'},
+        {'css': '.translator .group:nth-child(2) span'},
+        {'xpath': "//div[contains(@class, 'translator')]//span[contains(@class, 'text-underline')]"},
+    ],
+    'publisher': [
+        {'xpath': "//div[contains(@class, 'publisher')]//div[contains(@class, 'group')]/a/span[contains(@class, 'text-underline')]"},
+        {'css': '.publisher .group a span.text-underline'},
+        {'css': '.publisher .group:nth-child(2) span'},
+    ],
+    'publish_date': [
+        {'css': 'div.publicDate .group:nth-child(2) span', 'pattern': eslite_date_pattern},
+        {'xpath': "//div[contains(@class, 'publicDate')]//div[@class='group'][2]//span", 'pattern': eslite_date_pattern},
+        {'xpath': "//div[contains(@class, 'publicDate')]//div[contains(@class, 'group')][last()]//span", 'pattern': eslite_date_pattern},
+        {'xpath': "//div[contains(@class, 'publish-date')]//div[contains(@class, 'group')]/span[contains(@class, 'text-underline')]", 'pattern': eslite_date_pattern},
+        {'css': '.publish-date .group span.text-underline', 'pattern': eslite_date_pattern},
+        {'css': '.publish-date .group:nth-child(2) span', 'pattern': eslite_date_pattern},
+        {'xpath': "//div[contains(@class, 'date')]//span[contains(@class, 'text-underline')]", 'pattern': eslite_date_pattern},
+        {'xpath': "//div[contains(@class, 'product-spec')]//span[contains(text(), '出版日期')]/../following-sibling::div", 'pattern': eslite_date_pattern},
+    ],
+    'isbn': [
+        {'xpath': "//span[contains(text(), 'ISBN13')]", 'pattern': eslite_isbn_pattern},
+        {'xpath': "//span[contains(text(), 'ISBN10')]", 'pattern': eslite_isbn_pattern},
+        {'css': 'div.ec-col-12 span', 'pattern': eslite_isbn_pattern},
+        {'xpath': "//div[contains(@class, 'ec-col-12')]//span[contains(text(), 'ISBN')]", 'pattern': eslite_isbn_pattern},
+        {'xpath': "//div[contains(@class, 'product-spec')]//span[contains(text(), 'ISBN')]/../following-sibling::div", 'pattern': eslite_isbn_pattern},
+        {'xpath': "//div[contains(@class, 'product-spec')]//span[contains(text(), 'ISBN')]/../..", 'pattern': eslite_isbn_pattern},
+        {'xpath': "//div[contains(text(), 'ISBN')]", 'pattern': eslite_isbn_pattern},
+        {'xpath': "//span[contains(text(), 'ISBN')]", 'pattern': eslite_isbn_pattern},
+    ],
+    'original_title': [
+        {'css': 'div.product-info h4'},
+        {'css': 'h4.original-title'},
+        {'css': 'div.product-information h4'},
+        {'xpath': "//div[contains(@class, 'product-info')]//h4"},
+        {'xpath': "//div[contains(@class, 'product-information')]//h4"},
+    ],
+    'price': [
+        {'css': 'span.pre-product-price', 'pattern': r'\d'},
+        {'css': 'div.price-group span.pre-product-price', 'pattern': r'\d'},
+        {'xpath': "//div[contains(@class, 'price-group')]//span[contains(@class, 'pre-product-price')]", 'pattern': r'\d'},
+        {'css': 'span.item-price', 'pattern': r'\d'},
+        {'css': "span[class*='item-price']", 'pattern': r'\d'},
+        {'xpath': "//span[contains(@class, 'item-price')]", 'pattern': r'\d'},
+        {'css': '.product-price span.item-price', 'pattern': r'\d'},
+        {'css': '.price-group span.item-price', 'pattern': r'\d'},
+    ],
+}
+
+# 書目資料庫欄位名 -> BookRanking 屬性名
+catalog_attributes = {
+    'ISBN': 'isbn',
+    'Publisher': 'publisher',
+    'author': 'author',
+    'translator': 'translator',
+    'fixed_price': 'price',
+    'original_title': 'original_title',
+    'publish_date': 'publish_date',
+    'category': 'categories'
+}
+
+# 多線程模式使用的線程鎖
+csv_write_lock = threading.Lock()
+error_write_lock = threading.Lock()
+progress_lock = threading.Lock()
 
 def save_temp_file(file_path):
     """記錄臨時文件，以便程序結束時刪除"""
@@ -388,13 +501,35 @@ def manual_login_and_get_cookies():
             except:
                 pass
 
-def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
+def Excute(input_cookies=None, csv_path=None, use_manual_login=None, num_workers=1, resume=False, use_catalog=True,
+           lean=False, use_cache_proxy=False, use_network_capture=False):
+    """
+    主執行函數
+    
+    Args:
+        input_cookies: 直接傳入的登入 cookies
+        csv_path: CSV 檔案路徑
+        use_manual_login: 是否手動登入取得 cookies
+        num_workers: 並行爬取的瀏覽器數量（1 表示逐本處理）
+        resume: 是否從上次中斷處繼續（跳過已完成的 URL）
+        use_catalog: 是否使用書目資料庫（預先填入已知書籍的欄位，只爬取未知或過期的書籍）
+        lean: 精簡模式，封鎖圖片、字型、影音與追蹤器（手動登入的瀏覽器不受影響）
+        use_cache_proxy: 是否經由本機快取代理連線（靜態資源從磁碟快取回應，手動登入的瀏覽器不受影響）
+        use_network_capture: 網路擷取模式，從頁面載入的商品 JSON 取得欄位，取不到必要欄位時才查找 DOM
+    """
     global cookies
+    global lean_profile
+    global network_capture
+    global cache_proxy
+    global crawl_frontier
+    global book_catalog
     global books_info
     global processed_production_ids
     
     books_info = []
     processed_production_ids.clear()
+    lean_profile = lean
+    network_capture = use_network_capture
     
     # 決定登入方式
     if input_cookies is not None:
@@ -461,21 +596,10 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
             if cookie_path:
                 log.info(f"嘗試從文件讀取 cookies: {cookie_path}")
                 
-                if cookie_format == 'json':
-                    # 讀取 JSON 格式
-                    try:
-                        with open(cookie_path, 'r', encoding='utf-8') as f:
-                            cookie_data = json.load(f)
-                            cookies = cookie_data.get('cookies', [])
-                            log.info(f"成功從 JSON 文件讀取 {len(cookies)} 個 cookies")
-                            print(f"✅ 成功讀取 {len(cookies)} 個 cookies")
-                    except Exception as e:
-                        log.error(f"讀取 JSON cookies 文件失敗: {e}")
-                        print(f"❌ 讀取 JSON cookies 文件失敗: {e}")
-                        cookies = []
-                elif cookie_format == 'netscape':
-                    # 讀取 Netscape 格式
-                    cookies = parse_netscape_cookies(cookie_path)
+                # JSON 與 Netscape 格式共用同一個讀取函式（瀏覽器建立後以 CDP 注入，不必先載入首頁）
+                cookies = SeleniumHelper.load_cookies_file(cookie_path)
+                log.info(f"成功從 {cookie_format} 文件讀取 {len(cookies)} 個 cookies")
+                print(f"✅ 成功讀取 {len(cookies)} 個 cookies")
             else:
                 log.warning(f"❌ 未找到 cookies 文件")
                 log.warning("將以未登入模式爬取")
@@ -483,6 +607,7 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
                 cookies = []
     
     log.info("開始處理誠品詳細書目...")
+    dataset = None
     try:
         # 要求使用者輸入CSV檔案路徑
         if not csv_path:
@@ -503,7 +628,20 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
         column_mappings = {}
         
         try:
-            df = pd.read_csv(csv_path, dtype={'production_id': str})
+            if use_cache_proxy:
+                cache_proxy = SeleniumHelper.enable_cache_proxy()
+                log.info(f"快取代理: {cache_proxy.address}")
+            
+            # CSV 常駐記憶體，更新後累積一定筆數或時間才寫回檔案
+            dataset = CsvDataset(
+                csv_path,
+                flush_every_rows=flush_every_rows,
+                flush_every_seconds=flush_every_seconds,
+                dtype={'production_id': str},
+                log=log
+            )
+            dataset.install_signal_handlers()
+            df = dataset.df
             
             # 檢查URL欄位
             if 'url' in df.columns:
@@ -542,6 +680,9 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
             
             log.info(f"✅ CSV 欄位: {list(df.columns)}")
             
+            # 欄位解析與 URL/production_id -> 行索引只在載入時建立一次
+            csv_index = __build_csv_index(dataset, column_mappings, url_column)
+            
             book_data = []  # 儲存書籍資料
             for _, row in df.iterrows():
                 url = row[url_column]
@@ -620,6 +761,19 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
             except Exception as e:
                 log.error(f"處理URL時出錯: {url}, 錯誤: {e}")
         
+        # 爬取進度：續跑時跳過上次已完成（或失敗次數已達上限）的 URL
+        crawl_frontier = CrawlFrontier('eslite', csv_path)
+        skipped_urls = crawl_frontier.prepare([book.url for book in books_to_process], resume)
+        if skipped_urls:
+            books_to_process = [book for book in books_to_process if book.url not in skipped_urls]
+            log.info(f"續跑模式：跳過 {len(skipped_urls)} 個已完成的URL")
+            print(f"續跑模式：跳過 {len(skipped_urls)} 個已完成的URL")
+        
+        # 書目資料庫：預先填入已知書籍，只爬取未知或過期的書籍
+        if use_catalog:
+            book_catalog = BookCatalog()
+            books_to_process = __prefill_from_catalog(books_to_process, csv_index)
+        
         log.info(f"需要處理 {len(books_to_process)} 本書的詳細信息")
         
         # 保存原CSV路徑和DataFrame，用於動態更新
@@ -630,15 +784,18 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
         today_str = datetime.now().strftime('%Y%m%d')
         error_csv_dir = os.path.dirname(save_path)
         error_csv_path = os.path.join(error_csv_dir, f"{today_str}_eslite_error.csv")
-        with open(error_csv_path, mode='w', newline='', encoding='utf-8-sig') as file:
-            fieldnames = ['production_id', 'title', 'url', 'error_message']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-        log.info(f"已創建錯誤記錄CSV檔案: {error_csv_path}")
+        if resume and os.path.exists(error_csv_path):
+            log.info(f"續跑模式：沿用錯誤記錄CSV檔案: {error_csv_path}")
+        else:
+            with open(error_csv_path, mode='w', newline='', encoding='utf-8-sig') as file:
+                fieldnames = ['production_id', 'title', 'url', 'error_message']
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+            log.info(f"已創建錯誤記錄CSV檔案: {error_csv_path}")
         
         # 獲取詳細信息（動態即時寫入）
         if books_to_process:
-            __fetch_new_books_details(books_to_process, save_path, error_csv_path, df, column_mappings)
+            __fetch_new_books_details(books_to_process, save_path, error_csv_path, df, csv_index, num_workers)
             
             log.info(f"完成處理誠品詳細書目，本次爬取 {len(books_info)} 本書，已動態更新至 {save_path}")
             print(f"完成處理誠品詳細書目，本次爬取 {len(books_info)} 本書，已動態更新至 {save_path}")
@@ -654,42 +811,129 @@ def Excute(input_cookies=None, csv_path=None, use_manual_login=None):
         traceback.print_exc()
         return []
     finally:
+        if dataset is not None:
+            dataset.close()
+        if crawl_frontier is not None:
+            log.info(f"爬取進度: {crawl_frontier.counts()}")
+            crawl_frontier.close()
+            crawl_frontier = None
+        if book_catalog is not None:
+            book_catalog.close()
+            book_catalog = None
+        RateController.shared().save()
+        rate_summary = RateController.shared().summary()
+        if rate_summary:
+            log.info(f"請求間隔統計: {rate_summary}")
+        wait_stats = SeleniumHelper.get_content_wait_stats()
+        if wait_stats:
+            log.info(f"頁面內容等待統計: {wait_stats}")
+        if cache_proxy is not None:
+            print(f"快取代理統計: {cache_proxy.summary()}")
+            log.info(f"快取代理統計: {cache_proxy.summary()}")
+            SeleniumHelper.disable_cache_proxy()
+            cache_proxy = None
         cleanup_temp_files()
 
-def __update_single_book_to_csv(book, df, csv_path, column_mappings):
-    """即時更新單本書籍資料到CSV，只填充空欄位"""
-    try:
-        # 優先使用的CSV欄位名稱
-        preferred_csv_columns = {
-            'isbn': 'ISBN',
-            'production_id': 'production_id',
-            'title': 'title',
-            'publisher': 'Publisher',
-            'author': 'author',
-            'translator': 'translator',
-            'original_title': 'original_title',
-            'publish_date': 'publish_date',
-            'price': 'fixed_price',
-            'categories': 'category',
-            'url': 'url'
-        }
+def __build_csv_index(dataset, column_mappings, url_column='url'):
+    """
+    建立 CSV 更新用的索引（載入 CSV 時只執行一次）
+    
+    Returns:
+        dict: dataset、內部欄位名 -> CSV欄位名、URL 與 production_id -> 行索引列表
+    """
+    df = dataset.df
+    
+    # 優先使用的CSV欄位名稱
+    preferred_csv_columns = {
+        'isbn': 'ISBN',
+        'production_id': 'production_id',
+        'title': 'title',
+        'publisher': 'Publisher',
+        'author': 'author',
+        'translator': 'translator',
+        'original_title': 'original_title',
+        'publish_date': 'publish_date',
+        'price': 'fixed_price',
+        'categories': 'category',
+        'url': 'url'
+    }
+    
+    # 內部欄位名 -> 實際存在的CSV欄位名（優先欄位不存在時改用其他可能的欄位名）
+    columns = {}
+    for internal_col, csv_col in preferred_csv_columns.items():
+        if csv_col in df.columns:
+            columns[internal_col] = csv_col
+            continue
+        for possible_col, mapped_col in column_mappings.items():
+            if mapped_col == internal_col and possible_col in df.columns:
+                columns[internal_col] = possible_col
+                break
+    
+    # URL / production_id -> 行索引（可能有多個相同URL的行）
+    rows_by_url = {}
+    for idx, url in df[url_column].items():
+        if isinstance(url, str):
+            rows_by_url.setdefault(url, []).append(idx)
+    
+    rows_by_id = {}
+    if 'production_id' in df.columns:
+        for idx, production_id in df['production_id'].items():
+            if pd.notna(production_id):
+                rows_by_id.setdefault(str(production_id).strip(), []).append(idx)
+    
+    log.info(f"已建立CSV索引: {len(rows_by_url)} 個URL, {len(rows_by_id)} 個production_id")
+    return {
+        'dataset': dataset,
+        'columns': columns,
+        'rows_by_url': rows_by_url,
+        'rows_by_id': rows_by_id
+    }
+
+def __prefill_from_catalog(books, csv_index):
+    """
+    以書目資料庫中未過期的欄位填入CSV空欄位
+    
+    Returns:
+        list: 仍需爬取的書籍（未知或必要欄位已過期）
+    """
+    remaining_books = []
+    known_count = 0
+    
+    for book in books:
+        fields = book_catalog.lookup('eslite', book.production_id)
+        if not book_catalog.is_known(fields):
+            remaining_books.append(book)
+            continue
         
-        # 反向映射：內部欄位名 -> CSV欄位名
-        reverse_mapping = {}
-        for csv_col, internal_col in column_mappings.items():
-            if internal_col not in reverse_mapping:
-                reverse_mapping[internal_col] = []
-            reverse_mapping[internal_col].append(csv_col)
+        for catalog_field, attribute in catalog_attributes.items():
+            if catalog_field in fields:
+                setattr(book, attribute, fields[catalog_field])
+        __update_single_book_to_csv(book, csv_index)
+        known_count += 1
+    
+    log.info(f"書目資料庫：{known_count} 本已知書籍已預先填入，需爬取 {len(remaining_books)} 本")
+    print(f"書目資料庫：{known_count} 本已知書籍已預先填入，需爬取 {len(remaining_books)} 本")
+    return remaining_books
+
+def __update_single_book_to_csv(book, csv_index, on_flushed=None):
+    """
+    即時更新單本書籍資料到CSV，只填充空欄位（透過索引定位行，寫入由資料集批次合併）
+    
+    on_flushed: 這本書的變更實際寫回檔案後呼叫（沒有需要更新的欄位時立即呼叫）
+    """
+    try:
+        dataset = csv_index['dataset']
+        df = dataset.df
+        columns = csv_index['columns']
         
         # 找到對應的行（可能有多個相同URL的行）
-        url_mask = df['url'] == book.url
-        if not url_mask.any():
+        matching_indices = csv_index['rows_by_url'].get(book.url)
+        if not matching_indices and book.production_id:
+            matching_indices = csv_index['rows_by_id'].get(str(book.production_id).strip())
+        if not matching_indices:
             log.warning(f"在CSV中找不到URL: {book.url}")
             return False
         
-        matching_indices = df[url_mask].index
-        row_updated = False
-        
         # 更新各個欄位
         internal_fields = {
             'isbn': book.isbn,
@@ -705,35 +949,33 @@ def __update_single_book_to_csv(book, df, csv_path, column_mappings):
         }
         
         # 更新所有匹配的行
+        row_updated = False
         for idx in matching_indices:
+            updates = {}
             for internal_col, new_value in internal_fields.items():
-                # 找到對應的CSV欄位名
-                csv_col = preferred_csv_columns.get(internal_col)
-                
-                # 如果優先欄位不存在，嘗試其他可能的欄位名
-                if csv_col not in df.columns and internal_col in reverse_mapping:
-                    for possible_col in reverse_mapping[internal_col]:
-                        if possible_col in df.columns:
-                            csv_col = possible_col
-                            break
+                csv_col = columns.get(internal_col)
+                if not csv_col:
+                    continue
                 
                 # 更新欄位（只在為空或無效值時更新）
-                if csv_col and csv_col in df.columns:
-                    current_value = df.at[idx, csv_col]
-                    # 檢查當前值是否為空、N/A 或其他無效值
-                    is_empty = pd.isna(current_value) or str(current_value).strip() in ['', 'N/A', '待獲取', '待爬取']
-                    # 檢查新值是否有效
-                    is_valid_new = new_value and str(new_value).strip() not in ['', 'N/A', '待獲取', '待爬取']
-                    
-                    if is_empty and is_valid_new:
-                        df.at[idx, csv_col] = new_value
-                        log.info(f"  行{idx} 更新 {csv_col}: {current_value} -> {new_value}")
-                        row_updated = True
+                current_value = df.at[idx, csv_col]
+                # 檢查當前值是否為空、N/A 或其他無效值
+                is_empty = pd.isna(current_value) or str(current_value).strip() in ['', 'N/A', '待獲取', '待爬取']
+                # 檢查新值是否有效
+                is_valid_new = new_value and str(new_value).strip() not in ['', 'N/A', '待獲取', '待爬取']
+                
+                if is_empty and is_valid_new:
+                    updates[csv_col] = new_value
+                    log.info(f"  行{idx} 更新 {csv_col}: {current_value} -> {new_value}")
+            
+            if updates:
+                dataset.update_row(idx, updates)
+                row_updated = True
         
-        # 即時寫回CSV
         if row_updated:
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            log.info(f"✅ 已即時更新至CSV: {book.title}")
+            log.info(f"✅ 已更新: {book.title}")
+        if on_flushed is not None:
+            dataset.call_after_flush(on_flushed)
         
         return True
     except Exception as e:
@@ -747,520 +989,492 @@ def __write_error_to_csv(production_id, title, url, error_message, error_csv_pat
     """將錯誤記錄寫入錯誤CSV"""
     try:
         import csv
-        with open(error_csv_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
-            fieldnames = ['production_id', 'title', 'url', 'error_message']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writerow({
-                'production_id': production_id,
-                'title': title if title else 'N/A',
-                'url': url,
-                'error_message': error_message
-            })
+        with error_write_lock:
+            with open(error_csv_path, 'a', newline='', encoding='utf-8-sig') as csvfile:
+                fieldnames = ['production_id', 'title', 'url', 'error_message']
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writerow({
+                    'production_id': production_id,
+                    'title': title if title else 'N/A',
+                    'url': url,
+                    'error_message': error_message
+                })
         log.info(f"已記錄錯誤: {production_id}")
         return True
     except Exception as e:
         log.error(f"寫入錯誤記錄失敗: {str(e)}")
         return False
 
-def __fetch_new_books_details(new_books, output_csv_path=None, error_csv_path=None, df=None, column_mappings=None):
+def __prepare_pooled_driver(driver):
+    """瀏覽器建立後、第一次導航前以 CDP 注入登入 cookies（每個瀏覽器只需執行一次）"""
+    if lean_profile:
+        SeleniumHelper.apply_lean_profile(driver)
+    if not cookies or SeleniumHelper.set_cookies_cdp(driver, cookies, base_url):
+        return
+    
+    # CDP 無法使用時，改為先載入首頁再以 add_cookie 注入
+    driver.get(base_url)
+    time.sleep(3)
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            print(f"添加cookie失敗: {e}")
+
+def __create_pooled_driver():
+    options = SeleniumHelper.get_chrome_options(lean=lean_profile)
+    if network_capture:
+        SeleniumHelper.enable_network_capture(options)
+    return SeleniumHelper.init_driver_with_options(options)
+
+def __get_driver_pool(size=1):
+    """取得（必要時建立）共用的已暖機瀏覽器池"""
+    global driver_pool
+    if driver_pool is None:
+        driver_pool = DriverPool(
+            size=size,
+            create_driver=__create_pooled_driver,
+            on_create=__prepare_pooled_driver,
+            max_pages_per_driver=max_pages_per_driver,
+            name='eslite'
+        )
+    return driver_pool
+
+def __close_driver_pool():
+    """關閉瀏覽器池中的所有瀏覽器"""
+    global driver_pool
+    if driver_pool is not None:
+        driver_pool.close()
+        driver_pool = None
+        log.info("已關閉瀏覽器池")
+
+def __fetch_new_books_details(new_books, output_csv_path=None, error_csv_path=None, df=None, csv_index=None, num_workers=1):
     """針對新書列表中的書籍，獲取詳細信息並動態寫入CSV"""
     log.info(f"開始獲取 {len(new_books)} 本書的詳細資料...")
+    num_workers = max(1, min(num_workers, len(new_books)))
+    
+    # 預先啟動並注入 cookies 的瀏覽器（每個工作線程一個），之後每本書直接借用
+    __get_driver_pool(size=num_workers).start()
+    
+    try:
+        if num_workers > 1:
+            __fetch_books_with_workers(new_books, output_csv_path, error_csv_path, df, csv_index, num_workers)
+        else:
+            __fetch_books_sequentially(new_books, output_csv_path, error_csv_path, df, csv_index)
+    finally:
+        __close_driver_pool()
+    
+    return new_books
+
+def __process_single_book(idx, total, book, output_csv_path=None, error_csv_path=None, df=None, csv_index=None):
+    """獲取單本書的詳細資料並即時寫入CSV，回傳是否成功"""
+    try:
+        log.info(f"[{idx}/{total}] 處理: {book.url}")
+        if crawl_frontier is not None:
+            crawl_frontier.claim(book.url)
+        success = __fetch_details(book, error_csv_path)
+        if success and book_catalog is not None:
+            book_catalog.update('eslite', book.production_id, {
+                catalog_field: getattr(book, attribute, None) for catalog_field, attribute in catalog_attributes.items()
+            })
+        if crawl_frontier is not None and not success:
+            crawl_frontier.mark_failed(book.url, "Failed to fetch details after retries")
+        if success:
+            # 寫回 CSV 後才標記完成，中斷時尚未寫回的書籍續跑時會重新爬取
+            frontier = crawl_frontier
+            mark_done = (lambda: frontier.mark_done(book.url)) if frontier is not None else None
+            # 即時更新CSV（多線程共用同一個 DataFrame，需加鎖）
+            if output_csv_path and df is not None and csv_index is not None:
+                with csv_write_lock:
+                    __update_single_book_to_csv(book, csv_index, mark_done)
+                print(f"✅ [{idx}/{total}] 已即時寫入: {book.title}")
+            elif mark_done is not None:
+                mark_done()
+            return True
+        
+        # 寫入錯誤記錄
+        if error_csv_path:
+            __write_error_to_csv(
+                book.production_id,
+                book.title,
+                book.url,
+                "Failed to fetch details after retries",
+                error_csv_path
+            )
+        return False
+    except Exception as exc:
+        log.error(f"獲取詳細資料時發生錯誤: {exc}")
+        if crawl_frontier is not None:
+            crawl_frontier.mark_failed(book.url, exc)
+        # 寫入錯誤記錄
+        if error_csv_path:
+            __write_error_to_csv(
+                book.production_id,
+                book.title,
+                book.url,
+                str(exc),
+                error_csv_path
+            )
+        return False
+
+def __fetch_books_sequentially(new_books, output_csv_path=None, error_csv_path=None, df=None, csv_index=None):
+    """逐本獲取詳細資料（單一瀏覽器）"""
     success_count = 0
     fail_count = 0
     
-    # 不使用多線程，逐個處理
     for idx, book in enumerate(new_books, 1):
-        try:
-            log.info(f"[{idx}/{len(new_books)}] 處理: {book.url}")
-            success = __fetch_details(book, error_csv_path)
-            if success:
-                success_count += 1
-                # 即時更新CSV
-                if output_csv_path and df is not None and column_mappings is not None:
-                    __update_single_book_to_csv(book, df, output_csv_path, column_mappings)
-                    print(f"✅ [{idx}/{len(new_books)}] 已即時寫入: {book.title}")
-            else:
-                fail_count += 1
-                # 寫入錯誤記錄
-                if error_csv_path:
-                    __write_error_to_csv(
-                        book.production_id,
-                        book.title,
-                        book.url,
-                        "Failed to fetch details after retries",
-                        error_csv_path
-                    )
-        except Exception as exc:
-            log.error(f"獲取詳細資料時發生錯誤: {exc}")
+        if __process_single_book(idx, len(new_books), book, output_csv_path, error_csv_path, df, csv_index):
+            success_count += 1
+        else:
             fail_count += 1
-            # 寫入錯誤記錄
-            if error_csv_path:
-                __write_error_to_csv(
-                    book.production_id,
-                    book.title,
-                    book.url,
-                    str(exc),
-                    error_csv_path
-                )
-            continue
 
     log.info(f"詳細資料獲取完成: 成功 {success_count} 本, 失敗 {fail_count} 本")
     return new_books
 
+def __books_worker_thread(worker_id, task_queue, total, counters, output_csv_path, error_csv_path, df, csv_index):
+    """工作線程：從佇列中取書籍並處理（每個線程從瀏覽器池借用自己的瀏覽器）"""
+    log.info(f"工作線程 #{worker_id} 已啟動")
+    
+    while True:
+        try:
+            # 從佇列中取任務（超時 1 秒）
+            task = task_queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        
+        if task is None:  # None 是停止信號
+            task_queue.task_done()
+            break
+        
+        try:
+            idx, book = task
+            success = __process_single_book(idx, total, book, output_csv_path, error_csv_path, df, csv_index)
+            with progress_lock:
+                counters['success' if success else 'fail'] += 1
+        except Exception as e:
+            log.error(f"工作線程 #{worker_id} 發生錯誤: {e}")
+        finally:
+            task_queue.task_done()
+    
+    log.info(f"工作線程 #{worker_id} 已結束")
+
+def __fetch_books_with_workers(new_books, output_csv_path=None, error_csv_path=None, df=None, csv_index=None, num_workers=2):
+    """使用多個工作線程並行獲取詳細資料（任務佇列模式，與博客來多瀏覽器版本相同）"""
+    total = len(new_books)
+    counters = {'success': 0, 'fail': 0}
+    
+    # 將所有任務放入佇列
+    task_queue = queue.Queue()
+    for idx, book in enumerate(new_books, 1):
+        task_queue.put((idx, book))
+    
+    log.info(f"開始多線程爬取，{num_workers} 個瀏覽器，{total} 本書")
+    print(f"開始多線程爬取，使用 {num_workers} 個瀏覽器，共 {total} 本書")
+    
+    # 啟動工作線程
+    threads = []
+    for i in range(num_workers):
+        thread = threading.Thread(
+            target=__books_worker_thread,
+            args=(i+1, task_queue, total, counters, output_csv_path, error_csv_path, df, csv_index),
+            name=f"EsliteWorker-{i+1}"
+        )
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    
+    # 等待所有任務完成
+    task_queue.join()
+    
+    # 發送停止信號
+    for _ in threads:
+        task_queue.put(None)
+    
+    # 等待所有線程結束
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    log.info(f"詳細資料獲取完成: 成功 {counters['success']} 本, 失敗 {counters['fail']} 本")
+    return new_books
+
+def __json_text(value):
+    """JSON 值轉為文字：清單取第一個，物件取 name／title"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('name') or value.get('title')
+    if value is None:
+        return ""
+    return str(value).strip()
+
+def __normalize_publish_date(text):
+    """出版日期轉為 YYYY/M/D（支援 2020-09-02T00:00:00、2020/09/02、2020年09月02日）"""
+    date_match = re.match(r'(\d{4})[-/年](\d{1,2})[-/月](\d{1,2})', text or "")
+    if not date_match:
+        return ""
+    return f"{date_match.group(1)}/{int(date_match.group(2))}/{int(date_match.group(3))}"
+
+def __find_product_object(data, depth=0):
+    """在 JSON 中找出包含最多商品欄位鍵名的物件"""
+    if depth > 5:
+        return None, 0
+    
+    candidates = []
+    if isinstance(data, dict):
+        known_keys = {key for keys in eslite_product_json_keys.values() for key in keys}
+        candidates.append((data, len(known_keys & set(data.keys()))))
+        children = data.values()
+    elif isinstance(data, list):
+        children = data[:20]
+    else:
+        return None, 0
+    
+    for child in children:
+        if isinstance(child, (dict, list)):
+            candidates.append(__find_product_object(child, depth + 1))
+    return max(candidates, key=lambda item: item[1], default=(None, 0))
+
+def __map_product_json(data):
+    """
+    將商品 JSON 轉為 BookRanking 屬性
+    
+    Returns:
+        dict: 屬性名 -> 值（只包含有值的欄位），不像商品資料時回傳空 dict
+    """
+    product, score = __find_product_object(data)
+    if not product or score < 2:
+        return {}
+    
+    fields = {}
+    for attribute, keys in eslite_product_json_keys.items():
+        value = next((product[key] for key in keys if product.get(key) not in (None, "", [])), None)
+        if value is None:
+            continue
+        
+        if attribute == 'categories':
+            names = value if isinstance(value, list) else [value]
+            names = [__json_text(name) for name in names]
+            text = " > ".join(name for name in names if name and name != "首頁")
+        elif attribute == 'isbn':
+            text = re.sub(r'[^\dXx]', '', __json_text(value)).upper()
+        elif attribute == 'price':
+            price_match = re.search(r'\d+', __json_text(value).replace(',', ''))
+            text = price_match.group(0) if price_match else ""
+        elif attribute == 'publish_date':
+            text = __normalize_publish_date(__json_text(value))
+        else:
+            text = __json_text(value)
+        
+        if text:
+            fields[attribute] = text
+    return fields
+
+def __extract_from_network(driver, book_info):
+    """
+    網路擷取模式：從頁面載入的商品 JSON 取得書籍資訊（只填入尚未有值的欄位）
+    
+    Returns:
+        bool: 是否已取得標題、ISBN 與價格（不必再等待渲染與查找 DOM）
+    """
+    production_id = str(book_info.production_id or "")
+    responses = SeleniumHelper.capture_json_responses(
+        driver,
+        eslite_product_api_patterns,
+        timeout=network_capture_timeout,
+        # 網址包含商品編號，或回應內容可對應到商品欄位時即停止等待
+        until=lambda url, data: (bool(production_id) and production_id in url) or bool(__map_product_json(data))
+    )
+    
+    # 網址包含商品編號的回應優先
+    for url, data in sorted(responses, key=lambda item: production_id not in item[0]):
+        fields = __map_product_json(data)
+        if not fields:
+            continue
+        
+        for attribute, value in fields.items():
+            if getattr(book_info, attribute) in missing_field_values:
+                setattr(book_info, attribute, value)
+        log.info(f"從商品 JSON 取得 {len(fields)} 個欄位: {url}")
+        break
+    else:
+        log.warning(f"未擷取到商品 JSON（{len(responses)} 個 API 回應），改從頁面查找")
+        return False
+    
+    return all(getattr(book_info, attribute) not in missing_field_values for attribute in ('title', 'isbn', 'price'))
+
+def __has_missing_fields(book_info):
+    """是否還有商品 JSON 可提供、但尚未取得的欄位（需要再從頁面補齊）"""
+    return any(getattr(book_info, attribute) in missing_field_values for attribute in eslite_product_json_keys)
+
+def __extract_from_dom(driver, book_info):
+    """
+    從已渲染的頁面取得書籍資訊（只填入尚未有值的欄位）
+    
+    所有備用選擇器以一次 batch_extract 在瀏覽器中依序嘗試，Python 只負責整理數值
+    """
+    values = SeleniumHelper.batch_extract(driver, eslite_detail_selectors)
+    if not values:
+        log.warning("批次擷取沒有回傳任何欄位")
+    
+    # 獲取書籍標題：頁面元素 > 頁面標題 > og:title
+    if book_info.title == "待獲取" or book_info.title == "待爬取":
+        if values.get('title'):
+            book_info.title = values['title']
+            log.info(f"獲取標題: {book_info.title}")
+        elif values.get('page_title'):
+            book_info.title = values['page_title'].split("|")[0].strip()
+            log.info(f"從頁面標題獲取書名: {book_info.title}")
+        elif values.get('meta_title'):
+            book_info.title = values['meta_title']
+            log.info(f"從meta標籤獲取書名: {book_info.title}")
+    
+    # 獲取分類信息（只在為空時獲取）
+    if not book_info.categories or book_info.categories == "":
+        categories = []
+        for category in values.get('categories') or []:
+            if category not in categories:
+                categories.append(category)
+        
+        if categories:
+            book_info.categories = " > ".join(categories)
+            log.info(f"獲取分類: {book_info.categories}")
+        else:
+            # 選擇器都失敗時才讀取整頁文字搜尋
+            try:
+                page_text = driver.find_element(By.TAG_NAME, "body").text
+                for pattern in (r'分類[：:]\s*([^\n\r]+)', r'類別[：:]\s*([^\n\r]+)', r'書籍分類[：:]\s*([^\n\r]+)'):
+                    cat_match = re.search(pattern, page_text)
+                    if cat_match:
+                        book_info.categories = cat_match.group(1).strip()
+                        log.info(f"從頁面文本獲取分類: {book_info.categories}")
+                        break
+            except Exception as e:
+                log.error(f"獲取分類失敗: {e}")
+    else:
+        log.info(f"分類已存在，跳過爬取: {book_info.categories}")
+    
+    # 獲取作者（只在為空時獲取）
+    if not book_info.author or book_info.author == "":
+        if values.get('author'):
+            book_info.author = values['author']
+            log.info(f"獲取作者: {book_info.author}")
+    else:
+        log.info(f"作者已存在，跳過爬取: {book_info.author}")
+    
+    # 獲取譯者（只在為空時獲取，沒有譯者時設為空字串）
+    if not book_info.translator or book_info.translator == "":
+        book_info.translator = values.get('translator') or ""
+        if book_info.translator:
+            log.info(f"獲取譯者: {book_info.translator}")
+    else:
+        log.info(f"譯者已存在，跳過爬取: {book_info.translator}")
+    
+    # 獲取出版社（只在為空時獲取）
+    if not book_info.publisher or book_info.publisher == "":
+        if values.get('publisher'):
+            book_info.publisher = values['publisher']
+            log.info(f"獲取出版社: {book_info.publisher}")
+    else:
+        log.info(f"出版社已存在，跳過爬取: {book_info.publisher}")
+    
+    # 獲取出版日期（只在為空時獲取），轉換格式：2020年09月02日 -> 2020/9/2
+    if not book_info.publish_date or book_info.publish_date == "":
+        book_info.publish_date = __normalize_publish_date(values.get('publish_date'))
+        if book_info.publish_date:
+            log.info(f"獲取出版日期: {book_info.publish_date}")
+        else:
+            log.warning(f"未找到出版日期")
+    else:
+        log.info(f"出版日期已存在，跳過爬取: {book_info.publish_date}")
+    
+    # 獲取ISBN（只在為空時獲取）
+    # 支援格式："ISBN13 / 9786269915231"、"ISBN10 / 1234567890"、"ISBN: 978-626-991-523-1"
+    if not book_info.isbn or book_info.isbn == "" or book_info.isbn == "N/A":
+        isbn_text = values.get('isbn') or ""
+        isbn_match = re.search(r'ISBN(?:10|13)?\s*[:/]\s*(\d[\d-]+[\dXx])', isbn_text)
+        if isbn_match:
+            book_info.isbn = isbn_match.group(1).replace('-', '').upper()
+        else:
+            # 如果沒有找到明確格式，嘗試提取任何連續數字（長度至少10位）
+            isbn_match = re.search(r'(\d{10,13})', isbn_text)
+            book_info.isbn = isbn_match.group(1) if isbn_match else 'N/A'
+        
+        if book_info.isbn != 'N/A':
+            log.info(f"獲取ISBN: {book_info.isbn} (原文: {isbn_text})")
+        else:
+            log.warning(f"未找到ISBN")
+    else:
+        log.info(f"ISBN已存在，跳過爬取: {book_info.isbn}")
+    
+    # 獲取原文書名（只在為空時獲取）
+    if not book_info.original_title or book_info.original_title == "":
+        book_info.original_title = values.get('original_title') or ""
+        if book_info.original_title:
+            log.info(f"獲取原文書名: {book_info.original_title}")
+        else:
+            log.warning(f"未找到原文書名")
+    else:
+        log.info(f"原文書名已存在，跳過爬取: {book_info.original_title}")
+    
+    # 獲取價格（只在為空時獲取），只保留數字
+    if not book_info.price or book_info.price == "" or book_info.price == "N/A" or book_info.price is None:
+        price_clean = re.sub(r'[^\d]', '', values.get('price') or "")
+        book_info.price = price_clean or 'N/A'
+        if price_clean:
+            log.info(f"獲取價格: {book_info.price}")
+        else:
+            log.warning(f"無法獲取價格，設為N/A")
+    else:
+        log.info(f"價格已存在，跳過爬取: {book_info.price}")
+
 def __fetch_details(book_info, error_csv_path=None):
     global cookies, progress, max_retry
-    driver = None
+    pool = __get_driver_pool()
+    rate_controller = RateController.shared()
+    host_rate = rate_controller.get(book_info.url, **eslite_rate_limits)
     for attempt in range(max_retry):
+        driver = None
         try:
             log.info(f"爬取詳細頁面，第 {attempt+1} 次嘗試: {book_info.url}")
             
-            chrome_options = SeleniumHelper.get_chrome_options()
-            driver = SeleniumHelper.init_driver_with_options(chrome_options)
+            # 從池中借用已載入首頁並注入 cookies 的瀏覽器
+            driver = pool.acquire()
             
-            driver.get(base_url)
-            time.sleep(3)
+            # 依該主機目前的自適應間隔等待後再送出請求
+            host_rate.wait()
             
-            # 添加登入cookies
-            if cookies:
-                for cookie in cookies:
-                    try:
-                        driver.add_cookie(cookie)
-                    except Exception as e:
-                        print(f"添加cookie失敗: {e}")
-            
-            driver.get(book_info.url)
-            time.sleep(random.uniform(8, 12))
+            # 網路擷取模式：先清空上一頁的 Network 事件，載入後直接讀取商品 JSON（取得前不可停止載入）
+            if network_capture:
+                SeleniumHelper.clear_network_log(driver)
+                SeleniumHelper.load_page(driver, book_info.url, content_wait_timeout)
+                captured = __extract_from_network(driver, book_info)
+                if captured and not __has_missing_fields(book_info):
+                    waited = None
+                else:
+                    # JSON 缺少的欄位（譯者、原文書名、分類等）需等頁面渲染後從 DOM 補齊
+                    waited = SeleniumHelper.wait_for_content(driver, 'eslite', timeout=content_wait_timeout, settle=content_settle_seconds)
+                SeleniumHelper.stop_loading(driver)
+            else:
+                waited = SeleniumHelper.navigate_and_stop(driver, book_info.url, 'eslite', timeout=content_wait_timeout, settle=content_settle_seconds)
             
             # 檢查是否被重定向到登入頁面
             if 'login' in driver.current_url.lower():
-                log.warning(f"被重定向到登入頁面，嘗試重新登入")
-                driver.quit()
+                cooldown = rate_controller.record_block(host_rate)
+                log.warning(f"被重定向到登入頁面，冷卻 {cooldown:.0f} 秒後重新登入（請求間隔已調整為 {host_rate.delay:.1f} 秒）")
+                pool.discard(driver)
                 driver = None
+                time.sleep(cooldown)
                 continue
             
-            # 等待頁面完全載入
-            try:
-                WebDriverWait(driver, 30).until(
-                    lambda d: d.execute_script("return document.readyState") == "complete"
-                )
-                time.sleep(5)
-                
-                try:
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, "h1, .product-information, .product-title"))
-                    )
-                    log.info("成功等待關鍵元素載入")
-                except:
-                    log.warning("等待關鍵元素超時，繼續嘗試爬取")
-            except:
-                log.warning("頁面載入超時，繼續嘗試爬取")
-
-            # 獲取書籍標題
-            if book_info.title == "待獲取" or book_info.title == "待爬取":
-                try:
-                    title_selectors = [
-                        (By.CSS_SELECTOR, "h1.sans-font-semi-bold"),
-                        (By.CSS_SELECTOR, "h1.product-title"),
-                        (By.CSS_SELECTOR, "div.product-information h1"),
-                        (By.CSS_SELECTOR, "div.product-header h1"),
-                        (By.XPATH, "//h1[contains(@class, 'product-title')]"),
-                        (By.XPATH, "//div[contains(@class, 'product-information')]/div/h1"),
-                        (By.XPATH, "//h1")
-                    ]
-                    
-                    for selector_type, selector in title_selectors:
-                        try:
-                            title_elements = driver.find_elements(selector_type, selector)
-                            if title_elements and title_elements[0].text.strip():
-                                book_info.title = title_elements[0].text.strip()
-                                log.info(f"獲取標題: {book_info.title}")
-                                break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取標題失敗: {e}")
-                            continue
-                    
-                    # 如果所有選擇器都失敗，嘗試從頁面標題獲取
-                    if book_info.title == "待獲取" or book_info.title == "待爬取":
-                        page_title = driver.title
-                        if page_title:
-                            if "|" in page_title:
-                                book_info.title = page_title.split("|")[0].strip()
-                                log.info(f"從頁面標題獲取書名: {book_info.title}")
-                            else:
-                                book_info.title = page_title.strip()
-                                log.info(f"從完整頁面標題獲取書名: {book_info.title}")
-                    
-                    # 如果還是找不到，嘗試從元數據獲取
-                    if book_info.title == "待獲取" or book_info.title == "待爬取":
-                        try:
-                            meta_title = driver.find_element(By.XPATH, "//meta[@property='og:title']").get_attribute("content")
-                            if meta_title:
-                                book_info.title = meta_title.strip()
-                                log.info(f"從meta標籤獲取書名: {book_info.title}")
-                        except Exception as e:
-                            log.warning(f"從meta標籤獲取標題失敗: {e}")
-                except Exception as e:
-                    log.error(f"獲取標題失敗: {e}")
-
-            # 獲取分類信息（只在為空時獲取）
-            if not book_info.categories or book_info.categories == "":
-                try:
-                    category_selectors = [
-                        (By.CSS_SELECTOR, "ol li.ec-breadcrumb-item a"),
-                        (By.XPATH, "//ol[contains(@class, 'flex')]//li[contains(@class, 'ec-breadcrumb-item')]//a"),
-                        (By.XPATH, "//nav[@aria-label='breadcrumb']//ol//li//a"),
-                        (By.XPATH, "//ol//li[contains(@class, 'ec-breadcrumb-item')]//a"),
-                        (By.CSS_SELECTOR, "nav[aria-label='breadcrumb'] ol li a"),
-                        (By.XPATH, "//ol[contains(@class, 'ec-breadcrumb')]//a"),
-                        (By.XPATH, "//nav[contains(@class, 'breadcrumb')]//a"),
-                        (By.XPATH, "//div[contains(@class, 'breadcrumb')]//a"),
-                        (By.XPATH, "//ol[contains(@class, 'breadcrumb')]//li"),
-                        (By.CSS_SELECTOR, ".category a, .categories a")
-                    ]
-                    
-                    categories = []
-                    for selector_type, selector in category_selectors:
-                        try:
-                            category_elements = driver.find_elements(selector_type, selector)
-                            if category_elements and len(category_elements) > 1:
-                                categories = []
-                                for cat_elem in category_elements[1:]:
-                                    cat_text = cat_elem.text.strip()
-                                    if cat_text and cat_text != "首頁" and cat_text not in categories:
-                                        categories.append(cat_text)
-                                
-                                if categories:
-                                    book_info.categories = " > ".join(categories)
-                                    log.info(f"獲取分類: {book_info.categories}")
-                                    log.info(f"使用選擇器成功: {selector}")
-                                    break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取分類失敗: {e}")
-                            continue
-                    
-                    # 如果仍未找到分類，嘗試使用JavaScript直接獲取
-                    if not book_info.categories:
-                        try:
-                            breadcrumb_js = """
-                            var result = [];
-                            var links = document.querySelectorAll('nav[aria-label="breadcrumb"] ol li a');
-                            if (links.length === 0) {
-                                links = document.querySelectorAll('ol li.ec-breadcrumb-item a');
-                            }
-                            if (links.length === 0) {
-                                links = document.querySelectorAll('ol[class*="breadcrumb"] li a');
-                            }
-                            for (var i = 0; i < links.length; i++) {
-                                if (links[i].textContent.trim() !== '首頁') {
-                                    result.push(links[i].textContent.trim());
-                                }
-                            }
-                            return result;
-                            """
-                            breadcrumb_categories = driver.execute_script(breadcrumb_js)
-                            if breadcrumb_categories and len(breadcrumb_categories) > 0:
-                                book_info.categories = " > ".join(breadcrumb_categories)
-                                log.info(f"通過JavaScript獲取分類: {book_info.categories}")
-                        except Exception as e:
-                            log.warning(f"通過JavaScript獲取分類失敗: {e}")
-                    
-                    # 如果仍未找到分類，嘗試從頁面文本搜索
-                    if not book_info.categories:
-                        page_text = driver.find_element(By.TAG_NAME, "body").text
-                        category_patterns = [
-                            r'分類[：:]\s*([^\n\r]+)',
-                            r'類別[：:]\s*([^\n\r]+)',
-                            r'書籍分類[：:]\s*([^\n\r]+)'
-                        ]
-                        
-                        for pattern in category_patterns:
-                            cat_match = re.search(pattern, page_text)
-                            if cat_match:
-                                book_info.categories = cat_match.group(1).strip()
-                                log.info(f"從頁面文本獲取分類: {book_info.categories}")
-                                break
-                except Exception as e:
-                    log.error(f"獲取分類失敗: {e}")
-            else:
-                log.info(f"分類已存在，跳過爬取: {book_info.categories}")
-
-            # 獲取其他基本信息
-            try:
-                # 獲取作者（只在為空時獲取）
-                if not book_info.author or book_info.author == "":
-                    author_selectors = [
-                        (By.XPATH, "//div[contains(@class, 'author')]//div[contains(@class, 'group')]/a/span"),
-                        (By.XPATH, "//div[contains(@class, 'author')]//span[contains(@class, 'text-underline')]"),
-                        (By.CSS_SELECTOR, '.author .group:nth-child(2) span'),
-                        (By.CSS_SELECTOR, '.author .group a span'),
-                    ]
-                    
-                    for selector_type, selector in author_selectors:
-                        try:
-                            elements = driver.find_elements(selector_type, selector)
-                            if elements and elements[0].text.strip():
-                                book_info.author = elements[0].text.strip()
-                                log.info(f"獲取作者: {book_info.author}")
-                                break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取作者失敗: {e}")
-                            continue
-                else:
-                    log.info(f"作者已存在，跳過爬取: {book_info.author}")
-                
-                # 獲取譯者（只在為空時獲取）
-                if not book_info.translator or book_info.translator == "":
-                    translator_selectors = [
-                        (By.XPATH, "//div[contains(@class, 'translator')]//div[contains(@class, 'group')]/a/span[contains(@class, 'text-underline')]"),
-                        (By.XPATH, "//div[contains(@class, 'translator')]//a/span[contains(@class, 'text-underline')]"),
-                        (By.CSS_SELECTOR, '.translator .group a span.text-underline'),
-                        (By.CSS_SELECTOR, '.translator a span.text-underline'),
-                        (By.CSS_SELECTOR, '.translator .group:nth-child(2) span'),
-                        (By.XPATH, "//div[contains(@class, 'translator')]//span[contains(@class, 'text-underline')]"),
-                    ]
-                    
-                    for selector_type, selector in translator_selectors:
-                        try:
-                            elements = driver.find_elements(selector_type, selector)
-                            if elements and elements[0].text.strip():
-                                book_info.translator = elements[0].text.strip()
-                                log.info(f"獲取譯者: {book_info.translator}")
-                                break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取譯者失敗: {e}")
-                            continue
-                    
-                    # 如果沒有譯者，設為空字串
-                    if not book_info.translator:
-                        book_info.translator = ""
-                else:
-                    log.info(f"譯者已存在，跳過爬取: {book_info.translator}")
-                
-                # 獲取出版社（只在為空時獲取）
-                if not book_info.publisher or book_info.publisher == "":
-                    publisher_selectors = [
-                        (By.XPATH, "//div[contains(@class, 'publisher')]//div[contains(@class, 'group')]/a/span[contains(@class, 'text-underline')]"),
-                        (By.CSS_SELECTOR, '.publisher .group a span.text-underline'),
-                        (By.CSS_SELECTOR, '.publisher .group:nth-child(2) span'),
-                    ]
-                    
-                    for selector_type, selector in publisher_selectors:
-                        try:
-                            publisher_element = driver.find_element(selector_type, selector)
-                            if publisher_element and publisher_element.text.strip():
-                                book_info.publisher = publisher_element.text.strip()
-                                log.info(f"獲取出版社: {book_info.publisher}")
-                                break
-                        except:
-                            continue
-                else:
-                    log.info(f"出版社已存在，跳過爬取: {book_info.publisher}")
-                
-                # 獲取出版日期（只在為空時獲取）
-                if not book_info.publish_date or book_info.publish_date == "":
-                    publish_date_selectors = [
-                        # 新的結構：div.publicDate .group:nth-child(2) span
-                        (By.CSS_SELECTOR, 'div.publicDate .group:nth-child(2) span'),
-                        (By.XPATH, "//div[contains(@class, 'publicDate')]//div[@class='group'][2]//span"),
-                        (By.XPATH, "//div[contains(@class, 'publicDate')]//div[contains(@class, 'group')][last()]//span"),
-                        # 舊的結構（備用）
-                        (By.XPATH, "//div[contains(@class, 'publish-date')]//div[contains(@class, 'group')]/span[contains(@class, 'text-underline')]"),
-                        (By.CSS_SELECTOR, '.publish-date .group span.text-underline'),
-                        (By.CSS_SELECTOR, '.publish-date .group:nth-child(2) span'),
-                        (By.XPATH, "//div[contains(@class, 'date')]//span[contains(@class, 'text-underline')]"),
-                        (By.XPATH, "//div[contains(@class, 'product-spec')]//span[contains(text(), '出版日期')]/../following-sibling::div"),
-                    ]
-                    
-                    for selector_type, selector in publish_date_selectors:
-                        try:
-                            date_element = driver.find_element(selector_type, selector)
-                            if date_element and date_element.text.strip():
-                                date_text = date_element.text.strip()
-                                # 轉換日期格式：2020年09月02日 -> 2020/9/2
-                                date_match = re.match(r'(\d{4})年(\d{1,2})月(\d{1,2})日', date_text)
-                                if date_match:
-                                    year = date_match.group(1)
-                                    month = str(int(date_match.group(2)))  # 去掉前導0
-                                    day = str(int(date_match.group(3)))    # 去掉前導0
-                                    book_info.publish_date = f"{year}/{month}/{day}"
-                                    log.info(f"獲取出版日期: {book_info.publish_date} (選擇器: {selector})")
-                                    break
-                                # 如果已經是 YYYY/M/D 或 YYYY/MM/DD 格式
-                                elif re.match(r'\d{4}/\d{1,2}/\d{1,2}', date_text):
-                                    # 標準化格式：去掉前導0
-                                    date_parts = date_text.split('/')
-                                    if len(date_parts) == 3:
-                                        year = date_parts[0]
-                                        month = str(int(date_parts[1]))
-                                        day = str(int(date_parts[2]))
-                                        book_info.publish_date = f"{year}/{month}/{day}"
-                                    else:
-                                        book_info.publish_date = date_text
-                                    log.info(f"獲取出版日期: {book_info.publish_date} (選擇器: {selector})")
-                                    break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取出版日期失敗: {e}")
-                            continue
-                    
-                    if not book_info.publish_date or book_info.publish_date == "":
-                        book_info.publish_date = ""
-                        log.warning(f"未找到出版日期")
-                else:
-                    log.info(f"出版日期已存在，跳過爬取: {book_info.publish_date}")
-                
-                # 獲取ISBN（只在為空時獲取）
-                if not book_info.isbn or book_info.isbn == "" or book_info.isbn == "N/A":
-                    isbn_selectors = [
-                        # 新的結構：div.ec-col-12 span 包含 "ISBN13 /" 或 "ISBN10 /"
-                        (By.XPATH, "//span[contains(text(), 'ISBN13')]"),
-                        (By.XPATH, "//span[contains(text(), 'ISBN10')]"),
-                        (By.CSS_SELECTOR, "div.ec-col-12 span"),
-                        (By.XPATH, "//div[contains(@class, 'ec-col-12')]//span[contains(text(), 'ISBN')]"),
-                        # 舊的結構（備用）
-                        (By.XPATH, "//div[contains(@class, 'product-spec')]//span[contains(text(), 'ISBN')]/../following-sibling::div"),
-                        (By.XPATH, "//div[contains(@class, 'product-spec')]//span[contains(text(), 'ISBN')]/../.."),
-                        (By.XPATH, "//div[contains(text(), 'ISBN')]"),
-                        (By.XPATH, "//span[contains(text(), 'ISBN')]"),
-                    ]
-                    
-                    for selector_type, selector in isbn_selectors:
-                        try:
-                            isbn_elements = driver.find_elements(selector_type, selector)
-                            for isbn_element in isbn_elements:
-                                if isbn_element and isbn_element.text:
-                                    isbn_text = isbn_element.text.strip()
-                                    # 跳過不相關的文本
-                                    if 'ISBN' not in isbn_text:
-                                        continue
-                                    
-                                    # 提取 ISBN 數字
-                                    # 支援格式：
-                                    # - "ISBN13 / 9786269915231"
-                                    # - "ISBN10 / 1234567890"
-                                    # - "ISBN: 978-626-991-523-1"
-                                    # - "9786269915231"
-                                    isbn_match = re.search(r'ISBN(?:10|13)?\s*[:/]\s*(\d[\d-]+[\dXx])', isbn_text)
-                                    if isbn_match:
-                                        book_info.isbn = isbn_match.group(1).replace('-', '').upper()
-                                        log.info(f"獲取ISBN: {book_info.isbn} (選擇器: {selector}, 原文: {isbn_text})")
-                                        break
-                                    else:
-                                        # 如果沒有找到明確格式，嘗試提取任何連續數字（長度至少10位）
-                                        isbn_match = re.search(r'(\d{10,13})', isbn_text)
-                                        if isbn_match:
-                                            book_info.isbn = isbn_match.group(1)
-                                            log.info(f"獲取ISBN: {book_info.isbn} (選擇器: {selector}, 原文: {isbn_text})")
-                                            break
-                            
-                            if book_info.isbn and book_info.isbn != 'N/A':
-                                break
-                        except Exception as e:
-                            log.warning(f"使用選擇器 {selector} 獲取ISBN失敗: {e}")
-                            continue
-                    
-                    if not book_info.isbn or book_info.isbn == "":
-                        book_info.isbn = 'N/A'
-                        log.warning(f"未找到ISBN")
-                else:
-                    log.info(f"ISBN已存在，跳過爬取: {book_info.isbn}")
-                
-                # 獲取原文書名（只在為空時獲取）
-                if not book_info.original_title or book_info.original_title == "":
-                    try:
-                        original_title_selectors = [
-                            (By.CSS_SELECTOR, "div.product-info h4"),
-                            (By.CSS_SELECTOR, "h4.original-title"),
-                            (By.CSS_SELECTOR, "div.product-information h4"),
-                            (By.XPATH, "//div[contains(@class, 'product-info')]//h4"),
-                            (By.XPATH, "//div[contains(@class, 'product-information')]//h4"),
-                        ]
-                        
-                        for selector_type, selector in original_title_selectors:
-                            try:
-                                original_title_elements = driver.find_elements(selector_type, selector)
-                                if original_title_elements and original_title_elements[0].text.strip():
-                                    book_info.original_title = original_title_elements[0].text.strip()
-                                    log.info(f"獲取原文書名: {book_info.original_title}")
-                                    break
-                            except Exception as e:
-                                log.warning(f"使用選擇器 {selector} 獲取原文書名失敗: {e}")
-                                continue
-                        
-                        if not book_info.original_title:
-                            book_info.original_title = ""
-                            log.warning(f"未找到原文書名")
-                            
-                    except Exception as e:
-                        log.error(f"獲取原文書名失敗: {e}")
-                        book_info.original_title = ""
-                else:
-                    log.info(f"原文書名已存在，跳過爬取: {book_info.original_title}")
-                
-                # 獲取價格（只在為空時獲取）
-                if not book_info.price or book_info.price == "" or book_info.price == "N/A" or book_info.price is None:
-                    try:
-                        price_selectors = [
-                            # 新的價格選擇器（優先）
-                            (By.CSS_SELECTOR, "span.pre-product-price"),
-                            (By.CSS_SELECTOR, "div.price-group span.pre-product-price"),
-                            (By.XPATH, "//div[contains(@class, 'price-group')]//span[contains(@class, 'pre-product-price')]"),
-                            # 原有的選擇器（備用）
-                            (By.CSS_SELECTOR, "span.item-price"),
-                            (By.CSS_SELECTOR, "span[class*='item-price']"),
-                            (By.XPATH, "//span[contains(@class, 'item-price')]"),
-                            (By.CSS_SELECTOR, ".product-price span.item-price"),
-                            (By.CSS_SELECTOR, ".price-group span.item-price"),
-                        ]
-                        
-                        for selector_type, selector in price_selectors:
-                            try:
-                                price_elements = driver.find_elements(selector_type, selector)
-                                if price_elements and price_elements[0].text.strip():
-                                    price_text = price_elements[0].text.strip()
-                                    # 清理價格文本，只保留數字
-                                    price_clean = re.sub(r'[^\d]', '', price_text)
-                                    if price_clean:
-                                        book_info.price = price_clean
-                                        log.info(f"獲取價格: {book_info.price}")
-                                        break
-                            except Exception as e:
-                                log.warning(f"使用選擇器 {selector} 獲取價格失敗: {e}")
-                                continue
-                        
-                        if not book_info.price or book_info.price == "N/A":
-                            # 嘗試使用JavaScript直接獲取
-                            try:
-                                price_js = """
-                                var priceSpan = document.querySelector('span.item-price');
-                                if (!priceSpan) {
-                                    priceSpan = document.querySelector('span[class*="item-price"]');
-                                }
-                                if (priceSpan) {
-                                    return priceSpan.textContent.trim();
-                                }
-                                return null;
-                                """
-                                price_text = driver.execute_script(price_js)
-                                if price_text:
-                                    price_clean = re.sub(r'[^\d]', '', price_text)
-                                    if price_clean:
-                                        book_info.price = price_clean
-                                        log.info(f"通過JavaScript獲取價格: {book_info.price}")
-                            except Exception as e:
-                                log.warning(f"通過JavaScript獲取價格失敗: {e}")
-                        
-                        if not book_info.price or book_info.price == "":
-                            book_info.price = 'N/A'
-                            log.warning(f"無法獲取價格，設為N/A")
-                            
-                    except Exception as e:
-                        log.error(f"獲取價格失敗: {e}")
-                        book_info.price = 'N/A'
+            if waited is not None:
+                # 商品內容已出現（條件成立即繼續，不再固定等待）
+                if waited['ok']:
+                    log.info(f"成功等待關鍵元素載入（{waited['seconds']:.2f} 秒）")
                 else:
-                    log.info(f"價格已存在，跳過爬取: {book_info.price}")
-                    
-            except Exception as e:
-                log.error(f"獲取基本信息失敗: {e}")
+                    log.warning(f"等待關鍵元素未完成（{waited['reason']}，{waited['seconds']:.2f} 秒），繼續嘗試爬取")
+            
+            # 從 DOM 查找商品 JSON 沒有提供的欄位（只填入尚未有值的欄位）
+            __extract_from_dom(driver, book_info)
 
             # 檢查 title 是否為空或無效
             if not book_info.title or book_info.title in ["待獲取", "待爬取", "", "N/A"]:
@@ -1307,6 +1521,7 @@ def __fetch_details(book_info, error_csv_path=None):
                     return False
 
             # 添加書籍到列表
+            rate_controller.record_success(host_rate)
             books_info.append(book_info)
             log.info(f"成功爬取詳細資訊: {book_info.title}")
             return True
@@ -1334,7 +1549,7 @@ def __fetch_details(book_info, error_csv_path=None):
         
         finally:
             if driver:
-                driver.quit()
+                pool.release(driver)
     
     return False
 
@@ -1342,16 +1557,38 @@ if __name__ == "__main__":
     import sys
     
     # 可以從命令行傳入參數
+    # 用法: python eslite_ranking_detail.py <CSV路徑> [--manual-login] [--workers N] [--resume] [--no-catalog] [--lean] [--cache-proxy] [--network-capture]
     csv_path = None
     use_manual_login = None
+    num_workers = 1
     
-    if len(sys.argv) > 1:
-        csv_path = sys.argv[1]
+    args = sys.argv[1:]
+    if args and not args[0].startswith('--'):
+        csv_path = args[0]
     
-    if len(sys.argv) > 2 and sys.argv[2] == '--manual-login':
+    if '--manual-login' in args or '--use-manual-login' in args:
         use_manual_login = True
     
-    result = Excute(csv_path=csv_path, use_manual_login=use_manual_login)
+    resume = '--resume' in args
+    use_catalog = '--no-catalog' not in args
+    lean = '--lean' in args
+    use_cache_proxy = '--cache-proxy' in args
+    use_network_capture = '--network-capture' in args
+    
+    if '--workers' in args:
+        try:
+            num_workers = int(args[args.index('--workers') + 1])
+        except (IndexError, ValueError):
+            print("⚠️  --workers 必須接整數，使用預設值 1")
+            num_workers = 1
+    
+    if num_workers < 1:
+        num_workers = 1
+    if num_workers > 5:
+        print("⚠️  瀏覽器數量不建議超過 5 個，已限制為 5")
+        num_workers = 5
+    
+    result = Excute(csv_path=csv_path, use_manual_login=use_manual_login, num_workers=num_workers, resume=resume, use_catalog=use_catalog, lean=lean, use_cache_proxy=use_cache_proxy, use_network_capture=use_network_capture)
     
     if result:
         print(f"\n✅ 成功爬取 {len(result)} 本書的資料")
@@ -0,0 +1,626 @@
+import os
+import ssl
+import json
+import time
+import socket
+import fnmatch
+import hashlib
+import selectors
+import threading
+import subprocess
+import http.client
+import http.server
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+default_state_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+
+# 視為靜態資源的副檔名與 Content-Type（只有這些回應會被快取）
+static_extensions = ('.js', '.mjs', '.css', '.woff', '.woff2', '.ttf', '.otf', '.eot',
+                     '.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico')
+static_content_types = ('text/css', 'application/javascript', 'text/javascript', 'application/x-javascript',
+                        'font/', 'application/font', 'image/')
+
+# CONNECT 時以自簽憑證解開的主機（三個書店的網站與靜態資源主機），其他主機（廣告、追蹤器等）原樣轉送
+cache_intercept_hosts = ('*.books.com.tw', '*.book.com.tw', '*.kingstone.com.tw', '*.eslite.com')
+
+# 串流轉送時每次讀取的位元組數
+relay_chunk_bytes = 64 * 1024
+
+# 不轉送的 hop-by-hop 標頭
+hop_by_hop_headers = ('connection', 'proxy-connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+                      'te', 'trailers', 'transfer-encoding', 'upgrade')
+
+_shared_proxy = None
+_shared_proxy_lock = threading.Lock()
+
+
+class ProxyCache:
+    """
+    代理的磁碟快取
+
+    每個 URL 存成一個內容檔與一個 metadata JSON，依 TTL 過期，
+    總大小超過 max_bytes 時從最久未使用的項目開始刪除（LRU，以內容檔的 mtime 記錄最後使用時間）。
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, default_ttl=86400, max_ttl=7 * 86400,
+                 max_object_bytes=20 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: 快取目錄
+            max_bytes: 快取總大小上限
+            default_ttl: 回應沒有 max-age 時的有效秒數
+            max_ttl: 有效秒數上限（即使 max-age 更長）
+            max_object_bytes: 單一回應超過此大小不快取
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.max_object_bytes = max_object_bytes
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'bypass': 0, 'expired': 0, 'evictions': 0, 'bytes_from_cache': 0}
+        self._entries = OrderedDict()  # key -> 大小，依最後使用時間排序
+        self._lock = threading.Lock()
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._load_index()
+
+    @staticmethod
+    def cache_key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        folder = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(folder, f"{key}.body"), os.path.join(folder, f"{key}.json")
+
+    def _load_index(self):
+        """啟動時掃描快取目錄，依最後使用時間重建 LRU 索引"""
+        found = []
+        for folder, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.body'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(folder, name))
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name[:-len('.body')], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _remove(self, key):
+        size = self._entries.pop(key, 0)
+        self.total_bytes -= size
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.stats['evictions'] += 1
+
+    @staticmethod
+    def is_static(url, content_type=''):
+        path = urlsplit(url).path.lower()
+        if path.endswith(static_extensions):
+            return True
+        content_type = (content_type or '').lower()
+        return any(content_type.startswith(prefix) for prefix in static_content_types)
+
+    def ttl_for(self, headers):
+        """
+        依 Cache-Control 決定有效秒數
+
+        Returns:
+            int: 有效秒數，None 表示不應快取
+        """
+        cache_control = (headers.get('cache-control') or '').lower()
+        if 'no-store' in cache_control or 'private' in cache_control or 'no-cache' in cache_control:
+            return None
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name in ('s-maxage', 'max-age') and value.isdigit():
+                seconds = int(value)
+                return min(seconds, self.max_ttl) if seconds > 0 else None
+        return self.default_ttl
+
+    def get(self, url):
+        """
+        取得未過期的快取回應
+
+        Returns:
+            tuple: (status, headers, body)，沒有快取時回傳 None
+        """
+        key = self.cache_key(url)
+        body_path, meta_path = self._paths(key)
+        with self._lock:
+            if key not in self._entries:
+                return None
+
+        # 讀檔不持有鎖，其他執行緒的查詢不必排隊等待磁碟 I/O（put 以 os.replace 寫入，不會讀到半個檔案）
+        body = None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('expires_at', 0) >= time.time():
+                with open(body_path, 'rb') as f:
+                    body = f.read()
+                os.utime(body_path)
+        except (OSError, ValueError):
+            # 其他進程可能已刪除此項目
+            with self._lock:
+                self._remove(key)
+            return None
+
+        with self._lock:
+            if body is None:
+                self._remove(key)
+                self.stats['expired'] += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            self.stats['bytes_from_cache'] += len(body)
+        return meta['status'], meta['headers'], body
+
+    def is_cacheable(self, url, status, headers):
+        """
+        依狀態碼與標頭判斷回應是否可快取（200、靜態資源、Cache-Control 允許、已知的大小未超過上限）
+
+        沒有 Content-Length（chunked、即時壓縮的 JS/CSS）時同樣視為可快取，
+        由呼叫端最多讀取 max_object_bytes，超過時再改為串流轉送。
+
+        Args:
+            headers: 小寫標頭名稱 -> 值
+        """
+        if status != 200 or self.ttl_for(headers) is None or not self.is_static(url, headers.get('content-type')):
+            return False
+        length = headers.get('content-length')
+        if length is None:
+            return True
+        return length.isdigit() and int(length) <= self.max_object_bytes
+
+    def record_bypass(self):
+        """記錄一次不經快取的回應"""
+        with self._lock:
+            self.stats['bypass'] += 1
+
+    def put(self, url, status, headers, body):
+        """
+        保存可快取的回應（200、靜態資源、Cache-Control 允許）
+
+        Returns:
+            bool: 是否已保存
+        """
+        header_map = {name.lower(): value for name, value in headers}
+        ttl = self.ttl_for(header_map)
+        if status != 200 or ttl is None or len(body) > self.max_object_bytes \
+                or not self.is_static(url, header_map.get('content-type')):
+            self.record_bypass()
+            return False
+
+        key = self.cache_key(url)
+        body_path, meta_path = self._paths(key)
+        meta = {
+            'url': url,
+            'status': status,
+            # 不保存 Set-Cookie，避免把某次回應的 cookie 帶給其他瀏覽器
+            'headers': [[name, value] for name, value in headers if name.lower() != 'set-cookie'],
+            'stored_at': time.time(),
+            'expires_at': time.time() + ttl,
+        }
+
+        with self._lock:
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            for path, data, mode in ((body_path, body, 'wb'), (meta_path, meta, 'w')):
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                if mode == 'wb':
+                    with open(temp_path, mode) as f:
+                        f.write(data)
+                else:
+                    with open(temp_path, mode, encoding='utf-8') as f:
+                        json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_path, path)
+
+            self.total_bytes += len(body) - self._entries.get(key, 0)
+            self._entries[key] = len(body)
+            self._entries.move_to_end(key)
+            self.stats['misses'] += 1
+            self._evict()
+        return True
+
+    def hit_rate(self):
+        """靜態資源的命中率（hits / (hits + misses)）"""
+        with self._lock:
+            total = self.stats['hits'] + self.stats['misses']
+            return self.stats['hits'] / total if total else 0.0
+
+
+class _ProxyRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    轉送代理的請求處理
+
+    HTTP 請求直接轉送；HTTPS 的 CONNECT 只有 intercept_hosts 中的主機以自簽憑證在本機解開
+    （Chrome 已設定忽略憑證錯誤），其他主機或無法產生憑證時只做原樣轉送。
+    解開後可快取的靜態資源走快取，其餘回應（HTML、XHR）邊讀邊轉送；
+    同一個瀏覽器連線的請求重複使用同一條上游連線，不必每次重新握手。
+    """
+    protocol_version = 'HTTP/1.1'
+    proxy = None  # CachingProxy 實例，由 CachingProxy.start 設定
+    _origin = None  # CONNECT 解開後的 (scheme, host, port)
+    _upstream = None  # 重複使用的上游連線
+    _upstream_key = None  # 上游連線的 (scheme, host, port)
+
+    def log_message(self, format, *args):
+        pass
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self._close_upstream()
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(':')
+        port = int(port) if port.isdigit() else 443
+        context = self.proxy.server_ssl_context() if self.proxy.should_intercept(host) else None
+        if context is None:
+            self._tunnel(host, port)
+            return
+
+        self.send_response_only(200, 'Connection Established')
+        self.end_headers()
+        try:
+            connection = context.wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            self.close_connection = True
+            return
+
+        self.connection = connection
+        self.rfile = connection.makefile('rb', self.rbufsize)
+        self.wfile = connection.makefile('wb')
+        self._origin = ('https', host, port)
+        self.close_connection = False
+
+    def _tunnel(self, host, port):
+        """不解開 TLS，直接在瀏覽器與目標主機之間轉送位元組（閒置超過 upstream_timeout 秒後關閉）"""
+        try:
+            upstream = socket.create_connection((host, port), timeout=self.proxy.upstream_timeout)
+        except OSError:
+            self.send_error(502)
+            return
+
+        self.send_response_only(200, 'Connection Established')
+        self.end_headers()
+        self.close_connection = True
+
+        with upstream, selectors.DefaultSelector() as selector:
+            selector.register(self.connection, selectors.EVENT_READ, upstream)
+            selector.register(upstream, selectors.EVENT_READ, self.connection)
+            while True:
+                events = selector.select(timeout=self.proxy.upstream_timeout)
+                if not events:
+                    return
+                for key, _ in events:
+                    try:
+                        data = key.fileobj.recv(65536)
+                        if not data:
+                            return
+                        key.data.sendall(data)
+                    except OSError:
+                        return
+
+    def _target_url(self):
+        if self._origin:
+            scheme, host, port = self._origin
+            default_port = 443 if scheme == 'https' else 80
+            netloc = host if port == default_port else f"{host}:{port}"
+            return f"{scheme}://{netloc}{self.path}"
+        if self.path.startswith(('http://', 'https://')):
+            return self.path
+        return None
+
+    def _send(self, status, reason, headers, body):
+        self.send_response_only(status, reason)
+        for name, value in headers:
+            if name.lower() in hop_by_hop_headers or name.lower() == 'content-length':
+                continue
+            self.send_header(name, value)
+        if self.command != 'HEAD':
+            self.send_header('Content-Length', str(len(body)))
+        else:
+            content_length = next((value for name, value in headers if name.lower() == 'content-length'), None)
+            if content_length is not None:
+                self.send_header('Content-Length', content_length)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        self.wfile.flush()
+
+    def _close_upstream(self):
+        if self._upstream is not None:
+            self._upstream.close()
+            self._upstream = None
+            self._upstream_key = None
+
+    def _upstream_connection(self, parts):
+        """取得目標主機的上游連線（與上一個請求相同主機時重複使用）"""
+        key = (parts.scheme, parts.hostname, parts.port)
+        if self._upstream is not None and self._upstream_key == key:
+            return self._upstream, True
+
+        self._close_upstream()
+        if parts.scheme == 'https':
+            connection = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.proxy.upstream_timeout,
+                                                     context=ssl.create_default_context())
+        else:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.proxy.upstream_timeout)
+        self._upstream, self._upstream_key = connection, key
+        return connection, False
+
+    def _forward(self, url, body):
+        """
+        送出請求並回傳上游回應（尚未讀取內容）
+
+        重複使用的連線已被上游關閉時，重新連線再送一次
+        """
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        for _ in range(2):
+            connection, reused = self._upstream_connection(parts)
+            try:
+                connection.putrequest(self.command, path, skip_host=True, skip_accept_encoding=True)
+                for name, value in self.headers.items():
+                    if name.lower() not in hop_by_hop_headers:
+                        connection.putheader(name, value)
+                connection.endheaders(body)
+                return connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self._close_upstream()
+                if not reused:
+                    raise
+            except (OSError, http.client.HTTPException):
+                self._close_upstream()
+                raise
+
+    @staticmethod
+    def _read_limited(response, limit):
+        """讀取上游回應最多 limit + 1 個位元組（多讀一個位元組以判斷是否超過上限）"""
+        parts = []
+        remaining = limit + 1
+        while remaining > 0:
+            chunk = response.read(min(relay_chunk_bytes, remaining))
+            if not chunk:
+                break
+            parts.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(parts)
+
+    def _relay(self, response, prefix=b''):
+        """
+        邊讀邊轉送上游回應（長度未知時以 chunked 編碼轉送）
+
+        Args:
+            prefix: 已從 response 讀出的開頭內容（嘗試快取但超過大小上限時），先送出再繼續串流
+        """
+        headers = response.getheaders()
+        no_body = self.command == 'HEAD' or response.status in (204, 304) or response.status < 200
+        chunked = not no_body and response.getheader('Content-Length') is None
+
+        self.send_response_only(response.status, response.reason)
+        for name, value in headers:
+            if name.lower() not in hop_by_hop_headers:
+                self.send_header(name, value)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        if no_body:
+            response.read()
+        else:
+            chunk = prefix
+            while True:
+                if not chunk:
+                    chunk = response.read1(relay_chunk_bytes)
+                if not chunk:
+                    break
+                if chunked:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+                else:
+                    self.wfile.write(chunk)
+                self.wfile.flush()
+                chunk = b''
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        if response.will_close:
+            self._close_upstream()
+
+    def _handle(self):
+        url = self._target_url()
+        if url is None:
+            self.send_error(400)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+
+        cache = self.proxy.cache
+        if self.command == 'GET':
+            cached = cache.get(url)
+            if cached is not None:
+                status, headers, content = cached
+                self._send(status, 'OK', headers, content)
+                return
+
+        prefix = b''
+        try:
+            response = self._forward(url, body)
+            header_map = {name.lower(): value for name, value in response.getheaders()}
+            content = None
+            if self.command == 'GET' and cache.is_cacheable(url, response.status, header_map):
+                # 可快取的靜態資源：最多讀取 max_object_bytes，放得下就存入快取，超過則把已讀的部分接著串流轉送
+                prefix = self._read_limited(response, cache.max_object_bytes)
+                if len(prefix) <= cache.max_object_bytes:
+                    content, prefix = prefix, b''
+                    if response.will_close:
+                        self._close_upstream()
+        except (OSError, http.client.HTTPException):
+            self._close_upstream()
+            self.send_error(502)
+            return
+
+        if content is not None:
+            cache.put(url, response.status, response.getheaders(), content)
+            self._send(response.status, response.reason, response.getheaders(), content)
+            return
+
+        if self.command == 'GET':
+            cache.record_bypass()
+        try:
+            self._relay(response, prefix)
+        except (OSError, http.client.HTTPException):
+            # 已開始回應後無法再送出錯誤，直接關閉連線
+            self._close_upstream()
+            self.close_connection = True
+
+    do_GET = _handle
+    do_HEAD = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_DELETE = _handle
+    do_OPTIONS = _handle
+    do_PATCH = _handle
+
+
+class _ProxyServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 瀏覽器中途關閉連線很常見，不輸出堆疊
+        pass
+
+
+class CachingProxy:
+    """
+    本機快取轉送代理（所有 Chrome 共用）
+
+    每個新建的瀏覽器都是全新的設定檔，會重新下載同樣的 JS／CSS／字型。
+    讓瀏覽器經由此代理連線後，靜態資源從磁碟快取回應，重建的瀏覽器不必重新下載。
+    """
+
+    def __init__(self, cache_dir=None, host='127.0.0.1', port=0, max_bytes=512 * 1024 * 1024,
+                 default_ttl=86400, upstream_timeout=30, intercept_hosts=None, log=None):
+        """
+        Args:
+            cache_dir: 快取目錄，預設為 state/cache_proxy
+            host: 監聽位址
+            port: 監聽端口，0 表示自動選擇
+            max_bytes: 快取總大小上限
+            default_ttl: 回應沒有 max-age 時的有效秒數
+            upstream_timeout: 連線到目標網站的逾時（秒），也是 CONNECT 原樣轉送的閒置上限
+            intercept_hosts: 解開 HTTPS 的主機樣式（fnmatch），預設為 cache_intercept_hosts
+            log: LogHelper 實例（可選）
+        """
+        self.cache_dir = cache_dir or os.path.join(default_state_dir, 'cache_proxy')
+        self.host = host
+        self.port = port
+        self.upstream_timeout = upstream_timeout
+        self.intercept_hosts = tuple(intercept_hosts) if intercept_hosts is not None else cache_intercept_hosts
+        self.log = log
+        self.cache = ProxyCache(os.path.join(self.cache_dir, 'objects'), max_bytes=max_bytes, default_ttl=default_ttl)
+        self._server = None
+        self._thread = None
+        self._ssl_context = None
+        self._ssl_checked = False
+        self._ssl_lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """
+        取得程序共用的代理，第一次呼叫時啟動
+        （fork 出的子進程會沿用同一個位址，由父進程的代理線程處理）
+        """
+        global _shared_proxy
+        with _shared_proxy_lock:
+            if _shared_proxy is None:
+                _shared_proxy = CachingProxy()
+                _shared_proxy.start()
+            return _shared_proxy
+
+    @property
+    def address(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _log(self, level, message):
+        if self.log:
+            getattr(self.log, level)(message)
+
+    def start(self):
+        """在背景線程啟動代理"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        handler = type('CachingProxyRequestHandler', (_ProxyRequestHandler,), {'proxy': self})
+        self._server = _ProxyServer((self.host, self.port), handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='caching_proxy', daemon=True)
+        self._thread.start()
+        print(f"✓ 快取代理已啟動: {self.address}（快取 {self.cache.total_bytes / 1024 / 1024:.1f} MB）")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def should_intercept(self, host):
+        """CONNECT 的目標主機是否要解開 HTTPS（其餘主機不經快取，原樣轉送）"""
+        host = host.strip('[]').lower()
+        return any(fnmatch.fnmatch(host, pattern) for pattern in self.intercept_hosts)
+
+    def server_ssl_context(self):
+        """
+        解開 HTTPS 用的自簽憑證（第一次使用時以 openssl 產生並保存在快取目錄）
+
+        Returns:
+            ssl.SSLContext: 無法產生憑證時回傳 None（CONNECT 改為原樣轉送）
+        """
+        with self._ssl_lock:
+            if self._ssl_checked:
+                return self._ssl_context
+            self._ssl_checked = True
+
+            cert_path = os.path.join(self.cache_dir, 'proxy_cert.pem')
+            key_path = os.path.join(self.cache_dir, 'proxy_key.pem')
+            try:
+                if not (os.path.exists(cert_path) and os.path.exists(key_path)):
+                    subprocess.run(
+                        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '3650',
+                         '-subj', '/CN=books-ranking-cache-proxy', '-keyout', key_path, '-out', cert_path],
+                        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                    )
+                context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                context.load_cert_chain(cert_path, key_path)
+                self._ssl_context = context
+            except (OSError, subprocess.CalledProcessError, ssl.SSLError) as e:
+                self._log('warning', f"無法產生快取代理憑證，HTTPS 將不經快取: {e}")
+            return self._ssl_context
+
+    def summary(self):
+        stats = dict(self.cache.stats)
+        return (f"命中率 {self.cache.hit_rate():.1%}（命中 {stats['hits']}，未命中 {stats['misses']}，"
+                f"不快取 {stats['bypass']}，過期 {stats['expired']}，淘汰 {stats['evictions']}），"
+                f"由快取提供 {stats['bytes_from_cache'] / 1024 / 1024:.1f} MB，"
+                f"快取大小 {self.cache.total_bytes / 1024 / 1024:.1f} MB")
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+default_state_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+
+# 目錄中保存的欄位（與各爬蟲輸出 CSV 的欄位名稱一致）
+catalog_fields = ['ISBN', 'Publisher', 'author', 'translator', 'fixed_price',
+                  'original_title', 'publish_date', 'category']
+
+# 各欄位的有效天數：定價可能調整，較快過期；其餘書目資料幾乎不變
+default_field_ttl_days = {
+    'fixed_price': 7,
+    'category': 30,
+}
+default_ttl_days = 180
+
+# 視為沒有值的內容
+empty_values = ('', 'N/A', 'nan', 'None', '待獲取', '待爬取')
+
+
+class BookCatalog:
+    """
+    跨執行的書目資料庫（SQLite）
+
+    以 (store, production_id) 為鍵保存各欄位的值與取得時間，
+    每日排行榜 CSV 在爬取前先以目錄中尚未過期的欄位預先填入，只有未知或過期的書籍才需要重新爬取。
+    """
+
+    def __init__(self, db_path=None, field_ttl_days=None, ttl_days=default_ttl_days):
+        """
+        Args:
+            db_path: SQLite 檔案路徑，預設為 state/book_catalog.db
+            field_ttl_days: 各欄位的有效天數（覆寫 default_field_ttl_days）
+            ttl_days: 未指定欄位的有效天數
+        """
+        self.db_path = db_path or os.path.join(default_state_dir, 'book_catalog.db')
+        self.field_ttl_days = dict(default_field_ttl_days)
+        if field_ttl_days:
+            self.field_ttl_days.update(field_ttl_days)
+        self.ttl_days = ttl_days
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS book_fields (
+                store TEXT NOT NULL,
+                production_id TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (store, production_id, field)
+            )
+        ''')
+        self._conn.commit()
+
+    @staticmethod
+    def is_empty(value):
+        return value is None or str(value).strip() in empty_values
+
+    def _is_fresh(self, field, fetched_at, now):
+        ttl = self.field_ttl_days.get(field, self.ttl_days)
+        try:
+            return now - datetime.fromisoformat(fetched_at) <= timedelta(days=ttl)
+        except (TypeError, ValueError):
+            return False
+
+    def lookup(self, store, production_id):
+        """
+        取得書籍尚未過期的欄位
+
+        Returns:
+            dict: 欄位名 -> 值（只包含未過期且有值的欄位）
+        """
+        if self.is_empty(production_id):
+            return {}
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT field, value, fetched_at FROM book_fields WHERE store = ? AND production_id = ?',
+                (store, str(production_id).strip())
+            ).fetchall()
+
+        now = datetime.now()
+        return {
+            field: value for field, value, fetched_at in rows
+            if not self.is_empty(value) and self._is_fresh(field, fetched_at, now)
+        }
+
+    def is_known(self, fields, required=('ISBN', 'fixed_price')):
+        """lookup 的結果是否已包含所有必要欄位（不需重新爬取）"""
+        return all(not self.is_empty(fields.get(field)) for field in required)
+
+    def update(self, store, production_id, fields):
+        """
+        保存書籍的欄位（只保存有值的欄位，已知的值不會被空值覆蓋）
+        """
+        if self.is_empty(production_id):
+            return
+
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (store, str(production_id).strip(), field, str(value).strip(), now)
+            for field, value in fields.items()
+            if field in catalog_fields and not self.is_empty(value)
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO book_fields (store, production_id, field, value, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,186 @@
+import os
+import time
+import signal
+import threading
+import pandas as pd
+
+
+class CsvDataset:
+    """
+    常駐記憶體的 CSV 資料集
+
+    CSV 只在開啟時讀取一次，更新列時只修改記憶體中的 DataFrame 並記錄變更（dirty）的列，
+    累積 flush_every_rows 筆或距上次寫入超過 flush_every_seconds 秒才寫回檔案；
+    結束時（close）或收到 SIGINT／SIGTERM 時也會寫回。
+    寫入時先寫暫存檔再以 os.replace 取代，避免寫到一半中斷而損毀原檔。
+    需要在資料確實寫入檔案後才執行的動作（例如標記爬取進度完成）以 on_flushed 回呼登記。
+    """
+
+    def __init__(self, csv_path, flush_every_rows=20, flush_every_seconds=30,
+                 dtype=None, encoding='utf-8-sig', log=None):
+        """
+        Args:
+            csv_path: CSV 檔案路徑
+            flush_every_rows: 累積多少筆變更後寫回，0 表示不依筆數寫回
+            flush_every_seconds: 距上次寫回超過多少秒後寫回，0 表示不依時間寫回
+            dtype: 傳給 pd.read_csv 的 dtype
+            encoding: 檔案編碼
+            log: LogHelper 實例（可選）
+        """
+        self.csv_path = csv_path
+        self.flush_every_rows = flush_every_rows
+        self.flush_every_seconds = flush_every_seconds
+        self.encoding = encoding
+        self.log = log
+
+        self.df = pd.read_csv(csv_path, encoding=encoding, dtype=dtype)
+        self.dirty_rows = set()
+        self._flush_callbacks = []
+        self.flush_count = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._previous_handlers = {}
+        self._flushing_thread = None  # 正在寫回的執行緒（信號處理函數據此判斷是否被中斷在寫回途中）
+        self._pending_signal = None  # 寫回途中收到的信號，寫回完成後才交給原本的處理函數
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def _log(self, level, message):
+        if self.log:
+            getattr(self.log, level)(message)
+
+    def update_row(self, row_index, values, on_flushed=None):
+        """
+        更新指定列的欄位（只更新 CSV 中已存在的欄位）
+
+        Args:
+            on_flushed: 這次變更寫回檔案後呼叫的函數（可選）
+
+        Returns:
+            bool: 是否成功更新
+        """
+        with self._lock:
+            if row_index not in self.df.index:
+                self._log('warning', f"CSV 中找不到第 {row_index} 行，略過更新")
+                return False
+
+            for key, value in values.items():
+                if key in self.df.columns:
+                    self.df.at[row_index, key] = value
+            self.dirty_rows.add(row_index)
+            if on_flushed is not None:
+                self._flush_callbacks.append(on_flushed)
+
+            if self._should_flush():
+                self.flush()
+            return True
+
+    def call_after_flush(self, callback):
+        """目前的變更都寫回檔案後呼叫 callback；沒有尚未寫回的變更時立即呼叫"""
+        with self._lock:
+            if self.dirty_rows:
+                self._flush_callbacks.append(callback)
+                return
+        callback()
+
+    def _run_flush_callbacks(self, callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self._log('error', f"寫回後的回呼函數執行失敗: {e}")
+
+    def _should_flush(self):
+        if not self.dirty_rows:
+            return False
+        if self.flush_every_rows and len(self.dirty_rows) >= self.flush_every_rows:
+            return True
+        if self.flush_every_seconds and time.monotonic() - self._last_flush >= self.flush_every_seconds:
+            return True
+        return False
+
+    def flush(self):
+        """將變更寫回 CSV（沒有變更時不寫入）"""
+        with self._lock:
+            if not self.dirty_rows:
+                return False
+
+            self._flushing_thread = threading.get_ident()
+            try:
+                temp_path = f"{self.csv_path}.tmp"
+                self.df.to_csv(temp_path, index=False, encoding=self.encoding)
+                os.replace(temp_path, self.csv_path)
+
+                self._log('info', f"已寫回 {len(self.dirty_rows)} 筆變更至 {self.csv_path}")
+                self.dirty_rows.clear()
+                self.flush_count += 1
+                self._last_flush = time.monotonic()
+                callbacks, self._flush_callbacks = self._flush_callbacks, []
+                self._run_flush_callbacks(callbacks)
+            finally:
+                self._flushing_thread = None
+                pending_signal, self._pending_signal = self._pending_signal, None
+
+        if pending_signal is not None:
+            self._dispatch_signal(*pending_signal)
+        return True
+
+    def install_signal_handlers(self):
+        """
+        註冊 SIGINT／SIGTERM 處理：先寫回尚未儲存的變更，再交給原本的處理函數
+        只能在主執行緒呼叫，其他情況（或已註冊過）會略過
+        """
+        if self._previous_handlers or threading.current_thread() is not threading.main_thread():
+            return
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+            except (ValueError, OSError):
+                continue
+
+    def restore_signal_handlers(self):
+        """還原註冊前的信號處理函數"""
+        for signum, handler in self._previous_handlers.items():
+            try:
+                signal.signal(signum, handler)
+            except (ValueError, OSError, TypeError):
+                continue
+        self._previous_handlers = {}
+
+    def _handle_signal(self, signum, frame):
+        if self._flushing_thread == threading.get_ident():
+            # 主執行緒正在寫回途中：不重複寫入同一個暫存檔，等這次寫回完成後再處理信號
+            self._log('warning', f"收到信號 {signum}，等待進行中的寫回完成")
+            self._pending_signal = (signum, frame)
+            return
+
+        self._log('warning', f"收到信號 {signum}，寫回尚未儲存的變更")
+        try:
+            # 其他執行緒正在寫回時，鎖會讓這裡等它完成後才寫回剩餘的變更
+            self.flush()
+        except Exception as e:
+            self._log('error', f"收到信號時寫回 CSV 失敗: {e}")
+        self._dispatch_signal(signum, frame)
+
+    def _dispatch_signal(self, signum, frame):
+        """交給註冊前的信號處理函數（沒有時 SIGINT 拋出 KeyboardInterrupt，其他信號結束程式）"""
+        previous = self._previous_handlers.get(signum)
+        if callable(previous):
+            previous(signum, frame)
+        elif signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        else:
+            raise SystemExit(128 + signum)
+
+    def close(self):
+        """寫回剩餘變更並還原信號處理函數"""
+        try:
+            self.flush()
+        finally:
+            self.restore_signal_handlers()
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# 爬取狀態
+STATUS_PENDING = 'pending'
+STATUS_IN_FLIGHT = 'in_flight'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+default_state_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+
+
+class CrawlFrontier:
+    """
+    以 SQLite 保存的爬取進度（三個詳細資訊爬蟲共用同一個資料庫）
+
+    每個 URL 以 (crawler, run_key, url) 為鍵，記錄 pending / in_flight / done / failed 狀態與嘗試次數。
+    run_key 通常是輸入 CSV 的絕對路徑，同一份 CSV 重新執行時可以 --resume 從上次中斷處繼續。
+    """
+
+    def __init__(self, crawler, run_key, db_path=None, max_attempts=3):
+        """
+        Args:
+            crawler: 爬蟲名稱（bookscom / eslite / kingstone）
+            run_key: 本次執行的識別鍵（通常是輸入 CSV 的絕對路徑）
+            db_path: SQLite 檔案路徑，預設為 state/crawl_frontier.db
+            max_attempts: 失敗幾次後不再於 resume 時重試
+        """
+        self.crawler = crawler
+        self.run_key = os.path.abspath(run_key) if os.path.exists(run_key) else run_key
+        self.db_path = db_path or os.path.join(default_state_dir, 'crawl_frontier.db')
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        # 多個工作線程共用同一個連線（以鎖同步），分片模式下各進程各自連線
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                crawler TEXT NOT NULL,
+                run_key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (crawler, run_key, url)
+            )
+        ''')
+        self._conn.commit()
+
+    def connection_args(self):
+        """回傳在其他進程重建相同 frontier 所需的參數"""
+        return (self.crawler, self.run_key, self.db_path, self.max_attempts)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def reset(self):
+        """清除此爬蟲與 run_key 的所有記錄（不續跑時使用）"""
+        self._execute('DELETE FROM frontier WHERE crawler = ? AND run_key = ?', (self.crawler, self.run_key))
+
+    def seed(self, urls):
+        """加入 URL（已存在的記錄保留原狀態）"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO frontier (crawler, run_key, url, status, attempts, updated_at) VALUES (?, ?, ?, ?, 0, ?)',
+                [(self.crawler, self.run_key, url, STATUS_PENDING, now) for url in urls if url]
+            )
+            self._conn.commit()
+
+    def recover_in_flight(self):
+        """上次中斷時仍在處理中的 URL 改回 pending，回傳筆數"""
+        cursor = self._execute(
+            'UPDATE frontier SET status = ? WHERE crawler = ? AND run_key = ? AND status = ?',
+            (STATUS_PENDING, self.crawler, self.run_key, STATUS_IN_FLIGHT)
+        )
+        return cursor.rowcount
+
+    def _set_status(self, url, status, error=None, increment=False):
+        now = datetime.now().isoformat(timespec='seconds')
+        self._execute(
+            f'''INSERT INTO frontier (crawler, run_key, url, status, attempts, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (crawler, run_key, url) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = attempts + {1 if increment else 0},
+                    last_error = COALESCE(excluded.last_error, last_error),
+                    updated_at = excluded.updated_at''',
+            (self.crawler, self.run_key, url, status, 1 if increment else 0, error, now)
+        )
+
+    def claim(self, url):
+        """開始處理：標記為 in_flight 並增加嘗試次數"""
+        self._set_status(url, STATUS_IN_FLIGHT, increment=True)
+
+    def mark_done(self, url):
+        self._set_status(url, STATUS_DONE)
+
+    def mark_failed(self, url, error=None):
+        self._set_status(url, STATUS_FAILED, error=str(error)[:500] if error else None)
+
+    def is_done(self, url):
+        rows = self._query(
+            'SELECT status FROM frontier WHERE crawler = ? AND run_key = ? AND url = ?',
+            (self.crawler, self.run_key, url)
+        )
+        return bool(rows) and rows[0][0] == STATUS_DONE
+
+    def completed_urls(self):
+        """
+        resume 時不需再處理的 URL：已完成，或失敗次數已達上限
+        """
+        rows = self._query(
+            'SELECT url FROM frontier WHERE crawler = ? AND run_key = ? AND (status = ? OR (status = ? AND attempts >= ?))',
+            (self.crawler, self.run_key, STATUS_DONE, STATUS_FAILED, self.max_attempts)
+        )
+        return {row[0] for row in rows}
+
+    def counts(self):
+        """各狀態的 URL 數量"""
+        rows = self._query(
+            'SELECT status, COUNT(*) FROM frontier WHERE crawler = ? AND run_key = ? GROUP BY status',
+            (self.crawler, self.run_key)
+        )
+        return {status: count for status, count in rows}
+
+    def prepare(self, urls, resume=False):
+        """
+        執行前準備：不續跑時清除舊記錄；續跑時把中斷的 in_flight 改回 pending
+
+        Returns:
+            set: 本次應跳過的 URL
+        """
+        if resume:
+            self.recover_in_flight()
+            self.seed(urls)
+            return self.completed_urls()
+
+        self.reset()
+        self.seed(urls)
+        return set()
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,83 @@
+import os
+import json
+import threading
+
+
+class JournalWriter:
+    """
+    只追加（append-only）的結果日誌
+
+    每完成一筆資料就以一行 JSON 追加到日誌檔並立即 flush，寫入成本與資料量無關；
+    定期（以及結束時）再把日誌內容一次合併（compact）到最終 CSV。
+    日誌在重新啟動時可重播（replay），因此程式中斷也不會遺失已完成的資料，
+    合併時先寫入暫存檔再以 os.replace 取代，原始 CSV 不會因寫到一半而損壞。
+    """
+
+    def __init__(self, journal_path, compact_every=50):
+        """
+        Args:
+            journal_path: 日誌檔路徑（JSON Lines）
+            compact_every: 每追加多少筆就合併一次，None 或 0 表示只在結束時合併
+        """
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        journal_dir = os.path.dirname(journal_path)
+        if journal_dir and not os.path.exists(journal_dir):
+            os.makedirs(journal_dir)
+
+    def append(self, record):
+        """
+        追加一筆記錄
+
+        Returns:
+            bool: True 表示已達到合併門檻，呼叫端應執行 compact
+        """
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending += 1
+            return bool(self.compact_every) and self._pending >= self.compact_every
+
+    def replay(self):
+        """讀取日誌中的所有記錄（忽略中斷時寫到一半的最後一行）"""
+        records = []
+        if not os.path.exists(self.journal_path):
+            return records
+
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+    def compact(self, write_func, output_file):
+        """
+        將目前狀態寫入最終檔案
+
+        Args:
+            write_func: 寫入函數，參數為暫存檔路徑（例如 lambda path: df.to_csv(path, ...)）
+            output_file: 最終輸出檔案路徑
+        """
+        with self._lock:
+            temp_file = f"{output_file}.tmp"
+            write_func(temp_file)
+            os.replace(temp_file, output_file)
+            self._pending = 0
+
+    def clear(self):
+        """刪除日誌檔（所有記錄都已合併到最終檔案後呼叫）"""
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._pending = 0
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+default_state_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+
+# 狀態超過此時數未更新時，下次執行從初始間隔重新開始（伺服器的封鎖狀態可能已改變）
+state_stale_hours = 12
+
+# 每累積多少次狀態變化寫回一次狀態檔
+save_every = 10
+
+_shared_controller = None
+_shared_controller_lock = threading.Lock()
+
+
+class HostRate:
+    """
+    單一主機的 AIMD 速率狀態
+
+    以「每秒頁數」為速率：頁面正常載入時線性增加（additive increase），
+    偵測到封鎖、登入重定向或連續錯誤時減半（multiplicative decrease）。
+    每個工作執行緒處理完一頁後等待 1/速率 秒（加上 ±25% 抖動）。
+    """
+
+    def __init__(self, key, initial_delay, min_delay, max_delay, block_cooldown,
+                 ramp_pages=50, decrease_factor=0.5, rate=None):
+        """
+        Args:
+            key: 主機名稱（可加上通道後綴，例如 'www.books.com.tw#http'）
+            initial_delay: 沒有歷史狀態時的間隔（秒）
+            min_delay: 最短間隔（秒）
+            max_delay: 最長間隔（秒）
+            block_cooldown: 被封鎖時的基本冷卻時間（秒），連續封鎖時倍數增加
+            ramp_pages: 從最慢加速到最快需要的連續成功頁數
+            decrease_factor: 被封鎖時速率乘上的係數
+            rate: 由狀態檔還原的速率（每秒頁數）
+        """
+        self.key = key
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.block_cooldown = block_cooldown
+        self.decrease_factor = decrease_factor
+        self.max_rate = 1.0 / min_delay
+        self.min_rate = 1.0 / max_delay
+        self.increase_step = (self.max_rate - self.min_rate) / max(1, ramp_pages)
+        self.rate = self._clamp(rate if rate else 1.0 / initial_delay)
+        self.consecutive_blocks = 0
+        self.stats = {'success': 0, 'blocked': 0, 'waited': 0.0}
+        self._lock = threading.Lock()
+
+    def _clamp(self, rate):
+        return min(self.max_rate, max(self.min_rate, rate))
+
+    @property
+    def delay(self):
+        """目前的間隔（秒）"""
+        return 1.0 / self.rate
+
+    def on_success(self):
+        """頁面正常載入：速率線性增加"""
+        with self._lock:
+            self.rate = self._clamp(self.rate + self.increase_step)
+            self.consecutive_blocks = 0
+            self.stats['success'] += 1
+
+    def on_block(self):
+        """
+        偵測到封鎖：速率減半
+
+        Returns:
+            float: 建議的冷卻時間（秒），連續封鎖時倍數增加，最多 max_delay 與 block_cooldown 中較大者的 4 倍
+        """
+        with self._lock:
+            self.rate = self._clamp(self.rate * self.decrease_factor)
+            self.consecutive_blocks += 1
+            self.stats['blocked'] += 1
+            cooldown = self.block_cooldown * (2 ** (self.consecutive_blocks - 1))
+            return min(cooldown, 4 * max(self.max_delay, self.block_cooldown))
+
+    def next_delay(self):
+        """下一次等待的秒數（±25% 抖動，避免固定節奏）"""
+        return self.delay * random.uniform(0.75, 1.25)
+
+    def wait(self):
+        """依目前速率等待，回傳實際等待的秒數"""
+        delay = self.next_delay()
+        time.sleep(delay)
+        with self._lock:
+            self.stats['waited'] += delay
+        return delay
+
+    def summary(self):
+        with self._lock:
+            return {
+                'delay': round(self.delay, 2),
+                'success': self.stats['success'],
+                'blocked': self.stats['blocked'],
+                'waited': round(self.stats['waited'], 1),
+            }
+
+
+class RateController:
+    """
+    各主機的自適應請求間隔控制（取代固定的隨機延遲）
+
+    各主機的速率存於狀態檔（預設 state/rate_state.json），下次執行沿用上次學到的速率。
+    同一程序內所有執行緒共用同一個主機狀態，任一執行緒被封鎖時全部一起放慢。
+    """
+
+    def __init__(self, state_path=None):
+        self.state_path = state_path or os.path.join(default_state_dir, 'rate_state.json')
+        self._hosts = {}
+        self._saved_state = self._load()
+        self._pending_changes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shared():
+        """取得程序共用的控制器"""
+        global _shared_controller
+        with _shared_controller_lock:
+            if _shared_controller is None:
+                _shared_controller = RateController()
+            return _shared_controller
+
+    @staticmethod
+    def host_key(url, channel=None):
+        """由 URL 取得主機鍵值（channel 用於區分同一主機的不同抓取方式，例如 HTTP 與瀏覽器）"""
+        host = urlparse(url).netloc or url
+        return f"{host}#{channel}" if channel else host
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        cutoff = time.time() - state_stale_hours * 3600
+        return {key: entry for key, entry in state.items()
+                if isinstance(entry, dict) and entry.get('updated_at', 0) >= cutoff}
+
+    def get(self, url, channel=None, **limits):
+        """
+        取得主機的速率狀態（第一次取得時以 limits 建立，並還原狀態檔中的速率）
+
+        Args:
+            url: 目標 URL 或主機名稱
+            channel: 同一主機的抓取方式（可選）
+            **limits: HostRate 的參數（initial_delay, min_delay, max_delay, block_cooldown ...）
+        """
+        key = self.host_key(url, channel)
+        with self._lock:
+            host_rate = self._hosts.get(key)
+            if host_rate is None:
+                saved = self._saved_state.get(key, {})
+                host_rate = HostRate(key, rate=saved.get('rate'), **limits)
+                self._hosts[key] = host_rate
+            return host_rate
+
+    def record_success(self, host_rate):
+        host_rate.on_success()
+        self._changed()
+
+    def record_block(self, host_rate):
+        """記錄封鎖並立即寫回狀態檔，回傳建議的冷卻時間（秒）"""
+        cooldown = host_rate.on_block()
+        self.save()
+        return cooldown
+
+    def _changed(self):
+        with self._lock:
+            self._pending_changes += 1
+            should_save = self._pending_changes >= save_every
+        if should_save:
+            self.save()
+
+    def save(self):
+        """寫回狀態檔（合併其他程序寫入的主機，先寫暫存檔再取代）"""
+        with self._lock:
+            self._pending_changes = 0
+            now = time.time()
+            updates = {key: {'rate': host_rate.rate, 'delay': round(host_rate.delay, 3), 'updated_at': now}
+                       for key, host_rate in self._hosts.items()}
+        if not updates:
+            return
+        try:
+            state = self._load()
+            state.update(updates)
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"⚠️  無法寫入速率狀態檔 {self.state_path}: {e}")
+
+    def summary(self):
+        with self._lock:
+            return {key: host_rate.summary() for key, host_rate in self._hosts.items()}
@@ -4,16 +4,214 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium import webdriver
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import sys
 import os
 import subprocess
+import socket
+import threading
+import queue
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from helper.tor_helper import ProxyHealthRegistry
+from helper.cache_proxy_helper import CachingProxy
 
 await_time = 10
 
+# 已穩定的頁面：id(driver) -> 標記時的網址，網址改變或經由 load_page 重新導航即失效
+_ready_pages_lock = threading.Lock()
+_ready_pages = {}
+
+# 就緒訊號：指定 ready_selector 時須等到該元素出現，未指定時才以 document.readyState 為 complete 為準
+page_ready_script = """
+const selector = arguments[0];
+return selector ? document.querySelector(selector) !== null : document.readyState === 'complete';
+"""
+
+# 每次 safe_find_* 查找的等待統計（保留最近 lookup_history_size 筆明細）
+lookup_history_size = 200
+_lookup_stats_lock = threading.Lock()
+_lookup_stats = {'calls': 0, 'found': 0, 'missed': 0, 'settled': 0, 'waited': 0, 'wait_seconds': 0.0, 'max_wait': 0.0,
+                 'ready_waits': 0, 'ready_seconds': 0.0}
+_lookup_history = deque(maxlen=lookup_history_size)
+
+# 各站點商品頁「內容已出現」的條件：每個選擇器都要找到有文字的元素（同一字串中以逗號分隔代表任一即可）
+content_ready_selectors = {
+    'bookscom': ['div.type02_p003'],
+    'eslite': ['h1, .product-title', '.product-information'],
+    'kingstone': ['.basicarea li.basicunit'],
+}
+
+# wait_for_content 在瀏覽器中執行的非同步腳本：以 MutationObserver 監看 DOM，
+# 條件成立、或頁面載入完成後 DOM 靜止 idle_ms 毫秒、或達到上限時回傳
+content_wait_script = """
+const [selectors, timeoutMs, idleMs, settleMs] = arguments;
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let lastMutation = start;
+let presentAt = null;
+let finished = false;
+let observer = null;
+let timer = null;
+
+function present() {
+    return selectors.every(selector => {
+        for (const el of document.querySelectorAll(selector)) {
+            if ((el.textContent || '').trim()) return true;
+        }
+        return false;
+    });
+}
+
+function finish(reason) {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearInterval(timer);
+    done({ok: present(), reason: reason, ms: Math.round(performance.now() - start)});
+}
+
+function evaluate() {
+    const now = performance.now();
+    if (presentAt === null && present()) presentAt = now;
+    if (presentAt !== null && now - Math.max(presentAt, lastMutation) >= settleMs) return finish('present');
+    if (now - start >= timeoutMs) return finish('timeout');
+    if (presentAt === null && document.readyState === 'complete' && now - lastMutation >= idleMs) return finish('idle');
+}
+
+observer = new MutationObserver(() => { lastMutation = performance.now(); if (settleMs === 0) evaluate(); });
+observer.observe(document.documentElement || document, {childList: true, subtree: true, characterData: true});
+timer = setInterval(evaluate, 100);
+evaluate();
+"""
+
+# 每個站點 wait_for_content 的實際等待時間統計
+_content_wait_stats_lock = threading.Lock()
+_content_wait_stats = {}
+
+# 持久化 Chrome 設定檔：每個站點的每個工作槽位各自一個 user-data-dir 與固定的遠端除錯埠，
+# 瀏覽器在程式結束後保持開啟，下次執行以 debuggerAddress 直接接手（保留登入狀態）
+chrome_profile_root = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state', 'chrome_profiles')
+profile_debug_base_ports = {'bookscom': 9300, 'eslite': 9320, 'kingstone': 9340}
+
+# DriverPool.acquire 等待閒置瀏覽器時重新檢查的間隔（秒）
+acquire_poll_seconds = 0.5
+
+# ChromeDriverManager().install() 的快取路徑（每個程序只需安裝/檢查一次）
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+# 精簡模式封鎖的資源（CDP Network.setBlockedURLs 的 URL pattern），擷取程式只讀取文字節點
+lean_blocked_url_patterns = {
+    'image': ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.svg*', '*.ico*', '*.bmp*', '*.avif*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.ogg*', '*youtube.com/embed*', '*ytimg.com*'],
+    'tracker': [
+        '*googletagmanager.com*', '*google-analytics.com*', '*analytics.google.com*',
+        '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*', '*adservice.google.*',
+        '*connect.facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*',
+        '*criteo.com*', '*criteo.net*', '*scorecardresearch.com*', '*taboola.com*', '*outbrain.com*',
+        '*tiktok.com/i18n/pixel*', '*analytics.tiktok.com*', '*d.line-scdn.net/n/line_tag*', '*tr.line.me*',
+        '*/gtm.js*', '*/analytics.js*', '*/fbevents.js*',
+    ],
+}
+
+# batch_extract 在瀏覽器中執行的腳本：依序嘗試每個欄位的選擇器，一次回傳所有欄位
+batch_extract_script = """
+const spec = arguments[0];
+const result = {};
+
+function query(selector) {
+    if (selector.css) {
+        return Array.from(document.querySelectorAll(selector.css));
+    }
+    const snapshot = document.evaluate(selector.xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) {
+        nodes.push(snapshot.snapshotItem(i));
+    }
+    return nodes;
+}
+
+function read(node, selector) {
+    if (!node) {
+        return '';
+    }
+    if (selector.mode === 'attr') {
+        return (node.getAttribute(selector.attr) || '').trim();
+    }
+    if (selector.mode === 'parent_text') {
+        node = node.parentElement;
+        if (!node) {
+            return '';
+        }
+    }
+    return (node.innerText || node.textContent || '').trim();
+}
+
+for (const [field, selectors] of Object.entries(spec)) {
+    result[field] = null;
+    for (const selector of selectors) {
+        let nodes;
+        try {
+            nodes = query(selector);
+        } catch (e) {
+            continue;
+        }
+        if (selector.min_count && nodes.length < selector.min_count) {
+            continue;
+        }
+        nodes = nodes.slice(selector.skip || 0);
+
+        const pattern = selector.pattern ? new RegExp(selector.pattern) : null;
+        const exclude = selector.exclude || [];
+        const values = [];
+        for (const node of nodes) {
+            const value = read(node, selector);
+            if (value && !exclude.includes(value) && (!pattern || pattern.test(value))) {
+                values.push(value);
+                if (selector.mode !== 'texts') {
+                    break;
+                }
+            }
+        }
+        if (values.length) {
+            result[field] = selector.mode === 'texts' ? values : values[0];
+            break;
+        }
+    }
+}
+return result;
+"""
+
 class SeleniumHelper :
+    cache_proxy_address = None  # 設定後，新建立的 Chrome 選項都經由本機快取代理連線
+
+    @staticmethod
+    def enable_cache_proxy(proxy=None):
+        """
+        之後由 get_chrome_options 建立的瀏覽器都經由快取代理連線（Tor 代理優先）
+        
+        Args:
+            proxy: CachingProxy 實例，未指定時使用程序共用的代理
+        """
+        proxy = proxy or CachingProxy.shared()
+        SeleniumHelper.cache_proxy_address = proxy.address
+        return proxy
+
     @staticmethod
-    def get_chrome_options():
+    def disable_cache_proxy():
+        SeleniumHelper.cache_proxy_address = None
+
+    @staticmethod
+    def get_chrome_options(lean=False):
+        """
+        Args:
+            lean: 精簡模式，以 content settings 停用圖片與彈出視窗（字型、影音與追蹤器由 apply_lean_profile 封鎖）
+        """
         options = webdriver.ChromeOptions()
         
         # 反Cloudflare檢測設置
@@ -34,55 +232,56 @@ class SeleniumHelper :
         prefs = {
             "profile.default_content_setting_values.notifications": 2  # 1: 允许, 2: 阻止
         }
+        if lean:
+            prefs.update({
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.popups": 2,
+                "profile.managed_default_content_settings.plugins": 2,
+            })
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_argument('--autoplay-policy=user-gesture-required')
         options.add_experimental_option("prefs", prefs)
         options.page_load_strategy = 'eager'
         
+        if SeleniumHelper.cache_proxy_address:
+            options.add_argument(f'--proxy-server={SeleniumHelper.cache_proxy_address}')
+        
         return options
     
     @staticmethod
     def is_tor_available():
-        """檢查 Tor 代理是否可用"""
-        import socket
-        try:
-            # 嘗試連接到默認 Tor SOCKS 端口 (9050)
-            print(f"正在檢查 Tor 代理是否可用 (localhost:9050)...")
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(3)  # 設置超時為3秒
-            s.connect(('127.0.0.1', 9050))
-            s.close()
-            print(f"✅ Tor 代理可用")
+        """檢查 Tor 代理是否可用（讀取背景健康檢查的快取）"""
+        registry = ProxyHealthRegistry.shared()
+        registry.wait_ready()
+        available_ports = registry.available_ports()
+        if available_ports:
+            print(f"✅ Tor 代理可用（端口: {available_ports}）")
             return True
-        except socket.error as e:
-            print(f"❌ Tor 代理不可用: {e}")
-            
-            # 檢查是否有其他端口可用 (以防萬一)
-            alternate_ports = [9052, 9054, 9056, 9058, 9060]
-            for port in alternate_ports:
-                try:
-                    print(f"嘗試檢查替代端口 {port}...")
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    s.settimeout(1)
-                    s.connect(('127.0.0.1', port))
-                    s.close()
-                    print(f"✅ 發現可用的替代 Tor 端口: {port}")
-                    return True
-                except:
-                    pass
-            
-            print("⚠️ 未找到任何可用的 Tor 代理端口")
-            return False
+        
+        print("⚠️ 未找到任何可用的 Tor 代理端口")
+        return False
 
     @staticmethod
-    def get_chrome_options_with_tor():
-        """獲取配置了Tor代理的Chrome選項"""
-        options = SeleniumHelper.get_chrome_options()  # 獲取基本配置
+    def get_chrome_options_with_tor(tor_port=None, options=None):
+        """
+        獲取配置了Tor代理的Chrome選項
+        
+        Args:
+            tor_port: 指定的 Tor SOCKS 端口（例如 TorCircuitPool 分配的 circuit），未指定時自動尋找
+            options: 要加上代理設定的既有 Chrome 選項，未指定時使用 get_chrome_options()
+        """
+        if options is None:
+            options = SeleniumHelper.get_chrome_options()  # 獲取基本配置
         
         # 尋找可用的Tor端口
-        tor_port = SeleniumHelper.find_available_tor_port()
+        if tor_port is None:
+            tor_port = SeleniumHelper.find_available_tor_port()
         if tor_port:
             # 如果找到可用端口，設置代理
             proxy = f"socks5://127.0.0.1:{tor_port}"
             print(f"使用Tor代理: {proxy}")
+            # Chrome 只能設定一個代理，移除快取代理
+            options.arguments[:] = [arg for arg in options.arguments if not arg.startswith('--proxy-server=')]
             options.add_argument(f'--proxy-server={proxy}')
             
             # 增加Tor相關設置
@@ -110,58 +309,591 @@ class SeleniumHelper :
 
     @staticmethod
     def find_available_tor_port():
-        """找出可用的 Tor SOCKS 端口"""
-        import socket
-        # 首先嘗試默認端口
-        try:
-            print(f"檢查默認 Tor 端口 9050...")
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(3)
-            s.connect(('127.0.0.1', 9050))
-            s.close()
-            print(f"✅ 默認 Tor 端口 9050 可用")
+        """找出可用的 Tor SOCKS 端口（優先使用默認端口 9050，否則選擇延遲最低的端口）"""
+        registry = ProxyHealthRegistry.shared()
+        registry.wait_ready()
+        
+        if registry.is_up(9050):
             return 9050
-        except:
-            pass
-            
-        # 嘗試其他可能的端口
-        alternate_ports = [9052, 9054, 9056, 9058, 9060]
-        for port in alternate_ports:
-            try:
-                print(f"檢查替代 Tor 端口 {port}...")
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.settimeout(1)
-                s.connect(('127.0.0.1', port))
-                s.close()
-                print(f"✅ 發現可用的替代 Tor 端口: {port}")
-                return port
-            except:
-                pass
+        
+        available_ports = registry.available_ports()
+        if available_ports:
+            return available_ports[0]
         
         print("❌ 未找到任何可用的 Tor 端口")
         return None
     
+    @staticmethod
+    def get_driver_path():
+        """取得 ChromeDriver 路徑，只在第一次呼叫時執行 ChromeDriverManager().install()"""
+        global _driver_path
+        with _driver_path_lock:
+            if _driver_path is None:
+                _driver_path = ChromeDriverManager().install()
+            return _driver_path
+
     @staticmethod
     def init_driver_with_options(options):
-        service = Service(ChromeDriverManager().install())
+        service = Service(SeleniumHelper.get_driver_path())
         driver = webdriver.Chrome(service=service, options=options)
         return driver
         
+    @staticmethod
+    def get_profile_dir(site, slot=0):
+        """站點工作槽位的持久化設定檔目錄（state/chrome_profiles/<site>_<slot>）"""
+        return os.path.join(chrome_profile_root, f"{site}_{slot}")
+
+    @staticmethod
+    def get_debugger_address(site, slot=0):
+        """站點工作槽位的遠端除錯位址（127.0.0.1:<基準埠 + slot>）"""
+        return f"127.0.0.1:{profile_debug_base_ports.get(site, 9400) + slot}"
+
+    @staticmethod
+    def is_debugger_listening(debugger_address, timeout=0.5):
+        """該位址是否已有開啟遠端除錯的 Chrome 在監聽"""
+        host, _, port = debugger_address.rpartition(':')
+        try:
+            with socket.create_connection((host or '127.0.0.1', int(port)), timeout=timeout):
+                return True
+        except (OSError, ValueError):
+            return False
+
+    @staticmethod
+    def use_persistent_profile(options, site, slot=0):
+        """
+        讓新啟動的 Chrome 使用持久化設定檔並開啟遠端除錯埠，且在 ChromeDriver 結束後保持開啟
+        """
+        profile_dir = SeleniumHelper.get_profile_dir(site, slot)
+        os.makedirs(profile_dir, exist_ok=True)
+        port = SeleniumHelper.get_debugger_address(site, slot).rpartition(':')[2]
+        options.add_argument(f'--user-data-dir={profile_dir}')
+        options.add_argument(f'--remote-debugging-port={port}')
+        options.add_experimental_option('detach', True)
+        return options
+
+    @staticmethod
+    def attach_to_chrome(debugger_address):
+        """以 debuggerAddress 接手已在執行的 Chrome（需以 --remote-debugging-port 啟動），沿用其分頁與登入狀態"""
+        options = Options()
+        options.debugger_address = debugger_address
+        return SeleniumHelper.init_driver_with_options(options)
+
+    @staticmethod
+    def open_profile_driver(site, slot=0, options=None):
+        """
+        取得工作槽位的瀏覽器：該槽位的 Chrome 仍在執行時直接接手，否則以持久化設定檔啟動新的 Chrome
+
+        Args:
+            options: 需要啟動新 Chrome 時使用的選項（預設 get_chrome_options()），接手時不適用
+
+        Returns:
+            tuple: (driver, attached)，attached 為 True 表示接手了已在執行的瀏覽器
+        """
+        debugger_address = SeleniumHelper.get_debugger_address(site, slot)
+        if SeleniumHelper.is_debugger_listening(debugger_address):
+            try:
+                return SeleniumHelper.attach_to_chrome(debugger_address), True
+            except Exception as e:
+                print(f"⚠️ 接手 {debugger_address} 的瀏覽器失敗，改為啟動新的瀏覽器: {e}")
+        options = SeleniumHelper.use_persistent_profile(options or SeleniumHelper.get_chrome_options(), site, slot)
+        return SeleniumHelper.init_driver_with_options(options), False
+
+    @staticmethod
+    def release_driver(driver, keep_browser=False):
+        """
+        結束瀏覽器的控制
+
+        keep_browser=True 時只結束 ChromeDriver，Chrome 保持開啟供下次執行接手；否則呼叫 driver.quit()
+        """
+        SeleniumHelper.forget_page_ready(driver)
+        if keep_browser:
+            driver.service.stop()
+        else:
+            driver.quit()
+
     @staticmethod
     def init_driver():
         # 使用默認選項
         chrome_options = SeleniumHelper.get_chrome_options()
         return SeleniumHelper.init_driver_with_options(chrome_options)
     
+    @staticmethod
+    def get_lean_blocked_urls(resource_types=None):
+        """
+        取得精簡模式要封鎖的 URL pattern
+        
+        Args:
+            resource_types: 要封鎖的資源類型，預設為全部（image / font / media / tracker）
+        """
+        patterns = []
+        for resource_type, type_patterns in lean_blocked_url_patterns.items():
+            if resource_types and resource_type not in resource_types:
+                continue
+            patterns.extend(type_patterns)
+        return patterns
+
+    @staticmethod
+    def apply_lean_profile(driver, resource_types=None):
+        """
+        以 CDP Network.setBlockedURLs 封鎖圖片、字型、影音與廣告／分析追蹤器（需在瀏覽器建立後、載入頁面前呼叫）
+        
+        setBlockedURLs 只能列出要封鎖的 pattern、無法設定例外，因此 pattern 只針對副檔名與第三方追蹤器，
+        不涵蓋各站的商品頁、API 與腳本
+        
+        Returns:
+            bool: 是否成功套用
+        """
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {
+                'urls': SeleniumHelper.get_lean_blocked_urls(resource_types)
+            })
+            return True
+        except Exception as e:
+            print(f"⚠️ 套用精簡模式失敗: {e}")
+            return False
+
+    @staticmethod
+    def parse_netscape_cookies(cookie_file):
+        """解析 Netscape 格式的 cookies 文件，回傳與 driver.get_cookies() 相同格式的列表"""
+        cookies = []
+        with open(cookie_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                # 跳過註釋和空行
+                if line.startswith('#') or line.strip() == '':
+                    continue
+                parts = line.strip().split('\t')
+                if len(parts) < 7:
+                    continue
+                domain, flag, path, secure, expiry, name, value = parts[:7]
+                cookie = {
+                    'name': name,
+                    'value': value,
+                    'domain': domain,
+                    'path': path,
+                    'secure': secure.upper() == 'TRUE',
+                    'httpOnly': False
+                }
+                if expiry != '0':
+                    try:
+                        cookie['expiry'] = int(expiry)
+                    except ValueError:
+                        pass
+                cookies.append(cookie)
+        return cookies
+
+    @staticmethod
+    def load_cookies_file(cookie_file):
+        """
+        讀取 cookies 檔案：.json（{'cookies': [...]} 或 cookie 列表）或 Netscape 格式
+
+        Returns:
+            list: 與 driver.get_cookies() 相同格式的 cookie 列表，讀取失敗時為空列表
+        """
+        try:
+            if cookie_file.lower().endswith('.json'):
+                with open(cookie_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data.get('cookies', []) if isinstance(data, dict) else list(data)
+            return SeleniumHelper.parse_netscape_cookies(cookie_file)
+        except Exception as e:
+            print(f"⚠️ 讀取 cookies 檔案失敗 ({cookie_file}): {e}")
+            return []
+
+    @staticmethod
+    def to_cdp_cookie(cookie, default_url=None):
+        """將 driver.get_cookies() 格式的 cookie 轉為 CDP Network.CookieParam"""
+        param = {'name': cookie['name'], 'value': str(cookie.get('value', ''))}
+        if cookie.get('domain'):
+            param['domain'] = cookie['domain']
+        elif default_url:
+            param['url'] = default_url
+        for key in ('path', 'secure', 'httpOnly'):
+            if key in cookie:
+                param[key] = cookie[key]
+        expiry = cookie.get('expiry', cookie.get('expires'))
+        if expiry not in (None, '', -1):
+            try:
+                param['expires'] = float(expiry)
+            except (TypeError, ValueError):
+                pass
+        same_site = str(cookie.get('sameSite') or '').capitalize()
+        if same_site in ('Strict', 'Lax', 'None'):
+            param['sameSite'] = same_site
+        return param
+
+    @staticmethod
+    def set_cookies_cdp(driver, cookies, default_url=None):
+        """
+        以 CDP Network.setCookies 注入 cookies（可在第一次導航前呼叫，不必先載入該網域的頁面）
+
+        Args:
+            cookies: driver.get_cookies() 格式的列表
+            default_url: cookie 沒有 domain 時所屬的網址
+
+        Returns:
+            bool: 是否注入成功（失敗時呼叫端可改用載入頁面後 add_cookie 的方式）
+        """
+        params = [SeleniumHelper.to_cdp_cookie(cookie, default_url) for cookie in cookies if cookie.get('name')]
+        if not params:
+            return True
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': params})
+            return True
+        except Exception as e:
+            print(f"⚠️ CDP 注入 cookies 失敗: {e}")
+            return False
+
+    @staticmethod
+    def enable_network_capture(options):
+        """開啟 Chrome performance log（記錄 CDP Network 事件），需在建立瀏覽器前設定"""
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        return options
+
+    @staticmethod
+    def clear_network_log(driver):
+        """清空已累積的 performance log（載入新頁面前呼叫，避免讀到上一頁的回應）"""
+        try:
+            driver.get_log('performance')
+        except Exception:
+            pass
+
+    @staticmethod
+    def capture_json_responses(driver, url_patterns, timeout=15, until=None, poll_interval=0.5):
+        """
+        從 performance log 收集頁面載入的 JSON 回應（需先以 enable_network_capture 建立瀏覽器）
+
+        Args:
+            url_patterns: URL 需包含其中任一字串才會讀取回應內容
+            timeout: 最多等待秒數
+            until: callable(url, data)，回傳 True 時立即停止等待
+            poll_interval: 讀取 log 的間隔（秒）
+
+        Returns:
+            list: [(url, data), ...]
+        """
+        pending = {}  # requestId -> url（已收到回應標頭，等待內容下載完成）
+        responses = []
+        deadline = time.monotonic() + timeout
+
+        while time.monotonic() < deadline:
+            try:
+                entries = driver.get_log('performance')
+            except Exception as e:
+                print(f"⚠️ 讀取 performance log 失敗: {e}")
+                return responses
+
+            for entry in entries:
+                try:
+                    message = json.loads(entry['message'])['message']
+                except (KeyError, ValueError, TypeError):
+                    continue
+                method = message.get('method')
+                params = message.get('params', {})
+
+                if method == 'Network.responseReceived':
+                    response = params.get('response', {})
+                    url = response.get('url', '')
+                    if 'json' in response.get('mimeType', '') and any(pattern in url for pattern in url_patterns):
+                        pending[params.get('requestId')] = url
+                elif method == 'Network.loadingFinished' and params.get('requestId') in pending:
+                    url = pending.pop(params['requestId'])
+                    try:
+                        body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                        data = json.loads(body.get('body', ''))
+                    except Exception:
+                        continue
+                    responses.append((url, data))
+                    if until and until(url, data):
+                        return responses
+
+            time.sleep(poll_interval)
+
+        return responses
+
+    @staticmethod
+    def batch_extract(driver, spec):
+        """
+        以一次 execute_script 取得頁面上的多個欄位（所有備用選擇器都在瀏覽器中嘗試）
+
+        Args:
+            spec: 欄位名 -> 選擇器列表，依序嘗試直到取得值。每個選擇器為 dict：
+                css / xpath: 選擇器
+                mode: 'text'（預設，第一個有值元素的文字）、'texts'（所有元素文字的列表）、
+                      'parent_text'（元素父節點的文字）、'attr'（屬性值，需搭配 attr）
+                pattern: 文字需符合的正規表示式（JavaScript 語法）
+                exclude: 要略過的文字
+                min_count: 元素數量少於此值時改試下一個選擇器
+                skip: 略過前幾個元素
+
+        Returns:
+            dict: 欄位名 -> 值（找不到時為 None），執行失敗時回傳空 dict
+        """
+        try:
+            return driver.execute_script(batch_extract_script, spec) or {}
+        except Exception as e:
+            print(f"⚠️ 批次擷取失敗: {e}")
+            return {}
+
+    @staticmethod
+    def is_driver_healthy(driver):
+        """檢查瀏覽器是否仍可正常回應指令"""
+        try:
+            driver.execute_script("return document.readyState")
+            return len(driver.window_handles) > 0
+        except Exception:
+            return False
+
+    @staticmethod
+    def wait_until_ready(driver, ready_selector=None, timeout=await_time):
+        """
+        等待一次頁面就緒訊號（指定 ready_selector 時等該元素出現，否則等 readyState 為 complete），並標記此頁已穩定
+
+        標記後同一頁的 safe_find_* 直接查找目前的 DOM，找不到時立即回傳空值，
+        不再每個備用選擇器各等待 await_time 秒。逾時也會標記（等待額度只用一次）。
+
+        Returns:
+            bool: 是否在 timeout 內收到就緒訊號
+        """
+        start = time.monotonic()
+        try:
+            WebDriverWait(driver, timeout).until(lambda d: d.execute_script(page_ready_script, ready_selector))
+            ready = True
+        except Exception:
+            ready = False
+        SeleniumHelper.mark_page_ready(driver)
+        SeleniumHelper._record_lookup('<ready>', ready_selector or 'readyState', 'ready', ready, time.monotonic() - start)
+        return ready
+
+    @staticmethod
+    def wait_for_content(driver, site=None, selectors=None, timeout=15, idle=1.5, settle=0):
+        """
+        導航後等待商品內容出現（取代固定秒數的 sleep），條件成立即回傳
+
+        以 MutationObserver 監看 DOM 變化，下列任一情況發生時結束：
+        - selectors 全部出現且有文字，並在之後 settle 秒內沒有新的 DOM 變化
+        - 頁面已載入完成（readyState complete）且 DOM 靜止 idle 秒，但內容仍未出現（例如封鎖頁）
+        - 達到 timeout 上限
+        結束時會標記頁面已穩定（之後的 safe_find_* 不再等待）。
+
+        Args:
+            site: content_ready_selectors 中的站點名稱（bookscom / eslite / kingstone）
+            selectors: 自訂條件（CSS 選擇器列表），指定時優先於 site
+            timeout: 最長等待秒數
+            idle: 載入完成後 DOM 靜止多久視為內容不會再出現（秒）
+            settle: 內容出現後還需要 DOM 靜止的秒數（逐步渲染的 SPA 頁面使用）
+
+        Returns:
+            dict: {'ok': 內容是否出現, 'reason': present / idle / timeout / error, 'seconds': 實際等待秒數}
+        """
+        selectors = list(selectors or content_ready_selectors.get(site, []))
+        start = time.monotonic()
+        try:
+            driver.set_script_timeout(timeout + 5)
+            outcome = driver.execute_async_script(
+                content_wait_script, selectors, int(timeout * 1000), int(idle * 1000), int(settle * 1000)
+            ) or {}
+            result = {'ok': bool(outcome.get('ok')), 'reason': outcome.get('reason', 'error'), 'seconds': round(time.monotonic() - start, 3)}
+        except Exception as e:
+            print(f"⚠️ 等待頁面內容失敗: {e}")
+            result = {'ok': False, 'reason': 'error', 'seconds': round(time.monotonic() - start, 3)}
+        SeleniumHelper.mark_page_ready(driver)
+
+        with _content_wait_stats_lock:
+            stats = _content_wait_stats.setdefault(site or 'custom', {'count': 0, 'seconds': 0.0, 'max': 0.0, 'present': 0, 'idle': 0, 'timeout': 0, 'error': 0})
+            stats['count'] += 1
+            stats['seconds'] += result['seconds']
+            stats['max'] = max(stats['max'], result['seconds'])
+            stats[result['reason']] = stats.get(result['reason'], 0) + 1
+        return result
+
+    @staticmethod
+    def load_page(driver, url, timeout=20):
+        """
+        以硬性上限導航（page_load_timeout），逾時時呼叫 window.stop() 並使用已載入的 DOM
+        導航結束後還原原本的 page_load_timeout，不影響此 driver 之後的 driver.get
+
+        Returns:
+            bool: 是否在 timeout 內完成導航（逾時為 False，但頁面仍可使用）
+        """
+        try:
+            previous_timeout = driver.timeouts.page_load
+        except Exception:
+            previous_timeout = None
+        driver.set_page_load_timeout(timeout)
+        SeleniumHelper.forget_page_ready(driver)
+        try:
+            driver.get(url)
+            return True
+        except TimeoutException:
+            SeleniumHelper.stop_loading(driver)
+            return False
+        finally:
+            if previous_timeout is not None:
+                try:
+                    driver.set_page_load_timeout(previous_timeout)
+                except Exception:
+                    pass
+
+    @staticmethod
+    def stop_loading(driver):
+        """呼叫 window.stop() 停止載入其餘資源（廣告、第三方腳本），已載入的 DOM 不受影響"""
+        try:
+            driver.execute_script("window.stop();")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def navigate_and_stop(driver, url, site=None, selectors=None, timeout=20, idle=1.5, settle=0):
+        """
+        導航到 url，目標區塊出現後立即呼叫 window.stop()，把 DOM 交給擷取程式
+
+        導航與等待內容共用同一個 timeout 上限；內容未出現（封鎖頁、逾時）時同樣停止載入。
+
+        Returns:
+            dict: wait_for_content 的結果，另含 'loaded'（導航是否在上限內完成）與總耗時 'seconds'
+        """
+        start = time.monotonic()
+        loaded = SeleniumHelper.load_page(driver, url, timeout)
+        remaining = max(1.0, timeout - (time.monotonic() - start))
+        result = SeleniumHelper.wait_for_content(driver, site, selectors, timeout=remaining, idle=idle, settle=settle)
+        SeleniumHelper.stop_loading(driver)
+        result['loaded'] = loaded
+        result['seconds'] = round(time.monotonic() - start, 3)
+        return result
+
+    @staticmethod
+    def get_content_wait_stats():
+        """
+        各站點 wait_for_content 的統計
+
+        Returns:
+            dict: {站點: {'count', 'avg', 'max', 'present', 'idle', 'timeout', 'error'}}
+        """
+        with _content_wait_stats_lock:
+            return {
+                site: {
+                    'count': stats['count'],
+                    'avg': round(stats['seconds'] / stats['count'], 2) if stats['count'] else 0,
+                    'max': round(stats['max'], 2),
+                    **{reason: stats.get(reason, 0) for reason in ('present', 'idle', 'timeout', 'error')},
+                }
+                for site, stats in _content_wait_stats.items()
+            }
+
+    @staticmethod
+    def mark_page_ready(driver):
+        """標記目前的頁面已穩定（例如已由其他方式確認內容載入完成）"""
+        try:
+            url = driver.current_url
+        except Exception:
+            return
+        with _ready_pages_lock:
+            _ready_pages[id(driver)] = url
+
+    @staticmethod
+    def forget_page_ready(driver):
+        """清除此 driver 的穩定標記（重新導航或交還 driver 時呼叫）"""
+        with _ready_pages_lock:
+            _ready_pages.pop(id(driver), None)
+
+    @staticmethod
+    def is_page_ready(driver):
+        """
+        目前的頁面是否已由 wait_until_ready / wait_for_content / mark_page_ready 標記為穩定
+
+        未標記的 driver 直接回傳 False（不與瀏覽器溝通）；已標記時只比對 current_url，
+        網址已改變（呼叫端自行 driver.get 換頁）即視為未穩定並清除標記。
+        """
+        with _ready_pages_lock:
+            url = _ready_pages.get(id(driver))
+        if url is None:
+            return False
+        try:
+            if driver.current_url == url:
+                return True
+        except Exception:
+            pass
+        SeleniumHelper.forget_page_ready(driver)
+        return False
+
+    @staticmethod
+    def _record_lookup(by, value, mode, found, seconds):
+        with _lookup_stats_lock:
+            if mode == 'ready':
+                _lookup_stats['ready_waits'] += 1
+                _lookup_stats['ready_seconds'] += seconds
+                _lookup_history.append({'by': by, 'value': value, 'mode': mode, 'found': found, 'seconds': round(seconds, 3)})
+                return
+            _lookup_stats['calls'] += 1
+            _lookup_stats['found' if found else 'missed'] += 1
+            if mode == 'settled':
+                _lookup_stats['settled'] += 1
+            else:
+                _lookup_stats['waited'] += 1
+                _lookup_stats['wait_seconds'] += seconds
+                _lookup_stats['max_wait'] = max(_lookup_stats['max_wait'], seconds)
+            _lookup_history.append({'by': by, 'value': value, 'mode': mode, 'found': found, 'seconds': round(seconds, 3)})
+
+    @staticmethod
+    def get_lookup_stats(history=False):
+        """
+        safe_find_* 的等待統計
+
+        Returns:
+            dict: calls / found / missed、settled（已穩定頁面的即時查找數）、
+                  waited（以 WebDriverWait 等待的查找數）、wait_seconds、max_wait、
+                  ready_waits / ready_seconds（wait_until_ready 的次數與總秒數）；
+                  history=True 時另附最近每次查找的明細（by, value, mode, found, seconds）
+        """
+        with _lookup_stats_lock:
+            stats = dict(_lookup_stats)
+            stats['wait_seconds'] = round(stats['wait_seconds'], 2)
+            stats['max_wait'] = round(stats['max_wait'], 2)
+            stats['ready_seconds'] = round(stats['ready_seconds'], 2)
+            if history:
+                stats['history'] = list(_lookup_history)
+        return stats
+
+    @staticmethod
+    def reset_lookup_stats():
+        with _lookup_stats_lock:
+            for key in _lookup_stats:
+                _lookup_stats[key] = 0.0 if key in ('wait_seconds', 'max_wait', 'ready_seconds') else 0
+            _lookup_history.clear()
+
+    @staticmethod
+    def _find(driver, by, value, await_time, single):
+        """已穩定的頁面直接查找（不等待），否則以 WebDriverWait 等待元素出現"""
+        start = time.monotonic()
+        if SeleniumHelper.is_page_ready(driver):
+            mode = 'settled'
+            try:
+                elements = driver.find_elements(by, value)
+            except Exception:
+                elements = []
+        else:
+            mode = 'wait'
+            try:
+                if single:
+                    elements = [WebDriverWait(driver, await_time).until(EC.presence_of_element_located((by, value)))]
+                else:
+                    elements = WebDriverWait(driver, await_time).until(EC.presence_of_all_elements_located((by, value)))
+            except Exception:
+                elements = []
+        SeleniumHelper._record_lookup(by, value, mode, bool(elements), time.monotonic() - start)
+        return elements
+
     @staticmethod
     def safe_find_element(driver, by, value, attribute=None, await_time=10):
         try:
-            element = WebDriverWait(driver, await_time).until(
-                EC.presence_of_element_located((by, value))
-            )
+            elements = SeleniumHelper._find(driver, by, value, await_time, single=True)
+            if not elements:
+                return ''
             if attribute:
-                return element.get_attribute(attribute)
-            return element.text
+                return elements[0].get_attribute(attribute)
+            return elements[0].text
         except Exception as e:
             # print(f"无法找到元素 {value}, 错误: {e}")
             return ''
@@ -169,10 +901,7 @@ class SeleniumHelper :
     @staticmethod
     def safe_find_elements(driver, by, value, await_time=10):
         try:
-            elements = WebDriverWait(driver, await_time).until(
-                EC.presence_of_all_elements_located((by, value))
-            )
-            return elements
+            return SeleniumHelper._find(driver, by, value, await_time, single=False)
         except Exception as e:
             # print(f"无法找到元素 {value}, 错误: {e}")
             return []
@@ -180,10 +909,226 @@ class SeleniumHelper :
     @staticmethod
     def safe_find_elements_text(driver, by, value, await_time=await_time):
         try:
-            elements = WebDriverWait(driver, await_time).until(
-                EC.presence_of_all_elements_located((by, value))
-            )
+            elements = SeleniumHelper._find(driver, by, value, await_time, single=False)
             return [element.text for element in elements]
         except Exception as e:
             # print(f"无法找到元素 {value}, 错误: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+class DriverPool:
+    """
+    已暖機的 WebDriver 池
+
+    預先啟動並完成初始化（例如注入 cookies）的 Chrome，借出給呼叫端使用；
+    歸還時檢查瀏覽器是否健康，每個瀏覽器處理 max_pages_per_driver 頁後自動回收，
+    並在背景啟動新的瀏覽器補位，讓下一次借用不必等待冷啟動。
+
+    用法：
+        pool = DriverPool(size=3, on_create=inject_cookies)
+        pool.start()
+        with pool.lease() as driver:
+            driver.get(url)
+        pool.close()
+    """
+
+    def __init__(self, size=1, create_driver=None, on_create=None, max_pages_per_driver=50, name='driver_pool'):
+        """
+        Args:
+            size: 池中瀏覽器數量上限
+            create_driver: 建立 WebDriver 的函數，預設為 SeleniumHelper.init_driver
+            on_create: 瀏覽器建立後執行一次的初始化函數，參數為 driver（例如登入、注入 cookies）
+            max_pages_per_driver: 每個瀏覽器處理多少頁後回收重建，None 表示不回收
+            name: 用於日誌輸出的名稱
+        """
+        self.size = max(1, size)
+        self.create_driver = create_driver or SeleniumHelper.init_driver
+        self.on_create = on_create
+        self.max_pages_per_driver = max_pages_per_driver
+        self.name = name
+
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._page_counts = {}   # id(driver) -> 已處理頁數
+        self._drivers = {}       # id(driver) -> driver（包含借出中的）
+        self._pending = 0        # 正在建立中的瀏覽器數量
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+    def start(self, wait=True):
+        """預先啟動所有瀏覽器（並行建立）"""
+        threads = []
+        with self._lock:
+            missing = self.size - len(self._drivers) - self._pending
+            self._pending += max(0, missing)
+        for _ in range(max(0, missing)):
+            thread = threading.Thread(target=self._spawn, name=f"{self.name}-spawn", daemon=True)
+            thread.start()
+            threads.append(thread)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _build(self):
+        """建立並初始化一個瀏覽器，失敗時回傳 None"""
+        driver = None
+        try:
+            driver = self.create_driver()
+            if self.on_create:
+                self.on_create(driver)
+            return driver
+        except Exception as e:
+            print(f"[{self.name}] 建立瀏覽器失敗: {e}")
+            if driver:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            return None
+
+    def _spawn(self):
+        """背景建立一個瀏覽器並放入閒置佇列"""
+        driver = self._build()
+        with self._lock:
+            self._pending -= 1
+            if driver is None:
+                return
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._drivers[id(driver)] = driver
+                self._page_counts[id(driver)] = 0
+        if closed:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+
+    def acquire(self, timeout=None):
+        """
+        借出一個已暖機的瀏覽器
+
+        池中沒有閒置瀏覽器且尚未達到上限時，直接在目前線程建立；
+        已達上限則等待其他呼叫端歸還或背景補位完成（timeout 秒後拋出 queue.Empty）。
+        等待時每隔 acquire_poll_seconds 秒重新檢查一次，背景補位失敗時改由目前線程建立，不會無限等待。
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError(f"[{self.name}] 瀏覽器池已關閉")
+                can_create = len(self._drivers) + self._pending < self.size
+                if can_create:
+                    self._pending += 1
+
+            if not can_create:
+                wait = acquire_poll_seconds
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    wait = min(wait, remaining)
+                try:
+                    return self._idle.get(timeout=wait)
+                except queue.Empty:
+                    continue
+
+            driver = self._build()
+            with self._lock:
+                self._pending -= 1
+                if driver is not None:
+                    self._drivers[id(driver)] = driver
+                    self._page_counts[id(driver)] = 0
+            if driver is not None:
+                return driver
+            raise RuntimeError(f"[{self.name}] 無法建立瀏覽器")
+
+    def release(self, driver, pages=1):
+        """
+        歸還瀏覽器
+
+        Returns:
+            bool: True 表示瀏覽器已被回收（不健康或達到頁數上限），下一次借用會拿到新的瀏覽器
+        """
+        with self._lock:
+            if id(driver) not in self._drivers:
+                return True
+            count = self._page_counts.get(id(driver), 0) + pages
+            self._page_counts[id(driver)] = count
+            closed = self._closed
+
+        if closed:
+            self.discard(driver, refill=False)
+            return True
+
+        if self.max_pages_per_driver and count >= self.max_pages_per_driver:
+            print(f"[{self.name}] 瀏覽器已處理 {count} 頁，回收並在背景重建")
+            self.discard(driver)
+            return True
+
+        if not SeleniumHelper.is_driver_healthy(driver):
+            print(f"[{self.name}] 瀏覽器狀態異常，回收並在背景重建")
+            self.discard(driver)
+            return True
+
+        self._idle.put(driver)
+        return False
+
+    def discard(self, driver, refill=True):
+        """關閉瀏覽器（例如被重定向到登入頁、被封鎖），並視需要在背景補上新的瀏覽器"""
+        with self._lock:
+            self._drivers.pop(id(driver), None)
+            self._page_counts.pop(id(driver), None)
+            refill = refill and not self._closed
+            if refill:
+                self._pending += 1
+        self._quit(driver)
+        if refill:
+            threading.Thread(target=self._spawn, name=f"{self.name}-spawn", daemon=True).start()
+
+    @contextmanager
+    def lease(self, timeout=None):
+        """以 with 語法借用瀏覽器，離開時自動歸還"""
+        driver = self.acquire(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            with self._lock:
+                still_owned = id(driver) in self._drivers
+            if still_owned:
+                self.release(driver)
+
+    @staticmethod
+    def _quit(driver):
+        SeleniumHelper.forget_page_ready(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """關閉池中所有瀏覽器"""
+        with self._lock:
+            self._closed = True
+            drivers = list(self._drivers.values())
+            self._drivers.clear()
+            self._page_counts.clear()
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        for driver in drivers:
+            self._quit(driver)
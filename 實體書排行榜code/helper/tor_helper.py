@@ -0,0 +1,387 @@
+import re
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 同一條 circuit 兩次 NEWNYM 的最短間隔（Tor 本身也會限制約 10 秒一次）
+newnym_min_interval = 10
+
+# 預設檢查的 Tor SOCKS 端口（默認 9050 與常用的替代端口，另加上 TorConfig 中設定的端口）
+default_tor_ports = [9050, 9052, 9054, 9056, 9058, 9060]
+
+_shared_registry = None
+_shared_registry_lock = threading.Lock()
+
+
+class ProxyHealthRegistry:
+    """
+    代理端口健康狀態登錄表
+
+    在背景並行檢查所有端口並快取可用狀態與延遲，
+    建立瀏覽器時直接讀取快取，不必每次都逐一以阻塞式連線檢查端口。
+    """
+
+    def __init__(self, ports=None, check_timeout=2, refresh_interval=60, host='127.0.0.1'):
+        """
+        Args:
+            ports: 要檢查的端口列表
+            check_timeout: 單一端口的連線逾時（秒）
+            refresh_interval: 背景重新檢查的間隔（秒）
+            host: 代理主機
+        """
+        self.host = host
+        self.check_timeout = check_timeout
+        self.refresh_interval = refresh_interval
+        self.ports = []
+        self._status = {}  # port -> {'healthy': bool, 'latency': float, 'checked_at': float}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.add_ports(ports or [])
+
+    @staticmethod
+    def shared():
+        """
+        取得程序共用的登錄表（預設端口加上 TorConfig 的端口），第一次呼叫時啟動背景檢查
+        """
+        global _shared_registry
+        with _shared_registry_lock:
+            if _shared_registry is None:
+                ports = list(default_tor_ports)
+                tor_config = TorCircuitPool.load_tor_config()
+                for entry in getattr(tor_config, 'TOR_INFO', []):
+                    port = TorCircuitPool.parse_port(entry.get('http') if isinstance(entry, dict) else entry)
+                    if port is not None:
+                        ports.append(port)
+                _shared_registry = ProxyHealthRegistry(ports)
+                _shared_registry.start()
+            return _shared_registry
+
+    def add_ports(self, ports):
+        with self._lock:
+            for port in ports:
+                if port not in self.ports:
+                    self.ports.append(port)
+
+    def _probe(self, port):
+        start = time.monotonic()
+        try:
+            with socket.create_connection((self.host, port), timeout=self.check_timeout):
+                pass
+            healthy, latency = True, time.monotonic() - start
+        except OSError:
+            healthy, latency = False, None
+
+        with self._lock:
+            self._status[port] = {'healthy': healthy, 'latency': latency, 'checked_at': time.monotonic()}
+        return healthy
+
+    def probe(self, ports=None):
+        """並行檢查端口（預設全部），回傳可用的端口"""
+        with self._lock:
+            ports = list(ports if ports is not None else self.ports)
+        if ports:
+            with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+                list(executor.map(self._probe, ports))
+        return [port for port in ports if self.is_up(port)]
+
+    def ensure(self, ports):
+        """確保指定端口都有檢查結果（只檢查尚未檢查過的端口）"""
+        self.add_ports(ports)
+        with self._lock:
+            unknown = [port for port in ports if port not in self._status]
+        if unknown:
+            self.probe(unknown)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe()
+            finally:
+                self._ready.set()
+            self._stop.wait(self.refresh_interval)
+
+    def start(self):
+        """啟動背景檢查線程"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='proxy_health_registry', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wait_ready(self, timeout=None):
+        """等待第一輪檢查完成（所有端口並行檢查，最多約 check_timeout 秒）"""
+        if timeout is None:
+            timeout = self.check_timeout + 1
+        return self._ready.wait(timeout)
+
+    def status(self, port):
+        with self._lock:
+            return dict(self._status.get(port, {}))
+
+    def is_up(self, port):
+        return bool(self.status(port).get('healthy'))
+
+    def available_ports(self):
+        """可用的端口（依延遲排序）"""
+        with self._lock:
+            items = [(port, status) for port, status in self._status.items() if status.get('healthy')]
+        return [port for port, status in sorted(items, key=lambda item: item[1]['latency'])]
+
+
+class TorCircuit:
+    """一個 Tor SOCKS 端點（對應一條獨立的 circuit）與其控制埠"""
+
+    def __init__(self, index, socks_port, control_port=None):
+        self.index = index
+        self.socks_port = socks_port
+        self.control_port = control_port
+        self.healthy = None  # None 表示尚未檢查
+        self.latency = None
+        self.workers = set()
+        self.requests = 0
+        self.renew_count = 0
+        self.last_renew = 0
+        self.renewing = False  # 已有工作者在等待／送出 NEWNYM
+
+    @property
+    def proxy_url(self):
+        return f"socks5://127.0.0.1:{self.socks_port}"
+
+    @property
+    def proxies(self):
+        """requests 使用的 proxies 設定（socks5h：DNS 也經由 Tor 解析）"""
+        proxy = f"socks5h://127.0.0.1:{self.socks_port}"
+        return {'http': proxy, 'https': proxy}
+
+    def __repr__(self):
+        return f"TorCircuit(#{self.index}, socks={self.socks_port}, control={self.control_port})"
+
+
+class TorCircuitPool:
+    """
+    Tor circuit 池
+
+    讀取 TorConfig 的 SOCKS 端點與控制埠，並行檢查每個端點是否可用，
+    為每個工作線程／瀏覽器分配負載最少的 circuit，
+    偵測到封鎖時透過控制埠送出 NEWNYM 更換出口 IP，讓請求分散到多個 IP 而不受單一 IP 的頻率限制。
+    """
+
+    def __init__(self, tor_info=None, control_ports=None, password=None, check_timeout=2, log=None, offset=0):
+        """
+        Args:
+            tor_info: SOCKS 端點列表（格式同 TorConfig.TOR_INFO），預設讀取 config.TorConfig
+            control_ports: 與 tor_info 對應的控制埠列表，預設讀取 TorConfig.TOR_CONTROL_PORTS
+            password: 控制埠密碼，預設讀取 TorConfig.TOR_PASSWORD
+            check_timeout: 健康檢查的連線逾時（秒）
+            log: LogHelper 實例（可選）
+            offset: 輪流選擇 circuit 的起始位置（多個進程各自建立 circuit 池時錯開使用的 circuit）
+        """
+        if tor_info is None or control_ports is None or password is None:
+            tor_config = TorCircuitPool.load_tor_config()
+            tor_info = tor_info if tor_info is not None else getattr(tor_config, 'TOR_INFO', [])
+            control_ports = control_ports if control_ports is not None else getattr(tor_config, 'TOR_CONTROL_PORTS', [])
+            password = password if password is not None else getattr(tor_config, 'TOR_PASSWORD', '')
+
+        self.password = password or ''
+        self.check_timeout = check_timeout
+        self.log = log
+        self._lock = threading.Lock()
+        self._assignments = {}  # worker key -> TorCircuit
+        self._next_index = offset
+
+        self.circuits = []
+        for i, entry in enumerate(tor_info or []):
+            socks_port = TorCircuitPool.parse_port(entry.get('http') if isinstance(entry, dict) else entry)
+            if socks_port is None:
+                continue
+            control_port = control_ports[i] if i < len(control_ports or []) else None
+            self.circuits.append(TorCircuit(i + 1, socks_port, control_port))
+
+    @staticmethod
+    def load_tor_config():
+        """讀取 config.TorConfig（未建立 config.py 時回傳 None）"""
+        try:
+            from config import TorConfig
+            return TorConfig
+        except ImportError:
+            return None
+
+    @staticmethod
+    def parse_port(proxy_url):
+        """從 'socks5h://127.0.0.1:9052' 取出埠號"""
+        if not proxy_url:
+            return None
+        match = re.search(r':(\d+)/?$', str(proxy_url).strip())
+        return int(match.group(1)) if match else None
+
+    def _log(self, level, message):
+        if self.log:
+            getattr(self.log, level)(message)
+
+    def health_check(self, refresh=False):
+        """
+        取得所有端點的健康狀態（讀取 ProxyHealthRegistry 的快取，尚未檢查過的端點才並行檢查）
+
+        Args:
+            refresh: 是否忽略快取重新檢查
+
+        Returns:
+            list: 可用的 circuit
+        """
+        if not self.circuits:
+            return []
+
+        registry = ProxyHealthRegistry.shared()
+        ports = [circuit.socks_port for circuit in self.circuits]
+        if refresh:
+            registry.probe(ports)
+        else:
+            registry.wait_ready()
+            registry.ensure(ports)
+
+        for circuit in self.circuits:
+            status = registry.status(circuit.socks_port)
+            circuit.healthy = bool(status.get('healthy'))
+            circuit.latency = status.get('latency')
+
+        healthy = self.healthy_circuits()
+        self._log('info', f"Tor circuit 健康檢查: {len(healthy)}/{len(self.circuits)} 個可用")
+        return healthy
+
+    def healthy_circuits(self):
+        return [circuit for circuit in self.circuits if circuit.healthy]
+
+    def pick(self):
+        """
+        選擇目前分配數最少的可用 circuit（分配數相同時輪流選擇，避免每次都從第一條開始）
+
+        Returns:
+            TorCircuit 或 None（沒有可用的 circuit）
+        """
+        with self._lock:
+            candidates = self.healthy_circuits()
+            if not candidates:
+                return None
+            offset = self._next_index % len(candidates)
+            self._next_index += 1
+            ordered = candidates[offset:] + candidates[:offset]
+            return min(ordered, key=lambda c: len(c.workers))
+
+    def assign(self, key, circuit=None):
+        """
+        為工作線程／瀏覽器分配 circuit
+
+        Args:
+            key: 工作者識別鍵（例如瀏覽器編號或 WebDriver 物件）
+            circuit: 指定的 circuit（例如建立瀏覽器前先以 pick() 選好的），未指定時自動選擇
+
+        Returns:
+            TorCircuit 或 None（沒有可用的 circuit）
+        """
+        if circuit is None:
+            circuit = self.pick()
+            if circuit is None:
+                return None
+
+        with self._lock:
+            previous = self._assignments.get(key)
+            if previous is not None:
+                previous.workers.discard(key)
+
+            circuit.workers.add(key)
+            self._assignments[key] = circuit
+            self._log('info', f"分配 Tor circuit #{circuit.index} (port {circuit.socks_port}) 給 {key}")
+            return circuit
+
+    def circuit_for(self, key):
+        with self._lock:
+            return self._assignments.get(key)
+
+    def release(self, key):
+        with self._lock:
+            circuit = self._assignments.pop(key, None)
+            if circuit is not None:
+                circuit.workers.discard(key)
+
+    def record_request(self, key):
+        """記錄經由此工作者 circuit 的請求數（統計用）"""
+        with self._lock:
+            circuit = self._assignments.get(key)
+            if circuit is not None:
+                circuit.requests += 1
+
+    def renew(self, key):
+        """
+        為工作者的 circuit 送出 NEWNYM（更換出口 IP）
+
+        同一條 circuit 已有其他工作者正在更換時不重複送出（共用 circuit 的工作者會一起拿到新的 IP）
+
+        Returns:
+            bool: 是否由此呼叫成功送出
+        """
+        circuit = self.circuit_for(key)
+        if circuit is None or circuit.control_port is None:
+            return False
+
+        with self._lock:
+            if circuit.renewing:
+                self._log('info', f"Tor circuit #{circuit.index} 已由其他工作者更換 IP 中，略過")
+                return False
+            circuit.renewing = True
+            wait = newnym_min_interval - (time.monotonic() - circuit.last_renew)
+
+        sent = False
+        try:
+            if wait > 0:
+                time.sleep(wait)
+            TorCircuitPool.send_newnym(circuit.control_port, self.password, self.check_timeout + 3)
+            sent = True
+        except (OSError, RuntimeError) as e:
+            self._log('warning', f"Tor circuit #{circuit.index} 更換 IP 失敗: {e}")
+            return False
+        finally:
+            with self._lock:
+                circuit.renewing = False
+                if sent:
+                    circuit.last_renew = time.monotonic()
+                    circuit.renew_count += 1
+                renew_count = circuit.renew_count
+
+        self._log('info', f"Tor circuit #{circuit.index} 已送出 NEWNYM（第 {renew_count} 次）")
+        return True
+
+    @staticmethod
+    def send_newnym(control_port, password='', timeout=5):
+        """透過 Tor 控制埠送出 AUTHENTICATE 與 SIGNAL NEWNYM"""
+        with socket.create_connection(('127.0.0.1', control_port), timeout=timeout) as conn:
+            conn_file = conn.makefile('rb')
+
+            def command(line):
+                conn.sendall((line + '\r\n').encode('utf-8'))
+                reply = conn_file.readline().decode('utf-8', errors='replace').strip()
+                if not reply.startswith('250'):
+                    raise RuntimeError(f"{line.split()[0]} 失敗: {reply}")
+
+            escaped = password.replace('\\', '\\\\').replace('"', '\\"')
+            command(f'AUTHENTICATE "{escaped}"')
+            command('SIGNAL NEWNYM')
+            conn.sendall(b'QUIT\r\n')
+
+    def summary(self):
+        """各 circuit 的狀態摘要（日誌用）"""
+        return [
+            {
+                'circuit': circuit.index,
+                'port': circuit.socks_port,
+                'healthy': circuit.healthy,
+                'workers': len(circuit.workers),
+                'requests': circuit.requests,
+                'renewals': circuit.renew_count,
+            }
+            for circuit in self.circuits
+        ]
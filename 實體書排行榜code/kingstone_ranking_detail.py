@@ -7,23 +7,161 @@ import re
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 import time
 import json
+import copy
 import pandas as pd
 import traceback
 import random
+import queue
+import multiprocessing
 from datetime import datetime
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from lxml import html, etree
 from helper.log_helper import LogHelper
-from helper.selenium_helper import SeleniumHelper
+from helper.selenium_helper import SeleniumHelper, DriverPool
 from helper.common_helper import CommonHelper
+from helper.csv_helper import CsvDataset
+from helper.frontier_helper import CrawlFrontier
+from helper.catalog_helper import BookCatalog
+from helper.tor_helper import TorCircuitPool
+from helper.rate_helper import RateController
 
 log = LogHelper('kingstone_detail_books_service')
 
 base_url = 'https://www.kingstone.com.tw'
 max_retries = 3
+pages_per_driver = 10  # 每個瀏覽器處理多少本書後回收重建，避免被封鎖
+flush_every_rows = 20  # 累積多少本書的變更後寫回 CSV
+flush_every_seconds = 60  # 距上次寫回超過多少秒後寫回 CSV
+# 自適應請求間隔（AIMD）：頁面正常時逐步縮短，連續錯誤時放慢並冷卻，狀態保存在 state/rate_state.json
+kingstone_rate_limits = {'initial_delay': 12, 'min_delay': 2, 'max_delay': 90, 'block_cooldown': 60}
+content_wait_timeout = 15  # 每頁導航加上等待基本資料（li.basicunit）出現的上限（秒）
+
+# 詳細頁面各欄位的選擇器（依序嘗試，格式見 SeleniumHelper.batch_extract），整頁只需一次 execute_script
+kingstone_category_options = {'mode': 'texts', 'exclude': ['?', '追蹤', '查看更多']}
+kingstone_isbn_pattern = r'(?:\d[- ]?){12}\d'
+kingstone_detail_selectors = {
+    'category': [
+        {'css': 'li.basicunit.linkpill a', **kingstone_category_options},
+        {'css': 'div.linkpill a', **kingstone_category_options},
+        {'css': '#detaildataid > div > div.content_pcoll > div > div > div.linkpill a', **kingstone_category_options},
+        {'css': 'li.basicunit.catbreadcrumb > a', **kingstone_category_options},
+    ],
+    'Publisher': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '出版社')]/following-sibling::a"},
+        {'css': "li.basicunit > a[href*='/bookpublish/publist']"},
+    ],
+    'author': [
+        {'css': "li.basicunit > a[href*='SearchLink']"},
+    ],
+    'translator': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '譯者')]", 'mode': 'parent_text'},
+        {'css': 'li.basicunit', 'pattern': '譯者：'},
+    ],
+    'publish_date': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '出版日')]", 'mode': 'parent_text'},
+    ],
+    'fixed_price': [
+        {'css': 'li.basicunit.price1 > div > div > s > b'},
+        {'css': 'li.basicunit.price1 s > b'},
+        {'css': '.basicfield span b.sty2'},
+        {'css': 'li.basicunit.price1 b'},
+        {'css': '.basicfield b.sty2'},
+    ],
+    'isbn': [
+        {'css': '#detaildataid > div > div.content_pcoll > div > div > div.tableregion_deda > div > ul > li:nth-child(2) > ul > li:nth-child(2)', 'pattern': kingstone_isbn_pattern},
+        {'css': 'div.tableregion_deda > div > ul > li:nth-child(2) > ul > li:nth-child(2)', 'pattern': kingstone_isbn_pattern},
+        {'css': 'ul.table_1col_deda > li:nth-of-type(2) > ul > li:nth-of-type(2)', 'pattern': kingstone_isbn_pattern},
+        {'xpath': "//*[contains(text(), 'ISBN') or contains(text(), 'isbn')]", 'mode': 'parent_text', 'pattern': kingstone_isbn_pattern},
+        {'css': 'li.basicunit', 'pattern': r'(?:ISBN|isbn)[\s\S]*\d{13}'},
+    ],
+    'original_title': [
+        {'css': 'div.pdnamemix_main div'},
+        {'xpath': "//*[contains(text(), '原文')]/following-sibling::*[1]"},
+    ],
+}
+
+
+def xpath_class(*names):
+    """XPath 條件：元素同時具有所有指定的 class（相當於 CSS 的 .a.b）"""
+    return " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in names)
+
+
+# 快照模式：與 kingstone_detail_selectors 相同的欄位與選項，改以 XPath 在單一 page_source 快照上擷取
+kingstone_snapshot_selectors = {
+    'category': [
+        {'xpath': f"//li[{xpath_class('basicunit', 'linkpill')}]//a", **kingstone_category_options},
+        {'xpath': f"//div[{xpath_class('linkpill')}]//a", **kingstone_category_options},
+        {'xpath': f"//li[{xpath_class('basicunit', 'catbreadcrumb')}]/a", **kingstone_category_options},
+    ],
+    'Publisher': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '出版社')]/following-sibling::a"},
+        {'xpath': f"//li[{xpath_class('basicunit')}]/a[contains(@href, '/bookpublish/publist')]"},
+    ],
+    'author': [
+        {'xpath': f"//li[{xpath_class('basicunit')}]/a[contains(@href, 'SearchLink')]"},
+    ],
+    'translator': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '譯者')]", 'mode': 'parent_text'},
+        {'xpath': f"//li[{xpath_class('basicunit')}]", 'pattern': '譯者：'},
+    ],
+    'publish_date': [
+        {'xpath': "//li[@class='basicunit']//span[contains(text(), '出版日')]", 'mode': 'parent_text'},
+    ],
+    'fixed_price': [
+        {'xpath': f"//li[{xpath_class('basicunit', 'price1')}]/div/div/s/b"},
+        {'xpath': f"//li[{xpath_class('basicunit', 'price1')}]//s/b"},
+        {'xpath': f"//*[{xpath_class('basicfield')}]//span//b[{xpath_class('sty2')}]"},
+        {'xpath': f"//li[{xpath_class('basicunit', 'price1')}]//b"},
+        {'xpath': f"//*[{xpath_class('basicfield')}]//b[{xpath_class('sty2')}]"},
+    ],
+    'isbn': [
+        {'xpath': f"//div[{xpath_class('tableregion_deda')}]/div/ul/li[2]/ul/li[2]", 'pattern': kingstone_isbn_pattern},
+        {'xpath': f"//ul[{xpath_class('table_1col_deda')}]/li[2]/ul/li[2]", 'pattern': kingstone_isbn_pattern},
+        {'xpath': "//*[contains(text(), 'ISBN') or contains(text(), 'isbn')]", 'mode': 'parent_text', 'pattern': kingstone_isbn_pattern},
+        {'xpath': f"//li[{xpath_class('basicunit')}]", 'pattern': r'(?:ISBN|isbn)[\s\S]*\d{13}'},
+    ],
+    'original_title': [
+        {'xpath': f"//div[{xpath_class('pdnamemix_main')}]//div"},
+        {'xpath': "//*[contains(text(), '原文')]/following-sibling::*[1]"},
+    ],
+}
+
+# 模組載入時編譯一次 XPath 與正規表示式
+for selectors in kingstone_snapshot_selectors.values():
+    for selector in selectors:
+        selector['compiled'] = etree.XPath(selector['xpath'])
+        if selector.get('pattern'):
+            selector['regex'] = re.compile(selector['pattern'])
+
+
+def extract_from_snapshot(page_source, spec=kingstone_snapshot_selectors):
+    """
+    以 lxml 解析一次頁面快照並擷取所有欄位（回傳格式與 SeleniumHelper.batch_extract 相同）
+    """
+    tree = html.fromstring(page_source)
+    result = {}
+    for field, selectors in spec.items():
+        result[field] = None
+        for selector in selectors:
+            mode = selector.get('mode', 'text')
+            exclude = selector.get('exclude', [])
+            regex = selector.get('regex')
+            found = []
+            for node in selector['compiled'](tree):
+                if mode == 'parent_text':
+                    node = node.getparent()
+                    if node is None:
+                        continue
+                value = re.sub(r'\s+', ' ', node.text_content()).strip()
+                if value and value not in exclude and (regex is None or regex.search(value)):
+                    found.append(value)
+                    if mode != 'texts':
+                        break
+            if found:
+                result[field] = found if mode == 'texts' else found[0]
+                break
+    return result
+
 
 class DetailBook:
     def __init__(self, production_id="", title="", url="", Publisher="", author="", translator="",
@@ -53,8 +191,12 @@ class DetailBook:
         }
 
 class KingstoneDetailBooksService:
-    def __init__(self):
-        self.chrome_options = SeleniumHelper.get_chrome_options()
+    def __init__(self, use_tor=False, tor_offset=0, lean=False, use_cache_proxy=False, snapshot=False):
+        self.lean = lean  # 精簡模式：封鎖圖片、字型、影音與追蹤器
+        self.snapshot = snapshot  # 快照模式：讀取一次 page_source，以 lxml 擷取所有欄位
+        # 本機快取代理：重啟的瀏覽器直接從磁碟快取取得 JS／CSS／字型（須在建立 Chrome 選項前啟用）
+        self.cache_proxy = SeleniumHelper.enable_cache_proxy() if use_cache_proxy else None
+        self.chrome_options = SeleniumHelper.get_chrome_options(lean=lean)
         # 添加更多的反爬蟲選項
         self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
         self.chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
@@ -72,6 +214,17 @@ class KingstoneDetailBooksService:
         self.log_helper = LogHelper('kingstone_detail_books_service')
         self.all_books = []
         self.start_time = datetime.now()
+        self.datasets = {}  # csv_path -> CsvDataset（常駐記憶體，批次寫回）
+        self.frontier = None  # 爬取進度（SQLite），用於 --resume 續跑
+        self.catalog = None  # 跨執行的書目資料庫（SQLite），已知且未過期的書籍不再重新爬取
+        
+        # Tor circuit 池：每個瀏覽器各自一條 circuit，連續錯誤時更換出口 IP
+        self.tor_pool = None
+        if use_tor:
+            self.tor_pool = TorCircuitPool(log=self.log_helper, offset=tor_offset)
+            if not self.tor_pool.health_check():
+                self.log_helper.warning("沒有可用的 Tor circuit，將使用直接連接")
+                self.tor_pool = None
         
     def save_debug_info(self, driver, file_type, name):
         """保存調試信息（截圖或HTML）並立即刪除"""
@@ -100,6 +253,36 @@ class KingstoneDetailBooksService:
         """不再需要清理臨時文件，因為已經立即刪除"""
         pass
 
+    def __create_driver(self):
+        """建立瀏覽器並設定視窗大小（使用 Tor 時分配一條 circuit）"""
+        options = self.chrome_options
+        circuit = self.tor_pool.pick() if self.tor_pool else None
+        if circuit:
+            options = SeleniumHelper.get_chrome_options_with_tor(circuit.socks_port, copy.deepcopy(self.chrome_options))
+        
+        driver = webdriver.Chrome(options=options)
+        if circuit:
+            self.tor_pool.assign(driver, circuit)
+        if self.lean:
+            SeleniumHelper.apply_lean_profile(driver)
+        try:
+            # 先最小化再設置大小，避免最大化狀態衝突
+            driver.minimize_window()
+            time.sleep(0.5)
+            driver.set_window_size(1200, 800)
+        except Exception as e:
+            self.log_helper.warning(f"設置窗口大小失敗: {e}，繼續執行")
+        return driver
+
+    def create_driver_pool(self, size=1):
+        """建立已暖機的瀏覽器池，每個瀏覽器處理 pages_per_driver 本書後自動回收"""
+        return DriverPool(
+            size=size,
+            create_driver=self.__create_driver,
+            max_pages_per_driver=pages_per_driver,
+            name='kingstone'
+        )
+
     def __get_book_urls(self, csv_path=None):
         """從CSV文件獲取書籍URL列表"""
         try:
@@ -167,6 +350,14 @@ class KingstoneDetailBooksService:
             self.log_helper.error(f"獲取書籍URL失敗: {str(e)}")
             return []
 
+    @staticmethod
+    def __clean_basic_text(text, prefix_pattern):
+        """清理基本資料欄位文字：移除欄位名稱前綴、"追蹤"、"?" 與換行"""
+        text = re.sub(prefix_pattern, '', text.strip())
+        text = re.sub(r'\s*追蹤\s*', '', text)
+        text = re.sub(r'\s*\?\s*', '', text)
+        return text.replace('\n', ' ').strip()
+
     def fetch_book_details(self, driver, book_info):
         """爬取單本書籍的詳細信息"""
         try:
@@ -178,12 +369,10 @@ class KingstoneDetailBooksService:
             
             self.log_helper.info(f"正在爬取書籍: {title} ({url})")
             
-            # 隨機延遲，模擬人類行為
-            random_delay = random.uniform(2, 5)
-            time.sleep(random_delay)
-            
-            # 訪問書籍頁面
-            driver.get(url)
+            # 訪問書籍頁面，基本資料出現後立即停止載入廣告與第三方腳本
+            waited = SeleniumHelper.navigate_and_stop(driver, url, 'kingstone', timeout=content_wait_timeout)
+            if not waited['ok']:
+                raise Exception(f"等待基本資料未完成（{waited['reason']}，{waited['seconds']:.1f} 秒）")
             
             # 執行JavaScript來模擬人類行為
             scroll_script = """
@@ -205,14 +394,6 @@ class KingstoneDetailBooksService:
             """
             driver.execute_script(scroll_script)
             
-            # 隨機延遲
-            time.sleep(random.uniform(1.5, 3.5))
-            
-            # 等待頁面加載，增加超時時間
-            WebDriverWait(driver, 15).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".basicarea"))
-            )
-            
             # 創建DetailBook對象，使用已知信息和從CSV讀取的出版日期
             book = DetailBook(
                 production_id=production_id,
@@ -221,421 +402,70 @@ class KingstoneDetailBooksService:
                 publish_date=publish_date_from_csv  # 使用從CSV讀取的出版日期
             )
             
-            # 提取分類路徑
-            try:
-                # 方法1: 使用 li.basicunit.linkpill（某些書籍的格式）
-                linkpill_li = driver.find_element(By.CSS_SELECTOR, "li.basicunit.linkpill")
-                category_links = linkpill_li.find_elements(By.TAG_NAME, "a")
-                if category_links:
-                    # 提取分類文本並用 > 連接，過濾掉無效內容
-                    category_texts = [link.text.strip() for link in category_links 
-                                     if link.text.strip() and link.text.strip() not in ['?', '追蹤', '查看更多']]
-                    book.category = " > ".join(category_texts)
-                    self.log_helper.info(f"提取到分類路徑: {book.category}")
-                else:
-                    book.category = category_from_csv
-            except:
-                try:
-                    # 方法2: 使用 div.linkpill
-                    linkpill_div = driver.find_element(By.CSS_SELECTOR, "div.linkpill")
-                    category_links = linkpill_div.find_elements(By.TAG_NAME, "a")
-                    if category_links:
-                        # 提取分類文本並用 > 連接，過濾掉無效內容
-                        category_texts = [link.text.strip() for link in category_links 
-                                         if link.text.strip() and link.text.strip() not in ['?', '追蹤', '查看更多']]
-                        book.category = " > ".join(category_texts)
-                        self.log_helper.info(f"提取到分類路徑(方法2): {book.category}")
-                    else:
-                        book.category = category_from_csv
-                except:
-                    try:
-                        # 方法3: 完整路徑選擇器
-                        linkpill_div = driver.find_element(By.CSS_SELECTOR, "#detaildataid > div > div.content_pcoll > div > div > div.linkpill")
-                        category_links = linkpill_div.find_elements(By.TAG_NAME, "a")
-                        if category_links:
-                            # 提取分類文本並用 > 連接，過濾掉無效內容
-                            category_texts = [link.text.strip() for link in category_links 
-                                             if link.text.strip() and link.text.strip() not in ['?', '追蹤', '查看更多']]
-                            book.category = " > ".join(category_texts)
-                            self.log_helper.info(f"提取到分類路徑(方法3): {book.category}")
-                        else:
-                            book.category = category_from_csv
-                    except:
-                        try:
-                            # 方法4: 使用原有的選擇器
-                            category_links = driver.find_elements(By.CSS_SELECTOR, "li.basicunit.catbreadcrumb > a")
-                            if category_links:
-                                # 提取分類文本並用 > 連接
-                                category_texts = [link.text.strip() for link in category_links 
-                                                 if link.text.strip() and link.text.strip() not in ['?', '追蹤', '查看更多']]
-                                book.category = " > ".join(category_texts)
-                                self.log_helper.info(f"提取到分類路徑(方法4): {book.category}")
-                            else:
-                                book.category = category_from_csv
-                        except Exception as cat_error:
-                            self.log_helper.warning(f"無法提取分類路徑: {url}, 錯誤: {str(cat_error)}")
-                            book.category = category_from_csv
-            
-            # 提取出版社
-            try:
-                # 方法1: 使用 XPath 根據文本內容查找
-                publisher_elems = driver.find_elements(By.XPATH, "//li[@class='basicunit']//span[contains(text(), '出版社')]/following-sibling::a")
-                if publisher_elems:
-                    publisher_text = publisher_elems[0].text.strip()
-                    # 清理文本，移除 "出版社："、"追蹤"、"?" 等
-                    publisher_text = re.sub(r'^出版社[：:]\s*', '', publisher_text)
-                    publisher_text = re.sub(r'\s*追蹤\s*', '', publisher_text)
-                    publisher_text = re.sub(r'\s*\?\s*', '', publisher_text)
-                    book.Publisher = publisher_text.strip()
-                    self.log_helper.info(f"提取到出版社: {book.Publisher}")
-                else:
-                    raise Exception("方法1失敗")
-            except:
-                try:
-                    # 方法2: 備用方法，動態查找包含出版社的元素
-                    publisher_elems = driver.find_elements(By.CSS_SELECTOR, "li.basicunit > a[href*='/bookpublish/publist']")
-                    if publisher_elems:
-                        publisher_text = publisher_elems[0].text.strip()
-                        # 清理文本
-                        publisher_text = re.sub(r'^出版社[：:]\s*', '', publisher_text)
-                        publisher_text = re.sub(r'\s*追蹤\s*', '', publisher_text)
-                        publisher_text = re.sub(r'\s*\?\s*', '', publisher_text)
-                        book.Publisher = publisher_text.strip()
-                        self.log_helper.info(f"提取到出版社(備用): {book.Publisher}")
-                    else:
-                        self.log_helper.warning(f"無法提取出版社: {url}")
-                except:
-                    self.log_helper.warning(f"無法提取出版社: {url}")
+            # 快照模式以 lxml 解析一次 page_source；否則以一次 execute_script 在瀏覽器中嘗試所有備用選擇器
+            # 兩者回傳相同格式，以下只整理數值
+            if self.snapshot:
+                values = extract_from_snapshot(driver.page_source)
+            else:
+                values = SeleniumHelper.batch_extract(driver, kingstone_detail_selectors)
             
-            # 提取作者 - 直接定位到作者連結
-            try:
-                # 精確定位作者連結元素
-                author_elem = driver.find_element(By.CSS_SELECTOR, "li.basicunit > span.title_basic:contains('作者') + a")
-                book.author = author_elem.text.strip()
-            except:
-                try:
-                    # 備用方法
-                    author_elems = driver.find_elements(By.CSS_SELECTOR, "li.basicunit > a[href*='SearchLink']")
-                    if author_elems:
-                        book.author = author_elems[0].text.strip()
-                    else:
-                        self.log_helper.warning(f"無法提取作者: {url}")
-                except:
-                    self.log_helper.warning(f"無法提取作者: {url}")
+            # 提取分類路徑（用 > 連接，找不到時保留CSV值）
+            if values.get('category'):
+                book.category = " > ".join(values['category'])
+                self.log_helper.info(f"提取到分類路徑: {book.category}")
+            else:
+                book.category = category_from_csv
             
-            # 提取譯者（只提取譯者，忽略繪者）
-            try:
-                # 方法1: 使用 XPath 根據文本內容查找「譯者」（不包含「繪者」）
-                translator_elems = driver.find_elements(By.XPATH, "//li[@class='basicunit']//span[contains(text(), '譯者')]")
-                if translator_elems:
-                    # 獲取整個 li 元素的文本
-                    li_elem = translator_elems[0].find_element(By.XPATH, "..")
-                    translator_text = li_elem.text.strip()
-                    # 清理文本，移除 "譯者："、"追蹤"、"?" 等
-                    translator_text = re.sub(r'^譯者[：:]\s*', '', translator_text)
-                    translator_text = re.sub(r'\s*追蹤\s*', '', translator_text)
-                    translator_text = re.sub(r'\s*\?\s*', '', translator_text)
-                    # 移除換行符
-                    translator_text = translator_text.replace('\n', ' ').strip()
-                    book.translator = translator_text if translator_text else ""
-                    if book.translator:
-                        self.log_helper.info(f"提取到譯者: {book.translator}")
-                else:
-                    book.translator = ""
-            except:
-                try:
-                    # 方法2: 備用方法，使用 JavaScript 提取（只查找「譯者」）
-                    translator_elems = driver.find_elements(By.CSS_SELECTOR, "li.basicunit")
-                    book.translator = ""
-                    
-                    for elem in translator_elems:
-                        elem_text = elem.text.strip()
-                        # 只檢查是否包含「譯者」（不包含「繪者」）
-                        if "譯者" in elem_text and "譯者：" in elem_text:
-                            # 使用JavaScript提取純文本
-                            translator_text = driver.execute_script("""
-                                var el = arguments[0];
-                                var span = el.querySelector('span.title_basic');
-                                if (span) {
-                                    // 取得整個li的文本
-                                    var fullText = el.textContent.trim();
-                                    // 取得span的文本
-                                    var spanText = span.textContent.trim();
-                                    // 移除span的文本，只保留譯者名字
-                                    var translatorName = fullText.replace(spanText, '').trim();
-                                    return translatorName;
-                                }
-                                return '';
-                            """, elem)
-                            
-                            if translator_text:
-                                # 清理文本
-                                translator_text = re.sub(r'\s*追蹤\s*', '', translator_text)
-                                translator_text = re.sub(r'\s*\?\s*', '', translator_text)
-                                translator_text = translator_text.replace('\n', ' ').strip()
-                                book.translator = translator_text
-                                self.log_helper.info(f"提取到譯者(備用): {book.translator}")
-                                break
-                    
-                    if not book.translator:
-                        book.translator = ""
-                        
-                except Exception as translator_error:
-                    self.log_helper.warning(f"無法提取譯者: {url}, 錯誤: {str(translator_error)}")
-                    book.translator = ""
+            # 提取出版社（移除 "出版社："、"追蹤"、"?" 等）
+            if values.get('Publisher'):
+                book.Publisher = self.__clean_basic_text(values['Publisher'], r'^出版社[：:]\s*')
+                self.log_helper.info(f"提取到出版社: {book.Publisher}")
+            else:
+                self.log_helper.warning(f"無法提取出版社: {url}")
             
-            # 提取出版日期
-            try:
-                # 方法1: 使用 XPath 根據文本內容查找「出版日」
-                publish_date_elems = driver.find_elements(By.XPATH, "//li[@class='basicunit']//span[contains(text(), '出版日')]")
-                if publish_date_elems:
-                    # 獲取整個 li 元素的文本
-                    li_elem = publish_date_elems[0].find_element(By.XPATH, "..")
-                    publish_date_text = li_elem.text.strip()
-                    # 移除 "出版日期："、"出版日："、"追蹤"、"?" 等
-                    publish_date_text = re.sub(r'^出版日期?[：:]\s*', '', publish_date_text)
-                    publish_date_text = re.sub(r'\s*追蹤\s*', '', publish_date_text)
-                    publish_date_text = re.sub(r'\s*\?\s*', '', publish_date_text)
-                    publish_date_text = re.sub(r'^出版社[：:]\s*', '', publish_date_text)  # 避免混淆
-                    # 移除換行符
-                    publish_date_text = publish_date_text.replace('\n', ' ').strip()
-                    if publish_date_text and not '出版社' in publish_date_text:
-                        book.publish_date = publish_date_text
-                        self.log_helper.info(f"提取到出版日期: {book.publish_date}")
-            except Exception as e:
-                # 如果爬取失敗，保留從CSV讀取的值
-                self.log_helper.debug(f"無法提取出版日期: {url}, 保留CSV值: {book.publish_date}, 錯誤: {str(e)}")
+            # 提取作者
+            if values.get('author'):
+                book.author = values['author']
+            else:
+                self.log_helper.warning(f"無法提取作者: {url}")
             
-            # 提取定價（fixed_price）
-            try:
-                # 優先使用新的精確選擇器
-                price_selectors = [
-                    # 方法1: 新的精確選擇器
-                    "li.basicunit.price1 > div > div > s > b",
-                    "li.basicunit.price1 s > b",
-                    # 方法2: 原有的備用選擇器
-                    ".basicfield span b.sty2",
-                    # 方法3: 更廣泛的備用選擇器
-                    "li.basicunit.price1 b",
-                    ".basicfield b.sty2"
-                ]
-                
-                price_found = False
-                for selector in price_selectors:
-                    try:
-                        price_elem = driver.find_element(By.CSS_SELECTOR, selector)
-                        if price_elem and price_elem.text.strip():
-                            book.fixed_price = price_elem.text.strip()
-                            price_found = True
-                            self.log_helper.info(f"成功提取定價: {book.fixed_price} (使用選擇器: {selector})")
-                            break
-                    except:
-                        continue
-                
-                if not price_found:
-                    self.log_helper.warning(f"無法提取定價: {url}")
-            except Exception as e:
-                self.log_helper.warning(f"提取定價時發生錯誤: {url}, 錯誤: {str(e)}")
+            # 提取譯者（只提取譯者，忽略繪者）
+            book.translator = self.__clean_basic_text(values.get('translator') or "", r'^.*?譯者[：:]\s*')
+            if book.translator:
+                self.log_helper.info(f"提取到譯者: {book.translator}")
+            
+            # 提取出版日期（爬取失敗時保留從CSV讀取的值）
+            publish_date_text = self.__clean_basic_text(values.get('publish_date') or "", r'^出版日期?[：:]\s*')
+            publish_date_text = re.sub(r'^出版社[：:]\s*', '', publish_date_text)  # 避免混淆
+            if publish_date_text and '出版社' not in publish_date_text:
+                book.publish_date = publish_date_text
+                self.log_helper.info(f"提取到出版日期: {book.publish_date}")
+            else:
+                self.log_helper.debug(f"無法提取出版日期: {url}, 保留CSV值: {book.publish_date}")
             
-            # 提取ISBN
-            try:
-                # 多種方法嘗試提取ISBN
-                isbn_found = False
-                
-                # 等待一下確保內容加載
-                time.sleep(1)
-                
-                # 方法1: 完整路徑選擇器
-                try:
-                    isbn_elem = driver.find_element(By.CSS_SELECTOR, "#detaildataid > div > div.content_pcoll > div > div > div.tableregion_deda > div > ul > li:nth-child(2) > ul > li:nth-child(2)")
-                    if isbn_elem:
-                        isbn_text = isbn_elem.text.strip()
-                        self.log_helper.debug(f"ISBN元素原始文本: '{isbn_text}'")
-                        if isbn_text:
-                            # 清理可能的前綴
-                            isbn_text = re.sub(r'^ISBN[：:]*\s*', '', isbn_text, flags=re.IGNORECASE)
-                            # 移除連字符和空格
-                            isbn_text = isbn_text.replace('-', '').replace(' ', '')
-                            # 只保留數字
-                            isbn_match = re.search(r'(\d{13})', isbn_text)
-                            if isbn_match:
-                                book.isbn = isbn_match.group(1)
-                                isbn_found = True
-                                self.log_helper.info(f"成功提取ISBN (方法1): {book.isbn}")
-                            else:
-                                self.log_helper.warning(f"找到ISBN元素但無法提取13位數字，文本: '{isbn_text}'")
-                except Exception as e:
-                    self.log_helper.debug(f"方法1失敗: {e}")
-                
-                # 方法2: 簡化路徑
-                if not isbn_found:
-                    try:
-                        isbn_elem = driver.find_element(By.CSS_SELECTOR, "div.tableregion_deda > div > ul > li:nth-child(2) > ul > li:nth-child(2)")
-                        if isbn_elem:
-                            isbn_text = isbn_elem.text.strip()
-                            self.log_helper.debug(f"方法2 ISBN元素原始文本: '{isbn_text}'")
-                            if isbn_text:
-                                isbn_text = re.sub(r'^ISBN[：:]*\s*', '', isbn_text, flags=re.IGNORECASE)
-                                isbn_text = isbn_text.replace('-', '').replace(' ', '')
-                                isbn_match = re.search(r'(\d{13})', isbn_text)
-                                if isbn_match:
-                                    book.isbn = isbn_match.group(1)
-                                    isbn_found = True
-                                    self.log_helper.info(f"成功提取ISBN (方法2): {book.isbn}")
-                    except Exception as e:
-                        self.log_helper.debug(f"方法2失敗: {e}")
-                
-                # 方法3: 從table_1col_deda中提取
-                if not isbn_found:
-                    try:
-                        isbn_elem = driver.find_element(By.CSS_SELECTOR, "ul.table_1col_deda > li:nth-of-type(2) > ul > li:nth-of-type(2)")
-                        if isbn_elem:
-                            isbn_text = isbn_elem.text.strip()
-                            self.log_helper.debug(f"方法3 ISBN元素原始文本: '{isbn_text}'")
-                            if isbn_text:
-                                isbn_text = re.sub(r'^ISBN[：:]*\s*', '', isbn_text, flags=re.IGNORECASE)
-                                isbn_text = isbn_text.replace('-', '').replace(' ', '')
-                                isbn_match = re.search(r'(\d{13})', isbn_text)
-                                if isbn_match:
-                                    book.isbn = isbn_match.group(1)
-                                    isbn_found = True
-                                    self.log_helper.info(f"成功提取ISBN (方法3): {book.isbn}")
-                    except Exception as e:
-                        self.log_helper.debug(f"方法3失敗: {e}")
-                
-                # 方法2: 尋找包含「ISBN」文字的元素
-                if not isbn_found:
-                    try:
-                        # 使用BeautifulSoup解析當前頁面
-                        html_content = driver.page_source
-                        soup = BeautifulSoup(html_content, 'html.parser')
-                        
-                        # 尋找所有包含「ISBN」的元素
-                        all_elements = soup.find_all(string=re.compile(r'ISBN', re.IGNORECASE))
-                        for elem in all_elements:
-                            parent = elem.parent
-                            if parent:
-                                # 獲取父元素的文本
-                                parent_text = parent.get_text()
-                                # 使用正則表達式提取ISBN（13位數字）
-                                isbn_match = re.search(r'ISBN[：:]*\s*(\d{13})', parent_text)
-                                if not isbn_match:
-                                    # 嘗試提取帶連字符的ISBN
-                                    isbn_match = re.search(r'ISBN[：:]*\s*([\d-]{17})', parent_text)
-                                
-                                if isbn_match:
-                                    book.isbn = isbn_match.group(1).replace('-', '')
-                                    isbn_found = True
-                                    self.log_helper.info(f"成功提取ISBN (方法2): {book.isbn}")
-                                    break
-                    except Exception as e:
-                        self.log_helper.debug(f"方法2失敗: {e}")
-                
-                # 方法3: 從basicunit列表中尋找
-                if not isbn_found:
-                    try:
-                        basic_units = driver.find_elements(By.CSS_SELECTOR, "li.basicunit")
-                        for unit in basic_units:
-                            unit_text = unit.text
-                            if 'ISBN' in unit_text or 'isbn' in unit_text:
-                                # 提取數字
-                                isbn_match = re.search(r'(\d{13})', unit_text)
-                                if isbn_match:
-                                    book.isbn = isbn_match.group(1)
-                                    isbn_found = True
-                                    self.log_helper.info(f"成功提取ISBN (方法3): {book.isbn}")
-                                    break
-                    except Exception as e:
-                        self.log_helper.debug(f"方法3失敗: {e}")
-                
-                if not isbn_found:
-                    book.isbn = ""
-                    self.log_helper.warning(f"未找到ISBN: {url}")
-                    
-            except Exception as e:
-                self.log_helper.warning(f"提取ISBN時發生錯誤: {url}, 錯誤: {str(e)}")
+            # 提取定價（fixed_price）
+            if values.get('fixed_price'):
+                book.fixed_price = values['fixed_price']
+                self.log_helper.info(f"成功提取定價: {book.fixed_price}")
+            else:
+                self.log_helper.warning(f"無法提取定價: {url}")
+            
+            # 提取ISBN（移除前綴、連字符與空格後取13位數字）
+            isbn_text = re.sub(r'^ISBN[：:]*\s*', '', values.get('isbn') or "", flags=re.IGNORECASE)
+            isbn_match = re.search(r'(\d{13})', isbn_text.replace('-', '').replace(' ', ''))
+            if isbn_match:
+                book.isbn = isbn_match.group(1)
+                self.log_helper.info(f"成功提取ISBN: {book.isbn}")
+            else:
                 book.isbn = ""
+                self.log_helper.warning(f"未找到ISBN: {url}")
             
             # 提取原文書名（整合自 kingstone_original_title_補正.py）
-            try:
-                # 獲取HTML內容
-                html_content = driver.page_source
-                soup = BeautifulSoup(html_content, 'html.parser')
-                
-                original_title = ""
-                
-                # 方法1: 使用完整 CSS 選擇器直接定位
-                try:
-                    pdnamemix_main = soup.find('div', class_='pdnamemix_main')
-                    if pdnamemix_main:
-                        # 在 pdnamemix_main 下尋找第一個 div
-                        target_div = pdnamemix_main.find('div')
-                        if target_div:
-                            original_title = target_div.get_text(strip=True)
-                            if original_title:
-                                self.log_helper.info(f"成功提取原文書名 (方法1): {original_title}")
-                except Exception as e:
-                    self.log_helper.debug(f"方法1失敗: {e}")
-                
-                # 方法2: 從 pdnamemix_main 下的所有 div 中尋找包含外文的內容
-                if not original_title:
-                    try:
-                        pdnamemix_main = soup.find('div', class_='pdnamemix_main')
-                        if pdnamemix_main:
-                            all_divs = pdnamemix_main.find_all('div')
-                            for div in all_divs:
-                                text = div.get_text(strip=True)
-                                # 檢查是否包含外文字符
-                                if text and (
-                                    any('\u3040' <= c <= '\u309F' for c in text) or  # 日文平假名
-                                    any('\u30A0' <= c <= '\u30FF' for c in text) or  # 日文片假名
-                                    any('\u4E00' <= c <= '\u9FFF' for c in text) or  # 漢字（包括日本漢字）
-                                    any(ord(c) < 128 and c.isalpha() for c in text)  # 英文字母
-                                ):
-                                    original_title = text
-                                    self.log_helper.info(f"成功提取原文書名 (方法2): {original_title}")
-                                    break
-                    except Exception as e:
-                        self.log_helper.debug(f"方法2失敗: {e}")
-                
-                # 方法3: 使用 Selenium 直接定位元素
-                if not original_title:
-                    try:
-                        element = driver.find_element(By.CSS_SELECTOR, 'div.pdnamemix_main > div')
-                        if element:
-                            original_title = element.text.strip()
-                            if original_title:
-                                self.log_helper.info(f"成功提取原文書名 (方法3): {original_title}")
-                    except Exception as e:
-                        self.log_helper.debug(f"方法3失敗: {e}")
-                
-                # 方法4: 嘗試從其他可能的位置提取原文書名
-                if not original_title:
-                    try:
-                        # 尋找包含「原文」關鍵字的元素
-                        all_text_elements = soup.find_all(string=re.compile(r'原文'))
-                        for elem in all_text_elements:
-                            parent = elem.parent
-                            if parent:
-                                # 獲取後續的文本
-                                next_sibling = parent.find_next_sibling()
-                                if next_sibling:
-                                    text = next_sibling.get_text(strip=True)
-                                    if text:
-                                        original_title = text
-                                        self.log_helper.info(f"成功提取原文書名 (方法4): {original_title}")
-                                        break
-                    except Exception as e:
-                        self.log_helper.debug(f"方法4失敗: {e}")
-                
-                book.original_title = original_title if original_title else ""
-                
-                if not original_title:
-                    self.log_helper.warning(f"未找到原文書名 (production_id: {production_id})")
-                
-            except Exception as e:
-                self.log_helper.warning(f"提取原文書名時發生錯誤: {url}, 錯誤: {str(e)}")
-                book.original_title = ""
+            book.original_title = values.get('original_title') or ""
+            if book.original_title:
+                self.log_helper.info(f"成功提取原文書名: {book.original_title}")
+            else:
+                self.log_helper.warning(f"未找到原文書名 (production_id: {production_id})")
             
             self.log_helper.info(f"成功爬取書籍詳細信息: {title}")
             return book
@@ -651,21 +481,50 @@ class KingstoneDetailBooksService:
         # 格式: spider_data/2025/10/kingstone/detail_books/20251031_detail_books.csv
         return CommonHelper.get_save_file_path("kingstone", "detail_books")
     
-    def update_row_in_csv(self, csv_path, row_index, book_dict):
-        """更新 CSV 中指定行的資料"""
+    def open_dataset(self, csv_path, install_signal_handlers=True):
+        """
+        開啟（或取得已開啟的）常駐記憶體 CSV 資料集，並註冊結束信號時的寫回
+        
+        分片模式在啟動工作進程前開啟時應傳入 install_signal_handlers=False，避免子進程繼承
+        """
+        dataset = self.datasets.get(csv_path)
+        if dataset is None:
+            dataset = CsvDataset(
+                csv_path,
+                flush_every_rows=flush_every_rows,
+                flush_every_seconds=flush_every_seconds,
+                dtype={'production_id': str},
+                log=self.log_helper
+            )
+            self.datasets[csv_path] = dataset
+        if install_signal_handlers:
+            dataset.install_signal_handlers()
+        return dataset
+
+    def close_datasets(self):
+        """寫回所有資料集尚未儲存的變更"""
+        for csv_path, dataset in list(self.datasets.items()):
+            try:
+                dataset.close()
+            except Exception as e:
+                self.log_helper.error(f"寫回CSV失敗 ({csv_path}): {str(e)}")
+        self.datasets = {}
+    
+    def update_row_in_csv(self, csv_path, row_index, book_dict, url=None):
+        """
+        更新 CSV 中指定行的資料（先更新記憶體，累積一定筆數或時間後才寫回檔案）
+        
+        提供 url 時，該行實際寫回檔案後才在爬取進度中標記為完成，中斷時尚未寫回的書籍續跑時會重新爬取
+        """
         try:
-            # 讀取整個 CSV
-            df = pd.read_csv(csv_path, encoding='utf-8-sig', dtype={'production_id': str})
-            
-            # 更新指定行的欄位
-            for key, value in book_dict.items():
-                if key in df.columns:
-                    df.at[row_index, key] = value
-            
-            # 寫回 CSV
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            self.log_helper.info(f"已更新CSV第 {row_index} 行")
-            return True
+            if self.catalog is not None:
+                self.catalog.update('kingstone', book_dict.get('production_id'), book_dict)
+            frontier = self.frontier
+            on_flushed = (lambda: frontier.mark_done(url)) if frontier is not None and url else None
+            if self.open_dataset(csv_path).update_row(row_index, book_dict, on_flushed):
+                self.log_helper.info(f"已更新CSV第 {row_index} 行")
+                return True
+            return False
         except Exception as e:
             self.log_helper.error(f"更新CSV失敗: {str(e)}")
             return False
@@ -709,148 +568,244 @@ class KingstoneDetailBooksService:
             self.log_helper.error(f"保存結果失敗: {str(e)}")
             return None
 
-    def Excute(self, csv_path=None, test_mode=False, max_books=None):
-        """執行爬蟲的主要函數"""
-        driver = None
-        try:
-            self.log_helper.info("開始執行金石堂詳細書目爬蟲")
+    def __prefill_from_catalog(self, book_urls, csv_path):
+        """
+        以書目資料庫中未過期的欄位填入CSV空欄位
+        
+        Returns:
+            list: 仍需爬取的書籍（未知或必要欄位已過期）
+        """
+        dataset = self.open_dataset(csv_path, install_signal_handlers=False)
+        remaining_books = []
+        known_count = 0
+        
+        for book_info in book_urls:
+            fields = self.catalog.lookup('kingstone', book_info.get('production_id'))
+            if not self.catalog.is_known(fields):
+                remaining_books.append(book_info)
+                continue
+            
+            row_index = book_info.get('row_index')
+            updates = {
+                field: value for field, value in fields.items()
+                if field in dataset.df.columns and BookCatalog.is_empty(dataset.df.at[row_index, field])
+            }
+            if updates:
+                dataset.update_row(row_index, updates)
+            known_count += 1
+        
+        self.log_helper.info(f"書目資料庫：{known_count} 本已知書籍已預先填入，需爬取 {len(remaining_books)} 本")
+        return remaining_books
+
+    def close_catalog(self):
+        """關閉書目資料庫"""
+        if self.catalog is not None:
+            self.catalog.close()
+            self.catalog = None
+
+    def close_cache_proxy(self):
+        """記錄快取代理的命中率"""
+        if self.cache_proxy is not None:
+            self.log_helper.info(f"快取代理統計: {self.cache_proxy.summary()}")
+            SeleniumHelper.disable_cache_proxy()
+            self.cache_proxy = None
+
+    def __prepare_run(self, csv_path, test_mode=False, max_books=None, resume=False, use_catalog=True):
+        """
+        讀取書籍URL、準備爬取進度並建立錯誤記錄CSV（續跑時跳過已完成的URL並沿用錯誤記錄）
+        
+        Returns:
+            tuple: (book_urls, output_csv_path, error_csv_path)，失敗時回傳 None
+        """
+        # 檢查CSV文件是否提供
+        if not csv_path:
+            self.log_helper.error("未提供CSV文件路徑，爬蟲終止")
+            return None
+        
+        if not os.path.exists(csv_path):
+            self.log_helper.error(f"CSV文件不存在: {csv_path}，爬蟲終止")
+            return None
             
-            # 檢查CSV文件是否提供
-            if not csv_path:
-                self.log_helper.error("未提供CSV文件路徑，爬蟲終止")
-                return False
+        # 獲取書籍URL列表
+        book_urls = self.__get_book_urls(csv_path)
+        if not book_urls:
+            self.log_helper.error("未能從CSV文件獲取書籍URL，爬蟲終止")
+            return None
             
-            if not os.path.exists(csv_path):
-                self.log_helper.error(f"CSV文件不存在: {csv_path}，爬蟲終止")
-                return False
-                
-            # 獲取書籍URL列表
-            book_urls = self.__get_book_urls(csv_path)
-            if not book_urls:
-                self.log_helper.error("未能從CSV文件獲取書籍URL，爬蟲終止")
-                return False
-                
-            self.log_helper.info(f"從CSV文件載入了 {len(book_urls)} 本書籍URL")
-            
-            # 如果是測試模式，只處理前10本
-            if test_mode:
-                book_urls = book_urls[:10]
-                self.log_helper.info(f"測試模式: 只處理前 {len(book_urls)} 本書籍")
-            
-            # 如果指定了最大書籍數，限制處理數量
-            if max_books and isinstance(max_books, int) and max_books > 0:
-                book_urls = book_urls[:max_books]
-                self.log_helper.info(f"限制處理數量: {len(book_urls)} 本書籍")
-            
-            # 直接使用輸入的 CSV 作為輸出（動態更新原始檔案）
-            output_csv_path = csv_path
-            self.log_helper.info(f"將動態更新原始CSV檔案: {output_csv_path}")
-            
-            # 準備錯誤記錄CSV檔案（放在同一目錄）
-            import csv as csv_module
-            today_str = datetime.now().strftime('%Y%m%d')
-            csv_dir = os.path.dirname(csv_path)
-            csv_name = os.path.basename(csv_path).replace('.csv', '')
-            error_csv_path = os.path.join(csv_dir, f"{csv_name}_error.csv")
+        self.log_helper.info(f"從CSV文件載入了 {len(book_urls)} 本書籍URL")
+        
+        # 如果是測試模式，只處理前10本
+        if test_mode:
+            book_urls = book_urls[:10]
+            self.log_helper.info(f"測試模式: 只處理前 {len(book_urls)} 本書籍")
+        
+        # 如果指定了最大書籍數，限制處理數量
+        if max_books and isinstance(max_books, int) and max_books > 0:
+            book_urls = book_urls[:max_books]
+            self.log_helper.info(f"限制處理數量: {len(book_urls)} 本書籍")
+        
+        # 爬取進度：續跑時跳過上次已完成（或失敗次數已達上限）的 URL
+        self.frontier = CrawlFrontier('kingstone', csv_path)
+        skipped_urls = self.frontier.prepare([book_info['url'] for book_info in book_urls], resume)
+        if skipped_urls:
+            book_urls = [book_info for book_info in book_urls if book_info['url'] not in skipped_urls]
+            self.log_helper.info(f"續跑模式：跳過 {len(skipped_urls)} 個已完成的URL，剩餘 {len(book_urls)} 本書籍")
+        
+        # 書目資料庫：預先填入已知書籍，只爬取未知或過期的書籍
+        if use_catalog:
+            self.catalog = BookCatalog()
+            book_urls = self.__prefill_from_catalog(book_urls, csv_path)
+        
+        # 直接使用輸入的 CSV 作為輸出（動態更新原始檔案）
+        output_csv_path = csv_path
+        self.log_helper.info(f"將動態更新原始CSV檔案: {output_csv_path}")
+        
+        # 準備錯誤記錄CSV檔案（放在同一目錄）
+        import csv as csv_module
+        csv_dir = os.path.dirname(csv_path)
+        csv_name = os.path.basename(csv_path).replace('.csv', '')
+        error_csv_path = os.path.join(csv_dir, f"{csv_name}_error.csv")
+        if resume and os.path.exists(error_csv_path):
+            self.log_helper.info(f"續跑模式：沿用錯誤記錄CSV檔案: {error_csv_path}")
+        else:
             with open(error_csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
                 fieldnames = ['production_id', 'title', 'url', 'error_message']
                 writer = csv_module.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
             self.log_helper.info(f"已創建錯誤記錄CSV檔案: {error_csv_path}")
-            
-            # 初始化瀏覽器
-            driver = webdriver.Chrome(options=self.chrome_options)
-            try:
-                # 先最小化再設置大小，避免最大化狀態衝突
-                driver.minimize_window()
-                time.sleep(0.5)
-                driver.set_window_size(1200, 800)
-            except Exception as e:
-                self.log_helper.warning(f"設置窗口大小失敗: {e}，繼續執行")
+        
+        return book_urls, output_csv_path, error_csv_path
+
+    def close_frontier(self):
+        """關閉爬取進度記錄"""
+        if self.frontier is not None:
+            self.log_helper.info(f"爬取進度: {self.frontier.counts()}")
+            self.frontier.close()
+            self.frontier = None
+
+    def crawl_books(self, book_urls, on_book, on_error, label="", frontier=None):
+        """
+        依序爬取書籍，並透過回呼函數輸出結果
+        
+        Args:
+            book_urls: 書籍資訊列表
+            on_book: 成功時呼叫 on_book(book_info, book)，由 on_book 在結果寫入後標記 frontier 完成
+            on_error: 失敗時呼叫 on_error(book_info, error_message)
+            label: 日誌前綴（分片模式下用於區分工作進程）
+            frontier: 爬取進度記錄（CrawlFrontier），提供時記錄每本書的處理狀態
+        """
+        pool = None
+        rate_controller = RateController.shared()
+        host_rate = rate_controller.get(base_url, **kingstone_rate_limits)
+        try:
+            # 初始化瀏覽器池（預先啟動，回收後在背景補上新的瀏覽器）
+            pool = self.create_driver_pool()
+            pool.start()
             
             # 依序處理每本書籍
             consecutive_errors = 0
             max_consecutive_errors = 3
             
             for i, book_info in enumerate(book_urls):
+                driver = None
                 try:
-                    self.log_helper.info(f"處理書籍 {i+1}/{len(book_urls)}: {book_info['title']}")
-                    
-                    # 檢查是否需要重啟瀏覽器來避免被封鎖
-                    if i > 0 and i % 10 == 0:
-                        self.log_helper.info("重啟瀏覽器以避免被封鎖...")
-                        driver.quit()
-                        time.sleep(random.uniform(10, 15))  # 較長的休息時間
-                        driver = webdriver.Chrome(options=self.chrome_options)
-                        try:
-                            # 先最小化再設置大小，避免最大化狀態衝突
-                            driver.minimize_window()
-                            time.sleep(0.5)
-                            driver.set_window_size(1200, 800)
-                        except Exception as e:
-                            self.log_helper.warning(f"設置窗口大小失敗: {e}，繼續執行")
+                    self.log_helper.info(f"{label}處理書籍 {i+1}/{len(book_urls)}: {book_info['title']}")
                     
-                    # 較長的隨機延遲，避免請求過於頻繁
+                    # 依目前的自適應間隔等待，避免請求過於頻繁
                     if i > 0:
-                        delay = random.uniform(5, 12)
-                        self.log_helper.info(f"等待 {delay:.2f} 秒後繼續...")
-                        time.sleep(delay)
+                        delay = host_rate.wait()
+                        self.log_helper.info(f"{label}已等待 {delay:.2f} 秒")
                     
+                    driver = pool.acquire()
+                    if frontier:
+                        frontier.claim(book_info['url'])
                     book = self.fetch_book_details(driver, book_info)
                     if book:
                         self.all_books.append(book)
-                        # 動態更新 CSV 的對應行
-                        row_index = book_info.get('row_index')
-                        self.update_row_in_csv(output_csv_path, row_index, book.to_dict())
+                        on_book(book_info, book)
                         consecutive_errors = 0  # 重置連續錯誤計數
+                        rate_controller.record_success(host_rate)
                     else:
                         consecutive_errors += 1
                         # 記錄失敗到錯誤CSV
-                        self.write_error_to_csv(
-                            book_info.get('production_id', 'N/A'),
-                            book_info.get('title', 'N/A'),
-                            book_info.get('url', 'N/A'),
-                            "Failed to fetch book details (returned None)",
-                            error_csv_path
-                        )
+                        on_error(book_info, "Failed to fetch book details (returned None)")
+                        if frontier:
+                            frontier.mark_failed(book_info['url'], "returned None")
                 except Exception as book_error:
-                    self.log_helper.error(f"處理書籍 {book_info['title']} 時發生錯誤: {str(book_error)}")
+                    self.log_helper.error(f"{label}處理書籍 {book_info['title']} 時發生錯誤: {str(book_error)}")
+                    if frontier:
+                        frontier.mark_failed(book_info['url'], book_error)
                     consecutive_errors += 1
                     # 記錄錯誤到CSV
-                    self.write_error_to_csv(
-                        book_info.get('production_id', 'N/A'),
-                        book_info.get('title', 'N/A'),
-                        book_info.get('url', 'N/A'),
-                        f"Exception: {str(book_error)}",
-                        error_csv_path
-                    )
-                    
-                    # 如果連續發生多次錯誤，可能被封鎖，暫停一段時間
+                    on_error(book_info, f"Exception: {str(book_error)}")
+                finally:
+                    # 如果連續發生多次錯誤（回傳 None 或拋出例外），可能被封鎖，暫停一段時間
                     if consecutive_errors >= max_consecutive_errors:
-                        self.log_helper.warning(f"連續 {consecutive_errors} 次錯誤，可能被封鎖，暫停 60 秒...")
-                        time.sleep(60)  # 暫停較長時間
+                        cooldown = rate_controller.record_block(host_rate)
+                        self.log_helper.warning(f"{label}連續 {consecutive_errors} 次錯誤，可能被封鎖，暫停 {cooldown:.0f} 秒（請求間隔已調整為 {host_rate.delay:.1f} 秒）...")
                         
-                        # 重啟瀏覽器
-                        try:
-                            driver.quit()
-                        except:
-                            pass
+                        # 重啟瀏覽器（新瀏覽器會在暫停期間於背景啟動）
+                        if driver:
+                            if self.tor_pool:
+                                # 更換此瀏覽器 circuit 的出口 IP
+                                self.tor_pool.renew(driver)
+                                self.tor_pool.release(driver)
+                            pool.discard(driver)
+                            driver = None
                         
-                        driver = webdriver.Chrome(options=self.chrome_options)
-                        try:
-                            # 先最小化再設置大小，避免最大化狀態衝突
-                            driver.minimize_window()
-                            time.sleep(0.5)
-                            driver.set_window_size(1200, 800)
-                        except Exception as e:
-                            self.log_helper.warning(f"設置窗口大小失敗: {e}，繼續執行")
+                        time.sleep(cooldown)  # 暫停較長時間，連續被封鎖時加倍
                         consecutive_errors = 0  # 重置連續錯誤計數
                     
-                    continue
+                    if driver and self.tor_pool:
+                        self.tor_pool.record_request(driver)
+                    if driver and pool.release(driver):
+                        # 瀏覽器已回收，新的瀏覽器在休息期間於背景啟動
+                        if self.tor_pool:
+                            self.tor_pool.release(driver)
+                        self.log_helper.info(f"{label}重啟瀏覽器以避免被封鎖...")
+                        time.sleep(random.uniform(10, 15))  # 較長的休息時間
+        finally:
+            if pool:
+                pool.close()
+            rate_controller.save()
+            self.log_helper.info(f"{label}請求間隔統計: {host_rate.summary()}")
+            self.log_helper.info(f"{label}頁面內容等待統計: {SeleniumHelper.get_content_wait_stats()}")
+            if self.tor_pool:
+                self.log_helper.info(f"{label}Tor circuit 使用統計: {self.tor_pool.summary()}")
+
+    def __write_book_error(self, book_info, error_message, error_csv_path):
+        self.write_error_to_csv(
+            book_info.get('production_id', 'N/A'),
+            book_info.get('title', 'N/A'),
+            book_info.get('url', 'N/A'),
+            error_message,
+            error_csv_path
+        )
+
+    def Excute(self, csv_path=None, test_mode=False, max_books=None, resume=False, use_catalog=True):
+        """執行爬蟲的主要函數（resume=True 時從上次中斷處繼續，use_catalog=True 時略過已知書籍）"""
+        try:
+            self.log_helper.info("開始執行金石堂詳細書目爬蟲")
+            
+            prepared = self.__prepare_run(csv_path, test_mode, max_books, resume, use_catalog)
+            if not prepared:
+                return False
+            book_urls, output_csv_path, error_csv_path = prepared
+            self.open_dataset(output_csv_path)
+            
+            self.crawl_books(
+                book_urls,
+                # 動態更新 CSV 的對應行
+                on_book=lambda book_info, book: self.update_row_in_csv(output_csv_path, book_info.get('row_index'), book.to_dict(),
+                                                                       book_info.get('url')),
+                on_error=lambda book_info, message: self.__write_book_error(book_info, message, error_csv_path),
+                frontier=self.frontier
+            )
             
             # 由於已經即時寫入，這裡只需要記錄結果
             self.log_helper.info(f"共收集了 {len(self.all_books)} 本書籍的詳細信息")
-            self.log_helper.info(f"所有書籍已即時寫入至: {output_csv_path}")
+            self.close_datasets()
+            self.log_helper.info(f"所有書籍已寫入至: {output_csv_path}")
             
             # 計算總執行時間
             end_time = datetime.now()
@@ -865,21 +820,155 @@ class KingstoneDetailBooksService:
             return False
             
         finally:
-            if driver:
-                driver.quit()
+            self.close_datasets()
+            self.close_frontier()
+            self.close_catalog()
+            self.close_cache_proxy()
 
-def Excute(csv_path=None, test_mode=False, max_books=None):
-    """執行爬蟲的入口函數"""
-    service = KingstoneDetailBooksService()
-    return service.Excute(csv_path, test_mode, max_books)
+    def ExcuteSharded(self, csv_path=None, num_shards=2, test_mode=False, max_books=None, resume=False, use_catalog=True):
+        """
+        分片模式：將書籍列表分給多個工作進程並行爬取
+        
+        每個工作進程有自己的瀏覽器、user-agent 與退避狀態，
+        結果透過佇列送回主進程，由主進程統一寫入同一個輸出 CSV。
+        """
+        processes = []
+        try:
+            self.log_helper.info(f"開始執行金石堂詳細書目爬蟲（分片模式，{num_shards} 個工作進程）")
+            
+            prepared = self.__prepare_run(csv_path, test_mode, max_books, resume, use_catalog)
+            if not prepared:
+                return False
+            book_urls, output_csv_path, error_csv_path = prepared
+            if not book_urls:
+                self.log_helper.info("沒有需要處理的書籍")
+                return True
+            
+            num_shards = max(1, min(num_shards, len(book_urls)))
+            # 交錯分配，讓每個分片都拿到排行榜前後段的書籍
+            shards = [book_urls[i::num_shards] for i in range(num_shards)]
+            
+            result_queue = multiprocessing.Queue()
+            for shard_id, shard in enumerate(shards, 1):
+                process = multiprocessing.Process(
+                    target=run_shard_worker,
+                    args=(shard_id, shard, result_queue, self.frontier.connection_args(), self.tor_pool is not None, self.lean,
+                          self.cache_proxy is not None, self.snapshot),
+                    name=f"KingstoneShard-{shard_id}"
+                )
+                process.start()
+                processes.append(process)
+                self.log_helper.info(f"分片 #{shard_id} 已啟動，負責 {len(shard)} 本書籍")
+            
+            # 工作進程啟動後才載入資料集與註冊信號處理，避免子進程繼承
+            self.open_dataset(output_csv_path)
+            
+            # 主進程負責合併結果並寫入 CSV（單一寫入者）
+            finished_shards = 0
+            success_count = 0
+            while finished_shards < len(processes):
+                try:
+                    kind, key, payload = result_queue.get(timeout=5)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        self.log_helper.warning("所有工作進程已結束，但未全部回報完成")
+                        break
+                    continue
+                
+                if kind == 'book':
+                    # 主進程寫回 CSV 後才標記完成（子進程只負責 claim／mark_failed）
+                    self.update_row_in_csv(output_csv_path, key.get('row_index'), payload, key.get('url'))
+                    success_count += 1
+                elif kind == 'error':
+                    self.__write_book_error(key, payload, error_csv_path)
+                elif kind == 'done':
+                    finished_shards += 1
+                    self.log_helper.info(f"分片 #{key} 已完成 ({finished_shards}/{len(processes)})")
+            
+            for process in processes:
+                process.join(timeout=10)
+            
+            self.close_datasets()
+            self.log_helper.info(f"共收集了 {success_count} 本書籍的詳細信息")
+            self.log_helper.info(f"所有書籍已寫入至: {output_csv_path}")
+            
+            duration = datetime.now() - self.start_time
+            self.log_helper.info(f"爬蟲執行完成，總時間: {duration}")
+            
+            return True
+            
+        except Exception as e:
+            self.log_helper.error(f"執行分片爬蟲時發生錯誤: {str(e)}")
+            self.log_helper.error(traceback.format_exc())
+            return False
+            
+        finally:
+            self.close_datasets()
+            self.close_frontier()
+            self.close_catalog()
+            self.close_cache_proxy()
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+def run_shard_worker(shard_id, book_urls, result_queue, frontier_args=None, use_tor=False, lean=False,
+                     use_cache_proxy=False, snapshot=False):
+    """分片工作進程：使用獨立的瀏覽器與退避狀態爬取分配到的書籍，並將結果送回主進程"""
+    # 每個進程各自隨機選擇 user-agent；使用 Tor 時依分片編號錯開 circuit
+    # 快取代理：fork 的子進程沿用主進程的代理，其他啟動方式則各自啟動並共用同一個磁碟快取
+    service = KingstoneDetailBooksService(use_tor=use_tor, tor_offset=shard_id - 1, lean=lean,
+                                          use_cache_proxy=use_cache_proxy, snapshot=snapshot)
+    frontier = CrawlFrontier(*frontier_args) if frontier_args else None  # 每個進程各自連線
+    try:
+        service.crawl_books(
+            book_urls,
+            on_book=lambda book_info, book: result_queue.put(('book', book_info, book.to_dict())),
+            on_error=lambda book_info, message: result_queue.put(('error', book_info, message)),
+            label=f"[分片 #{shard_id}] ",
+            frontier=frontier
+        )
+    except Exception as e:
+        service.log_helper.error(f"[分片 #{shard_id}] 發生錯誤: {str(e)}")
+        service.log_helper.error(traceback.format_exc())
+    finally:
+        if frontier:
+            frontier.close()
+        result_queue.put(('done', shard_id, None))
+
+def Excute(csv_path=None, test_mode=False, max_books=None, num_shards=1, resume=False, use_catalog=True, use_tor=False,
+           lean=False, use_cache_proxy=False, snapshot=False):
+    """執行爬蟲的入口函數（num_shards > 1 時使用多進程分片模式，resume=True 時從上次中斷處繼續，use_tor=True 時經由 Tor 連線）"""
+    service = KingstoneDetailBooksService(use_tor=use_tor, lean=lean, use_cache_proxy=use_cache_proxy, snapshot=snapshot)
+    if num_shards and num_shards > 1:
+        return service.ExcuteSharded(csv_path, num_shards, test_mode, max_books, resume, use_catalog)
+    return service.Excute(csv_path, test_mode, max_books, resume, use_catalog)
 
 if __name__ == "__main__":
-    # 直接執行時，要求手動輸入CSV路徑
-    csv_path = input("請輸入CSV文件路徑: ").strip()
+    # 用法: python kingstone_ranking_detail.py [CSV路徑] [--shards K] [--resume] [--no-catalog] [--tor] [--lean] [--cache-proxy] [--snapshot]
+    args = sys.argv[1:]
+    resume = '--resume' in args
+    use_catalog = '--no-catalog' not in args
+    use_tor = '--tor' in args
+    lean = '--lean' in args
+    use_cache_proxy = '--cache-proxy' in args
+    snapshot = '--snapshot' in args
+    num_shards = 1
+    if '--shards' in args:
+        try:
+            num_shards = max(1, int(args[args.index('--shards') + 1]))
+        except (IndexError, ValueError):
+            print("⚠️  --shards 必須接整數，使用預設值 1")
+            num_shards = 1
+    
+    if args and not args[0].startswith('--'):
+        csv_path = args[0].strip()
+    else:
+        # 直接執行時，要求手動輸入CSV路徑
+        csv_path = input("請輸入CSV文件路徑: ").strip()
     
     if csv_path and os.path.exists(csv_path):
         print(f"使用CSV文件: {csv_path}")
-        Excute(csv_path=csv_path, test_mode=False)
+        Excute(csv_path=csv_path, test_mode=False, num_shards=num_shards, resume=resume, use_catalog=use_catalog, use_tor=use_tor, lean=lean, use_cache_proxy=use_cache_proxy, snapshot=snapshot)
     else:
         print(f"錯誤: 提供的CSV文件不存在或路徑無效: {csv_path}")
-        print("爬蟲終止")
\ No newline at end of file
+        print("爬蟲終止")
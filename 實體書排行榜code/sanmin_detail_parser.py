@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+三民書局商品詳細頁解析器
+以 lxml 解析一次頁面，走訪一次 li.ga 建立「標籤 -> 節點」對照表，
+作者、出版社、譯者、出版日、ISBN、原文書名都從對照表取得，不再每個欄位重掃一次 DOM。
+分類、副分類與定位關鍵字使用模組載入時預先編譯的 XPath。
+回傳格式與 sanmin_ranking.ipynb 原本的 BeautifulSoup 版本相同
+"""
+
+from lxml import html, etree
+import re
+
+
+def xpath_class(name):
+    """XPath 條件：class 屬性包含指定的 class 名稱（等同 CSS 的 .name）"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# 詳細頁中需要的節點（模組載入時編譯一次）
+detail_row_xpath = etree.XPath(f"//li[{xpath_class('ga')}]")
+breadcrumb_xpath = etree.XPath("//*[@id='breadcrumb-trail']//a")
+vice_category_xpath = etree.XPath(
+    f"//div[{xpath_class('item')}]"
+    "[.//h2[@class='d-inline fs-14'][contains(string(.), '中文圖書分類')]]"
+    "//h3[@class='d-inline fs-14']//a[@class='text-blue bold']"
+)
+scheme_link_xpath = etree.XPath(f"//a[{xpath_class('text-secondary')} and {xpath_class('bold')}]")
+scheme_parent_xpath = etree.XPath("ancestor::div[@class='text-secondary py3'][1]")
+scheme_title_xpath = etree.XPath(".//h3[@class='d-inline fs-14']")
+
+scheme_keywords = ["三民出版品", "親子館", "中文圖書分類", "得獎作品"]
+label_separator = re.compile(r'[:：]')
+
+# 欄位 -> (標籤關鍵字, 是否需要 h3)，依出現順序取第一個符合的列
+detail_field_labels = {
+    'author': (('作者', '編者', '著者', '編著'), True),
+    'Publisher': (('出版社',), True),
+    'translator': (('譯者',), True),
+    'ISBN': (('ISBN13',), False),
+    'publish_date': (('出版日',), False),
+    'original_title': (('替代書名',), False),
+}
+
+
+def node_text(node):
+    """等同 BeautifulSoup 的 get_text(strip=True)：各段文字去空白後直接串接"""
+    return ''.join(text.strip() for text in node.itertext())
+
+
+def normalize_date(date_text):
+    """轉換日期格式：YYYY/MM/DD 或 YYYY-MM-DD -> YYYY/M/D（去除前導0）"""
+    date_match = re.match(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})', date_text)
+    if date_match:
+        year = date_match.group(1)
+        month = str(int(date_match.group(2)))
+        day = str(int(date_match.group(3)))
+        return f"{year}/{month}/{day}"
+    return date_text
+
+
+def build_label_map(tree):
+    """
+    走訪一次所有 li.ga，建立 標籤 -> 節點資訊 的對照表（保留頁面順序，同標籤只留第一個）
+
+    標籤取自該列文字第一個冒號之前的部分，例如「作者：王小明」-> 「作者」
+    """
+    label_map = {}
+    for li in detail_row_xpath(tree):
+        text = node_text(li)
+        if not text:
+            continue
+        label = label_separator.split(text, 1)[0].strip()
+        if label in label_map:
+            continue
+        h3 = li.find('.//h3')
+        label_map[label] = {
+            'li': li,
+            'text': text,
+            'h3': h3,
+            'h3_text': node_text(h3) if h3 is not None else '',
+        }
+    return label_map
+
+
+def find_row(label_map, keywords, need_h3=False):
+    """依頁面順序找出第一個標籤包含任一關鍵字的列"""
+    for label, row in label_map.items():
+        if need_h3 and row['h3'] is None:
+            continue
+        if any(keyword in label for keyword in keywords):
+            return row
+    return None
+
+
+def __link_names(row, label_pattern):
+    """h3 中的所有連結文字以 '; ' 串接；沒有連結時移除標籤取純文字"""
+    links = [node_text(link) for link in row['h3'].iter('a')]
+    if links:
+        return '; '.join(links)
+    return re.sub(label_pattern, '', row['h3_text']).strip()
+
+
+def __last_span_value(row, label):
+    """三個以上 span 時取最後一個，否則從整列文字移除標籤與冒號"""
+    spans = list(row['li'].iter('span'))
+    if len(spans) >= 3:
+        return node_text(spans[-1])
+    return row['text'].replace(label, '').replace('：', '').strip()
+
+
+def resolve_fields(label_map):
+    """從對照表取出作者、出版社、譯者、ISBN、出版日與原文書名"""
+    rows = {field: find_row(label_map, keywords, need_h3)
+            for field, (keywords, need_h3) in detail_field_labels.items()}
+    fields = {field: '' for field in detail_field_labels}
+
+    if rows['author']:
+        fields['author'] = __link_names(rows['author'], r'(作者|編者|著者|編著)[:：\s]*')
+
+    if rows['Publisher']:
+        pub_link = rows['Publisher']['h3'].find('.//a')
+        if pub_link is not None:
+            fields['Publisher'] = node_text(pub_link)
+        else:
+            fields['Publisher'] = re.sub(r'出版社[:：\s]*', '', rows['Publisher']['h3_text']).strip()
+
+    if rows['translator']:
+        fields['translator'] = __link_names(rows['translator'], r'譯者[:：\s]*')
+
+    if rows['ISBN']:
+        # 移除破折號和空格
+        fields['ISBN'] = re.sub(r'[-\s]', '', __last_span_value(rows['ISBN'], 'ISBN13'))
+
+    if rows['publish_date']:
+        fields['publish_date'] = normalize_date(__last_span_value(rows['publish_date'], '出版日'))
+
+    if rows['original_title']:
+        title_link = rows['original_title']['li'].find('.//a')
+        if title_link is not None:
+            fields['original_title'] = node_text(title_link)
+        else:
+            spans = list(rows['original_title']['li'].iter('span'))
+            if len(spans) >= 3:
+                fields['original_title'] = node_text(spans[-1])
+
+    return fields
+
+
+def extract_schemes(tree):
+    """一次取出所有 a.text-secondary.bold，依關鍵字順序組出「主分類-子分類」"""
+    first_links = {}
+    for link in scheme_link_xpath(tree):
+        # 與原本 find(string=...) 相同：連結只有單一文字且完全相同
+        if len(link) == 0 and link.text in scheme_keywords and link.text not in first_links:
+            first_links[link.text] = link
+
+    schemes = []
+    for scheme_type in scheme_keywords:
+        link = first_links.get(scheme_type)
+        if link is None:
+            continue
+        main_title = node_text(link)
+        for parent in scheme_parent_xpath(link):
+            for sub_title in scheme_title_xpath(parent):
+                schemes.append(f"{main_title}-{node_text(sub_title)}")
+    return schemes
+
+
+def parse_detail_page(detail_html, product_id=''):
+    """解析商品詳細頁，回傳詳細欄位（欄位與 sanmin_ranking.ipynb 相同）"""
+    tree = html.fromstring(detail_html)
+
+    # 提取分類路徑
+    breadcrumb_tags = breadcrumb_xpath(tree)
+    category_path = '-'.join([text for text in map(node_text, breadcrumb_tags) if text != "三民網路書店"]) if breadcrumb_tags else '未知'
+
+    # 提取副分類（中文圖書分類）
+    vice_links = vice_category_xpath(tree)
+    vice_category = node_text(vice_links[0]) if vice_links else ''
+
+    fields = resolve_fields(build_label_map(tree))
+    schemes = extract_schemes(tree)
+
+    return {
+        'ISBN': fields['ISBN'],
+        'Publisher': fields['Publisher'],
+        'author': fields['author'],
+        'translator': fields['translator'],
+        'original_title': fields['original_title'],
+        'publish_date': fields['publish_date'],
+        'category': category_path,
+        'vice_category': vice_category,
+        'schemes': '; '.join(schemes) if schemes else '未知'
+    }
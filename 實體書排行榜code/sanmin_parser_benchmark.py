@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+三民書局詳細頁解析效能比較
+以存下來的詳細頁（sanmin_ranking.py --save-pages 產生）比較：
+- 原本 notebook 的 BeautifulSoup 版本（html.parser，每個欄位各掃一次 li.ga）
+- sanmin_detail_parser 的 lxml 版本（解析一次，標籤 -> 節點對照表）
+並檢查兩者輸出的欄位是否一致
+
+用法: python sanmin_parser_benchmark.py <詳細頁資料夾> [--repeat N]
+"""
+
+import sys
+import os
+
+# 確保能找到helper模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from helper.log_helper import LogHelper
+from sanmin_detail_parser import parse_detail_page, normalize_date, scheme_keywords
+from bs4 import BeautifulSoup
+import glob
+import re
+import time
+
+log = LogHelper('sanmin_parser_benchmark')
+
+default_repeat = 5
+
+
+def legacy_parse_detail_page(detail_html, product_id=''):
+    """原本 sanmin_ranking.ipynb 的解析方式（html.parser，每個欄位各掃一次 li.ga）"""
+    detail_soup = BeautifulSoup(detail_html, 'html.parser')
+
+    # 提取分類路徑
+    breadcrumb_tags = detail_soup.select('#breadcrumb-trail a')  # 直接選擇所有 <a> 標籤
+    category_path = '-'.join([tag.get_text(strip=True) for tag in breadcrumb_tags if tag.get_text(strip=True) != "三民網路書店"]) if breadcrumb_tags else '未知'
+
+    # 提取副分類（中文圖書分類）
+    vice_category = ''
+    try:
+        for item_div in detail_soup.find_all('div', class_='item'):
+            # 查找是否包含"中文圖書分類"
+            h2_tag = item_div.find('h2', class_='d-inline fs-14')
+            if h2_tag and '中文圖書分類' in h2_tag.get_text():
+                # 提取 h3 中的連結文本
+                h3_tag = item_div.find('h3', class_='d-inline fs-14')
+                if h3_tag:
+                    link_tag = h3_tag.find('a', class_='text-blue bold')
+                    if link_tag:
+                        vice_category = link_tag.get_text(strip=True)
+                        break
+    except Exception as e:
+        log.error(f"Error extracting vice_category for product {product_id}: {e}")
+        vice_category = ''
+
+    # 一次性查找所有 li.ga 標籤，供多個字段使用
+    li_tags = detail_soup.find_all('li', class_='ga')
+
+    # 提取作者（從詳細頁）
+    authors = ''
+    try:
+        for li in li_tags:
+            h3_tag = li.find('h3')
+            if h3_tag:
+                h3_text = h3_tag.get_text(strip=True)
+                # 檢查是否包含"作者"、"編者"、"著者"等關鍵字
+                if any(keyword in h3_text for keyword in ['作者', '編者', '著者', '編著']):
+                    # 提取所有 a 標籤（作者可能有多個）
+                    author_links = h3_tag.find_all('a')
+                    if author_links:
+                        authors = '; '.join([link.get_text(strip=True) for link in author_links])
+                    else:
+                        # 如果沒有 a 標籤，直接提取文本並清理
+                        authors = re.sub(r'(作者|編者|著者|編著)[:：\s]*', '', h3_text).strip()
+                    break
+    except Exception as e:
+        log.error(f"Error extracting author for product {product_id}: {e}")
+        authors = ''
+
+    # 提取出版社（從詳細頁）
+    publisher = ''
+    try:
+        for li in li_tags:
+            h3_tag = li.find('h3')
+            if h3_tag:
+                h3_text = h3_tag.get_text(strip=True)
+                if '出版社' in h3_text:
+                    pub_link = h3_tag.find('a')
+                    if pub_link:
+                        publisher = pub_link.get_text(strip=True)
+                    else:
+                        publisher = re.sub(r'出版社[:：\s]*', '', h3_text).strip()
+                    break
+    except Exception as e:
+        log.error(f"Error extracting publisher for product {product_id}: {e}")
+        publisher = ''
+
+    # 提取譯者（從詳細頁）
+    translator = ''
+    try:
+        for li in li_tags:
+            h3_tag = li.find('h3')
+            if h3_tag:
+                h3_text = h3_tag.get_text(strip=True)
+                if '譯者' in h3_text:
+                    # 提取所有 a 標籤（譯者可能有多個）
+                    translator_links = h3_tag.find_all('a')
+                    if translator_links:
+                        translator = '; '.join([link.get_text(strip=True) for link in translator_links])
+                    else:
+                        translator = re.sub(r'譯者[:：\s]*', '', h3_text).strip()
+                    break
+    except Exception as e:
+        log.error(f"Error extracting translator for product {product_id}: {e}")
+        translator = ''
+
+    # 提取 ISBN13 並清理格式
+    isbn13 = ''
+    try:
+        for li in li_tags:
+            if "ISBN13" in li.text:
+                # 提取 span 標籤中的 ISBN
+                isbn_span = li.find_all('span')
+                if len(isbn_span) >= 3:
+                    isbn_text = isbn_span[-1].get_text(strip=True)
+                else:
+                    isbn_text = li.get_text(strip=True).replace('ISBN13', '').replace('：', '').strip()
+
+                # 移除破折號和空格
+                isbn13 = re.sub(r'[-\s]', '', isbn_text)
+                break
+    except Exception as e:
+        log.error(f"Error extracting ISBN13 for product {product_id}: {e}")
+        isbn13 = ''
+
+    # 提取出版日期並轉換格式
+    pub_date = ''
+    try:
+        for li in li_tags:
+            if "出版日" in li.text:
+                date_span = li.find_all('span')
+                if len(date_span) >= 3:
+                    pub_date_text = date_span[-1].get_text(strip=True)
+                else:
+                    pub_date_text = li.get_text(strip=True).replace('出版日', '').replace('：', '').strip()
+                pub_date = normalize_date(pub_date_text)
+                break
+    except Exception as e:
+        log.error(f"Error extracting PubDate for product {product_id}: {e}")
+        pub_date = ''
+
+    # 提取原文書名（替代書名）
+    original_title = ''
+    try:
+        for li in li_tags:
+            if "替代書名" in li.text:
+                title_link = li.find('a')
+                if title_link:
+                    original_title = title_link.get_text(strip=True)
+                else:
+                    title_span = li.find_all('span')
+                    if len(title_span) >= 3:
+                        original_title = title_span[-1].get_text(strip=True)
+                break
+    except Exception as e:
+        log.error(f"Error extracting OriginalTitle for product {product_id}: {e}")
+        original_title = ''
+
+    # 提取多個定位關鍵字的內容
+    schemes = []
+    for scheme_type in scheme_keywords:
+        scheme_tag = detail_soup.find('a', class_='text-secondary bold', string=scheme_type)
+        if scheme_tag:
+            main_title = scheme_tag.get_text(strip=True)
+            sub_titles = scheme_tag.find_parent('div', class_='text-secondary py3').find_all('h3', class_='d-inline fs-14')
+            for sub_title in sub_titles:
+                schemes.append(f"{main_title}-{sub_title.get_text(strip=True)}")
+
+    return {
+        'ISBN': isbn13,
+        'Publisher': publisher,
+        'author': authors,
+        'translator': translator,
+        'original_title': original_title,
+        'publish_date': pub_date,
+        'category': category_path,
+        'vice_category': vice_category,
+        'schemes': '; '.join(schemes) if schemes else '未知'
+    }
+
+
+def load_pages(pages_dir):
+    """讀取資料夾內所有 .html 檔，回傳 [(商品ID, html)]"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    return pages
+
+
+def time_parser(parser, pages, repeat):
+    """每頁重複解析 repeat 次，回傳 (總秒數, 最後一輪的結果)"""
+    results = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for product_id, page_html in pages:
+            results[product_id] = parser(page_html, product_id)
+    return time.perf_counter() - start, results
+
+
+def compare_results(legacy_results, new_results):
+    """逐欄比較兩個解析器的輸出，回傳 [(商品ID, 欄位, 舊值, 新值)]"""
+    mismatches = []
+    for product_id, legacy in legacy_results.items():
+        new = new_results.get(product_id, {})
+        for field, value in legacy.items():
+            if new.get(field) != value:
+                mismatches.append((product_id, field, value, new.get(field)))
+    return mismatches
+
+
+def Excute(pages_dir, repeat=default_repeat):
+    """主執行函數"""
+    pages = load_pages(pages_dir)
+    if not pages:
+        print(f"❌ {pages_dir} 中沒有 .html 檔案（可用 sanmin_ranking.py --save-pages {pages_dir} 產生）")
+        return None
+
+    print(f"📄 共 {len(pages)} 頁，每頁重複 {repeat} 次")
+    legacy_seconds, legacy_results = time_parser(legacy_parse_detail_page, pages, repeat)
+    new_seconds, new_results = time_parser(parse_detail_page, pages, repeat)
+
+    runs = len(pages) * repeat
+    legacy_ms = legacy_seconds / runs * 1000
+    new_ms = new_seconds / runs * 1000
+    speedup = legacy_seconds / new_seconds if new_seconds else 0
+    print(f"🐢 BeautifulSoup (notebook): {legacy_ms:.2f} ms/頁")
+    print(f"🚀 lxml 標籤對照表:          {new_ms:.2f} ms/頁")
+    print(f"📈 加速 {speedup:.1f} 倍")
+    log.info(f"{len(pages)} 頁 x {repeat}: BeautifulSoup {legacy_ms:.2f} ms/頁, lxml {new_ms:.2f} ms/頁, 加速 {speedup:.1f} 倍")
+
+    mismatches = compare_results(legacy_results, new_results)
+    if mismatches:
+        print(f"⚠️  {len(mismatches)} 個欄位結果不同：")
+        for product_id, field, legacy_value, new_value in mismatches:
+            print(f"   {product_id} {field}: {legacy_value!r} -> {new_value!r}")
+            log.warning(f"{product_id} {field}: {legacy_value!r} -> {new_value!r}")
+    else:
+        print("✅ 兩種解析結果完全一致")
+
+    return {
+        'pages': len(pages),
+        'legacy_ms': legacy_ms,
+        'new_ms': new_ms,
+        'speedup': speedup,
+        'mismatches': mismatches,
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = default_repeat
+    if '--repeat' in args:
+        try:
+            repeat = max(1, int(args[args.index('--repeat') + 1]))
+        except (IndexError, ValueError):
+            print(f"⚠️  --repeat 必須接整數，使用預設值 {default_repeat}")
+
+    if not args or args[0].startswith('--'):
+        print("用法: python sanmin_parser_benchmark.py <詳細頁資料夾> [--repeat N]")
+        sys.exit(1)
+    Excute(args[0], repeat)
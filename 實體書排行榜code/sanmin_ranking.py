@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+三民書局排行榜爬取程式 - asyncio 並行版本
+由 sanmin_ranking.ipynb 整理而來，可直接 import 使用
+排行榜頁與商品詳細頁皆為靜態 HTML，使用 aiohttp 並行抓取（每個主機限制同時連線數），
+結果依排名順序輸出
+爬取欄位：ISBN, Publisher, author, translator, original_title, publish_date, fixed_price, category, vice_category
+"""
+
+import sys
+import os
+
+# 確保能找到helper模組
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from helper.log_helper import LogHelper
+from sanmin_detail_parser import parse_detail_page
+from bs4 import BeautifulSoup
+from datetime import datetime
+from urllib.parse import urlparse
+import pandas as pd
+import aiohttp
+import asyncio
+import re
+import traceback
+
+log = LogHelper('sanmin_ranking')
+
+# 基本設置
+base_url = "https://www.sanmin.com.tw/promote/top/?id=yy&item=11410"
+detail_base_url = "https://www.sanmin.com.tw/product/index/{}"
+headers = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+total_pages = 13
+max_retries = 3
+retry_delay = 2          # 重試前等待秒數
+request_timeout = 10     # 單次請求逾時秒數
+max_concurrency_per_host = 5
+
+column_order = ['ISBN', 'production_id', 'title', 'processed_title', 'Publisher',
+                'author', 'translator', 'original_title', 'publish_date', 'fixed_price',
+                'category', 'vice_category', 'url', 'Day_counts']
+
+
+class HostLimiter:
+    """每個主機各自的並行數上限"""
+
+    def __init__(self, limit=max_concurrency_per_host):
+        self.limit = limit
+        self._semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.limit)
+        return self._semaphores[host]
+
+
+async def fetch_with_retry(session, limiter, url, max_retries=max_retries):
+    """嘗試請求 URL，最多重試 max_retries 次，全部失敗時回傳 None"""
+    for attempt in range(max_retries):
+        try:
+            async with limiter.get(url):
+                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=request_timeout)) as response:
+                    if response.status == 200:
+                        return await response.text()
+                    print(f"⚠️ Attempt {attempt+1} failed: {response.status} ({url})")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠️ Attempt {attempt+1} failed: {e} ({url})")
+        # 延遲再試（不佔用主機的連線名額）
+        await asyncio.sleep(retry_delay)
+    return None
+
+
+def extract_product_id(product):
+    """從排行榜的商品區塊提取商品ID"""
+    # 方法1：從 class 屬性中找到以 'Prod' 開頭且後面跟數字的類名
+    for cls in product.get('class', []):
+        # 必須是 'Prod' + 數字的格式，例如 'Prod1234567'
+        if cls.startswith('Prod') and len(cls) > 4 and cls[4:].isdigit():
+            return cls[4:]
+
+    # 方法2：如果找不到，嘗試從連結中提取
+    link_tag = product.find('a', href=True)
+    if link_tag and '/product/' in link_tag['href']:
+        match = re.search(r'/product/index/(\d+)', link_tag['href'])
+        if match:
+            return match.group(1)
+
+    # 方法3：嘗試從所有連結中提取
+    for link in product.find_all('a', href=True):
+        match = re.search(r'/product/index/(\d+)', link['href'])
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def parse_ranking_page(page_html, page):
+    """解析排行榜頁，回傳該頁商品的基本資訊列表（依頁面順序）"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    items = []
+
+    for position, product in enumerate(soup.find_all('div', class_='sProduct')):
+        try:
+            rank = product.find('div', class_='Title').get_text(strip=True).split('.')[0]
+            name = product.find('h3').get_text(strip=True)
+
+            product_id = extract_product_id(product)
+            if not product_id:
+                log.warning(f"⚠️ 無法提取商品ID，跳過: {name}")
+                continue
+
+            # 提取價格並清理格式（從列表頁）
+            price_tag = product.select_one('.Price')
+            price = '未知'
+            if price_tag:
+                # 移除非數字字符（保留小數點）
+                price = re.sub(r'[^\d.]', '', price_tag.get_text(strip=True)) or '未知'
+
+            items.append({
+                'page': page,
+                'position': position,
+                'rank': rank,
+                'name': name,
+                'product_id': product_id,
+                'price': price,
+                'detail_url': detail_base_url.format(product_id)
+            })
+        except AttributeError as e:
+            log.error(f"❌ 解析商品時發生錯誤: {e}")
+
+    return items
+
+
+def build_record(item, detail):
+    """合併排行榜資訊與詳細頁資訊為輸出列"""
+    return {
+        "ISBN": detail['ISBN'],
+        "production_id": item['product_id'],
+        "title": item['name'],
+        # 處理標題：移除標點符號和空格
+        "processed_title": re.sub(r'[^\w]', '', item['name']),
+        "Publisher": detail['Publisher'],
+        "author": detail['author'],
+        "translator": detail['translator'],
+        "original_title": detail['original_title'],
+        "publish_date": detail['publish_date'],
+        "fixed_price": item['price'],
+        "category": detail['category'],
+        "vice_category": detail['vice_category'],
+        "url": item['detail_url'],
+        "Day_counts": "",
+        "rank": item['rank']
+    }
+
+
+def save_detail_page(save_pages_dir, product_id, detail_html):
+    """將詳細頁原始 HTML 存成 <商品ID>.html（供 sanmin_parser_benchmark.py 使用）"""
+    try:
+        with open(os.path.join(save_pages_dir, f"{product_id}.html"), 'w', encoding='utf-8') as f:
+            f.write(detail_html)
+    except OSError as e:
+        log.warning(f"⚠️ 無法保存詳細頁 {product_id}: {e}")
+
+
+async def fetch_detail(session, limiter, item, save_pages_dir=None):
+    """抓取並解析單本書的詳細頁，失敗時回傳 None"""
+    detail_html = await fetch_with_retry(session, limiter, item['detail_url'])
+    if detail_html is None:
+        log.error(f"❌ Failed to fetch {item['detail_url']} after retries")
+        return None
+
+    if save_pages_dir:
+        save_detail_page(save_pages_dir, item['product_id'], detail_html)
+
+    try:
+        detail = parse_detail_page(detail_html, item['product_id'])
+        log.info(f"✅ 排名 {item['rank']}: {item['name']} (ID: {item['product_id']})")
+        return build_record(item, detail)
+    except Exception as e:
+        log.error(f"❌ 處理商品 {item['product_id']} 時發生未預期錯誤: {e}")
+        traceback.print_exc()
+        return None
+
+
+async def crawl(pages=None, concurrency=max_concurrency_per_host, save_pages_dir=None):
+    """
+    並行爬取排行榜頁與所有商品詳細頁
+
+    Args:
+        pages: 要爬取的頁碼（預設 1-13）
+        concurrency: 每個主機同時連線數上限
+        save_pages_dir: 若指定，將詳細頁原始 HTML 存到此資料夾
+
+    Returns:
+        list: 依排名順序排列的書籍資料
+    """
+    pages = list(pages) if pages is not None else list(range(1, total_pages + 1))
+    if save_pages_dir:
+        os.makedirs(save_pages_dir, exist_ok=True)
+    limiter = HostLimiter(concurrency)
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # 1. 並行抓取所有排行榜頁
+        page_htmls = await asyncio.gather(*[
+            fetch_with_retry(session, limiter, f"{base_url}&pi={page}") for page in pages
+        ])
+
+        items = []
+        for page, page_html in zip(pages, page_htmls):
+            if page_html is None:
+                log.error(f"❌ 排行榜第 {page} 頁抓取失敗")
+                continue
+            page_items = parse_ranking_page(page_html, page)
+            log.info(f"Processing page {page}: {len(page_items)} 本")
+            items.extend(page_items)
+
+        # 2. 並行抓取所有詳細頁（gather 會保留任務順序）
+        records = await asyncio.gather(*[fetch_detail(session, limiter, item, save_pages_dir) for item in items])
+
+    # 3. 依原始排行榜順序（頁碼、頁內位置）合併結果
+    ordered = sorted(zip(items, records), key=lambda pair: (pair[0]['page'], pair[0]['position']))
+    return [record for item, record in ordered if record is not None]
+
+
+def save_to_csv(records, output_path=None):
+    """保存資料到CSV文件（金石堂格式，日期欄位填入排名）"""
+    df = pd.DataFrame(records)
+
+    # 獲取今天的日期（格式：11/25）
+    today = datetime.now()
+    date_column = f"{today.month}/{today.day}"
+
+    # 添加日期欄位並填充排名
+    df[date_column] = df['rank']
+    df = df.drop('rank', axis=1)
+    df = df[column_order + [date_column]]
+
+    if output_path is None:
+        output_dir = os.path.join(os.path.dirname(current_dir), 'ranking_result', 'sanmin')
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f"sanmin_all_categories_{today.strftime('%Y%m%d')}.csv")
+
+    df.to_csv(output_path, index=False, encoding='utf-8-sig')
+    return output_path
+
+
+def Excute(output_path=None, concurrency=max_concurrency_per_host, save_pages_dir=None):
+    """主執行函數"""
+    start_time = datetime.now()
+    log.info(f"開始執行三民書局排行榜爬取（每個主機最多 {concurrency} 個並行連線）")
+
+    try:
+        records = asyncio.run(crawl(concurrency=concurrency, save_pages_dir=save_pages_dir))
+        if not records:
+            log.error("沒有爬取到任何資料")
+            return None
+
+        output_path = save_to_csv(records, output_path)
+        log.info(f"資料已保存到 {output_path}")
+        log.info(f"共爬取 {len(records)} 筆資料，總耗時: {datetime.now() - start_time}")
+        return output_path
+    except Exception as e:
+        log.error(f"爬取三民書局排行榜時發生錯誤: {e}")
+        log.error(traceback.format_exc())
+        return None
+
+
+if __name__ == "__main__":
+    # 用法: python sanmin_ranking.py [輸出CSV路徑] [--concurrency N] [--save-pages DIR]
+    args = sys.argv[1:]
+    concurrency = max_concurrency_per_host
+    save_pages_dir = None
+    if '--concurrency' in args:
+        try:
+            concurrency = max(1, int(args[args.index('--concurrency') + 1]))
+        except (IndexError, ValueError):
+            print(f"⚠️  --concurrency 必須接整數，使用預設值 {max_concurrency_per_host}")
+    if '--save-pages' in args:
+        try:
+            save_pages_dir = args[args.index('--save-pages') + 1]
+        except IndexError:
+            print("⚠️  --save-pages 必須接資料夾路徑，不保存詳細頁")
+
+    output_path = args[0] if args and not args[0].startswith('--') else None
+    Excute(output_path, concurrency, save_pages_dir)